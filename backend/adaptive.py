@@ -0,0 +1,128 @@
+from typing import Dict, Optional
+
+
+# Defaults for config["adaptive_interval"]
+DEFAULT_ADAPTIVE = {
+    "enabled": False,
+    "max_minutes": 5,          # longest a stable site may go unchecked
+    "healthy_streak": 5,       # healthy checks needed before stretching
+    "growth_factor": 2.0,      # interval multiplier per healthy streak
+    "confirm_seconds": 20,     # fast re-check after a failure or RT jump
+    "rt_jump_factor": 3.0,     # RT above this x the moving average is a jump
+}
+
+# Weight of the newest response time in the moving average
+RT_EWMA_ALPHA = 0.2
+
+
+def adaptive_settings(config: dict) -> dict:
+    """Merge config["adaptive_interval"] over the defaults"""
+    settings = dict(DEFAULT_ADAPTIVE)
+    settings.update(config.get("adaptive_interval", {}))
+    return settings
+
+
+class AdaptiveInterval:
+    """
+    Per-site uptime interval that stretches after long runs of healthy
+    checks and snaps to a fast confirm interval after a failure or a
+    response-time jump.
+    """
+
+    def __init__(self):
+        # url -> {'interval', 'streak', 'rt_avg', 'was_up', 'reason'}
+        self._state: Dict[str, dict] = {}
+
+    def restore(self, url: str, interval_s: float, streak: int, rt_avg: Optional[float]):
+        """Restore the state stored before a restart"""
+        self._state.setdefault(url, {
+            "interval": interval_s,
+            "streak": streak,
+            "rt_avg": rt_avg,
+            "was_up": True,
+            "reason": "restored",
+        })
+
+    def interval(self, url: str, base_s: float, settings: dict) -> float:
+        """
+        Current uptime interval (seconds) for a URL
+
+        Args:
+            url: Website URL
+            base_s: Configured uptime cadence, the lower bound when healthy
+            settings: Result of adaptive_settings()
+        """
+        if not settings["enabled"]:
+            return base_s
+        state = self._state.get(url)
+        if state is None:
+            return base_s
+        return state["interval"]
+
+    def observe(
+        self,
+        url: str,
+        is_up: bool,
+        response_time: Optional[float],
+        base_s: float,
+        settings: dict,
+    ) -> dict:
+        """
+        Feed one uptime result and compute the next interval
+
+        Returns:
+            The site's updated state
+        """
+        max_s = max(base_s, float(settings["max_minutes"]) * 60)
+        confirm_s = min(base_s, float(settings["confirm_seconds"]))
+
+        state = self._state.setdefault(url, {
+            "interval": base_s,
+            "streak": 0,
+            "rt_avg": None,
+            "was_up": True,
+            "reason": "baseline",
+        })
+
+        rt_avg = state["rt_avg"]
+        rt_jump = (
+            is_up
+            and response_time is not None
+            and rt_avg is not None
+            and response_time > rt_avg * float(settings["rt_jump_factor"])
+        )
+
+        if not is_up:
+            # First failure gets a fast confirmation; a confirmed outage is
+            # then followed at the base interval
+            if state["was_up"]:
+                state["interval"], state["reason"] = confirm_s, "confirming failure"
+            else:
+                state["interval"], state["reason"] = base_s, "down"
+            state["streak"] = 0
+        elif rt_jump:
+            state["interval"], state["reason"] = confirm_s, "response time jump"
+            state["streak"] = 0
+        else:
+            if not state["was_up"] or state["interval"] < base_s:
+                state["interval"], state["reason"] = base_s, "recovered"
+                state["streak"] = 0
+            state["streak"] += 1
+            if state["streak"] >= int(settings["healthy_streak"]):
+                stretched = min(max_s, state["interval"] * float(settings["growth_factor"]))
+                if stretched > state["interval"]:
+                    state["interval"], state["reason"] = stretched, "stable"
+                state["streak"] = 0
+
+        # Jumps feed the average too, so a lasting slowdown stops counting
+        # as a jump after a few checks
+        if is_up and response_time is not None:
+            state["rt_avg"] = (
+                response_time if rt_avg is None
+                else RT_EWMA_ALPHA * response_time + (1 - RT_EWMA_ALPHA) * rt_avg
+            )
+
+        # Never stretch beyond the configured bound, even if it was lowered
+        state["interval"] = min(state["interval"], max_s)
+        state["was_up"] = is_up
+        return state
@@ -0,0 +1,429 @@
+"""
+Storage benchmarks for the WebGuard database
+
+Builds synthetic monitoring history in a temporary directory and times the
+queries the monitor and dashboard run against it. Nothing touches the real
+database.
+
+Usage:
+    python backend/benchmarks.py
+"""
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+import db
+from bitsets import DAY_SECONDS, SLOTS_PER_DAY, day_of
+from series import block_hour, encode_block
+
+
+# Synthetic fleet: one uptime check per minute, a port scan per hour
+SITES = 50
+DAYS = 14
+CHECKS_PER_DAY = 1440
+PORTS = [22, 80, 443, 21, 25, 3306, 5432, 8080]
+
+# Fleet for the uptime bitsets: checked every 5 minutes for 90 days
+BITSET_SITES = 5000
+BITSET_DAYS = 90
+
+# The checks/port_scans layout before the sites/epoch-ms migration
+LEGACY_SCHEMA = """
+CREATE TABLE checks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    client TEXT,
+    checked_at TEXT NOT NULL,
+    status_code INTEGER,
+    is_up INTEGER,
+    response_time REAL,
+    ssl_ok INTEGER,
+    ssl_days_left INTEGER,
+    error TEXT,
+    timeouts TEXT
+);
+CREATE TABLE port_scans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    hostname TEXT NOT NULL,
+    scanned_at TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    service TEXT,
+    is_open INTEGER,
+    response_time REAL,
+    status TEXT,
+    timeout REAL
+);
+CREATE INDEX idx_checks_url ON checks(url);
+CREATE INDEX idx_checks_checked_at ON checks(checked_at);
+CREATE INDEX idx_port_scans_url ON port_scans(url);
+CREATE INDEX idx_port_scans_hostname ON port_scans(hostname);
+"""
+
+
+def _timed(conn: sqlite3.Connection, sql: str, params: tuple = (), repeat: int = 5) -> float:
+    """Median wall time (ms) of a query, rows fully fetched"""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+def _size_mb(path: Path) -> float:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("VACUUM")
+    conn.close()
+    return path.stat().st_size / 1e6
+
+
+def build_legacy_db(path: Path, sites: int = SITES, days: int = DAYS, seed: int = 1):
+    """Fill a database in the legacy layout with synthetic history"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    start = datetime.utcnow() - timedelta(days=days)
+    step = timedelta(seconds=86400 / CHECKS_PER_DAY)
+    urls = [f"https://site-{i:04d}.example.com/" for i in range(sites)]
+
+    for i, url in enumerate(urls):
+        client = f"Client {i % 10}"
+        rows = []
+        ts = start
+        for n in range(days * CHECKS_PER_DAY):
+            up = rng.random() > 0.01
+            rows.append((
+                url, client, ts.isoformat(), 200 if up else None, 1 if up else 0,
+                rng.uniform(0.05, 0.6) if up else None, 1, 60, None if up else "Unable to identify",
+                '{"uptime": 10.0, "ssl": 10.0, "ports": 1.0, "content": 8.0}',
+            ))
+            ts += step
+        conn.executemany(
+            "INSERT INTO checks (url, client, checked_at, status_code, is_up, response_time, "
+            "ssl_ok, ssl_days_left, error, timeouts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+        host = url.split("/")[2]
+        scans = []
+        for hour in range(days * 24):
+            scanned_at = (start + timedelta(hours=hour)).isoformat()
+            for port in PORTS:
+                open_ = port in (80, 443)
+                scans.append((url, host, scanned_at, port, "svc", 1 if open_ else 0,
+                              rng.uniform(0.001, 0.05), "open" if open_ else "closed", 1.0))
+        conn.executemany(
+            "INSERT INTO port_scans (url, hostname, scanned_at, port, service, is_open, "
+            "response_time, status, timeout) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            scans,
+        )
+    conn.commit()
+    conn.close()
+    return urls
+
+
+def bench_schema():
+    """Size and query times before and after the normalized-schema migration"""
+    workdir = Path(tempfile.mkdtemp(prefix="webguard-bench-"))
+    legacy = workdir / "legacy.db"
+    print(f"Building {SITES} sites x {DAYS} days ({SITES * DAYS * CHECKS_PER_DAY:,} checks)...")
+    urls = build_legacy_db(legacy)
+    url = urls[SITES // 2]
+    week_ago = datetime.utcnow() - timedelta(days=7)
+
+    conn = sqlite3.connect(legacy)
+    before = {
+        "size (MB)": _size_mb(legacy),
+        "latest 500 checks": _timed(conn, "SELECT * FROM checks ORDER BY checked_at DESC LIMIT 500"),
+        "site, last 7 days": _timed(
+            conn,
+            "SELECT response_time FROM checks WHERE url = ? "
+            "AND datetime(checked_at) >= datetime(?)",
+            (url, week_ago.isoformat()),
+        ),
+        "site, last 200 RTs": _timed(
+            conn,
+            "SELECT response_time FROM checks WHERE url = ? AND response_time IS NOT NULL "
+            "ORDER BY checked_at DESC LIMIT 200",
+            (url,),
+        ),
+        "latest port scan": _timed(
+            conn,
+            "SELECT * FROM port_scans WHERE url = ? "
+            "AND scanned_at = (SELECT MAX(scanned_at) FROM port_scans WHERE url = ?)",
+            (url, url),
+        ),
+    }
+    conn.close()
+
+    migrated = workdir / "migrated.db"
+    shutil.copy(legacy, migrated)
+    db.DB_PATH = migrated
+    started = time.perf_counter()
+    db.init_db()
+    migration_s = time.perf_counter() - started
+
+    conn = sqlite3.connect(migrated)
+    site_id = conn.execute("SELECT id FROM sites WHERE url = ?", (url,)).fetchone()[0]
+    week_ago_ms = int(week_ago.timestamp() * 1000)
+    after = {
+        "size (MB)": _size_mb(migrated),
+        "latest 500 checks": _timed(conn, "SELECT * FROM checks ORDER BY id DESC LIMIT 500"),
+        "site, last 7 days": _timed(
+            conn,
+            "SELECT response_time FROM check_results WHERE site_id = ? AND ts >= ?",
+            (site_id, week_ago_ms),
+        ),
+        "site, last 200 RTs": _timed(
+            conn,
+            "SELECT response_time FROM check_results WHERE site_id = ? AND response_time IS NOT NULL "
+            "ORDER BY ts DESC LIMIT 200",
+            (site_id,),
+        ),
+        "latest port scan": _timed(
+            conn,
+            "SELECT * FROM port_results WHERE site_id = ? "
+            "AND ts = (SELECT MAX(ts) FROM port_results WHERE site_id = ?)",
+            (site_id, site_id),
+        ),
+    }
+    # The compatibility view, with the dashboard's original SQL
+    view_ms = _timed(conn, "SELECT * FROM checks ORDER BY checked_at DESC LIMIT 500", repeat=3)
+    conn.close()
+
+    print(f"Migration took {migration_s:.1f}s\n")
+    print(f"{'':22s}{'before':>12s}{'after':>12s}")
+    for name in before:
+        unit = "" if name.startswith("size") else " ms"
+        print(f"{name:22s}{before[name]:>9.2f}{unit:3s}{after[name]:>9.2f}{unit:3s}")
+    print(f"{'view, original SQL':22s}{'':12s}{view_ms:>9.2f} ms")
+    shutil.rmtree(workdir)
+
+
+def _fill_checks(path: Path, mode: str, sites: int, days: int, seed: int = 1):
+    """Store the same synthetic checks in one storage mode: sites are up
+    with a status 200 except for a few short outages a week"""
+    rng = random.Random(seed)
+    db.DB_PATH = path
+    db.init_db()
+    conn = sqlite3.connect(path)
+    start = int((time.time() - days * 86400) * 1000)
+    step = 86400 * 1000 // CHECKS_PER_DAY
+    for site_id in range(1, sites + 1):
+        conn.execute("INSERT INTO sites (id, url, client) VALUES (?, ?, 'Bench')",
+                     (site_id, f"https://site-{site_id:04d}.example.com/"))
+        outage = 0
+        rows = []
+        for n in range(days * CHECKS_PER_DAY):
+            if outage == 0 and rng.random() < 3 / (7 * CHECKS_PER_DAY):
+                outage = rng.randint(1, 15)
+            up = outage == 0
+            outage = max(0, outage - 1)
+            rows.append((site_id, start + n * step, 200 if up else None, up,
+                         rng.uniform(0.05, 0.6) if up else None, None if up else "Unable to identify"))
+        if mode == "intervals":
+            conn.executemany(
+                "INSERT INTO state_feed (site_id, ts, state, status_code, error, gap_ms) VALUES (?, ?, ?, ?, ?, ?)",
+                [(r[0], r[1], "up" if r[3] else "down", r[2], r[5], db.DEFAULT_SLA_GAP_SECONDS * 1000) for r in rows],
+            )
+            blocks: dict = {}
+            for r in rows:
+                offsets, values = blocks.setdefault(block_hour(r[1]), ([], []))
+                offsets.append(r[1] - block_hour(r[1]) * 1000)
+                values.append(r[4])
+            conn.executemany(
+                "INSERT INTO series_blocks (site_id, metric, hour, points, data) VALUES (?, 'rt', ?, ?, ?)",
+                [(site_id, hour, len(offsets), encode_block(offsets, values))
+                 for hour, (offsets, values) in blocks.items()],
+            )
+        else:
+            conn.executemany(
+                "INSERT INTO check_results (site_id, ts, status_code, is_up, response_time, error, timeouts) "
+                "VALUES (?, ?, ?, ?, ?, ?, '{\"uptime\": 10.0}')",
+                [(r[0], r[1], r[2], 1 if r[3] else 0, r[4], r[5]) for r in rows],
+            )
+    conn.commit()
+    conn.close()
+
+
+def _table_mb(path: Path, tables: list) -> float:
+    """Pages used by tables and their indexes"""
+    conn = sqlite3.connect(path)
+    size = conn.execute(
+        f"SELECT SUM(pgsize) FROM dbstat WHERE name IN ({', '.join('?' for _ in tables)}) "
+        f"OR name IN (SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name IN "
+        f"({', '.join('?' for _ in tables)}))",
+        tables + tables,
+    ).fetchone()[0]
+    conn.close()
+    return (size or 0) / 1e6
+
+
+def bench_intervals():
+    """Storage and uptime query time of the rows and intervals storage modes"""
+    workdir = Path(tempfile.mkdtemp(prefix="webguard-bench-"))
+    rows_db, intervals_db = workdir / "rows.db", workdir / "intervals.db"
+    print(f"\nStoring {SITES} sites x {DAYS} days of checks in both storage modes...")
+    _fill_checks(rows_db, "rows", SITES, DAYS)
+    _fill_checks(intervals_db, "intervals", SITES, DAYS)
+    week_ago_ms = int((time.time() - 7 * 86400) * 1000)
+
+    conn = sqlite3.connect(rows_db)
+    rows_mb = _table_mb(rows_db, ["check_results"])
+    rows_ms = _timed(conn, "SELECT AVG(is_up) FROM check_results WHERE site_id = ? AND ts >= ?",
+                     (SITES // 2, week_ago_ms))
+    conn.close()
+
+    conn = sqlite3.connect(intervals_db)
+    state_mb = _table_mb(intervals_db, ["state_intervals"])
+    series_mb = _table_mb(intervals_db, ["series_blocks"])
+    intervals = conn.execute("SELECT COUNT(*) FROM state_intervals").fetchone()[0]
+    conn.close()
+    db.DB_PATH = intervals_db
+    started = time.perf_counter()
+    for _ in range(5):
+        db.get_interval_uptime(week_ago_ms / 1000, url=f"https://site-{SITES // 2:04d}.example.com/")
+    intervals_ms = (time.perf_counter() - started) * 1000 / 5
+
+    checks = SITES * DAYS * CHECKS_PER_DAY
+    print(f"rows mode:      check_results {rows_mb:7.2f} MB ({checks:,} rows)")
+    print(f"intervals mode: state_intervals {state_mb:5.2f} MB ({intervals:,} rows), "
+          f"series_blocks {series_mb:.2f} MB")
+    print(f"site uptime, last 7 days: {rows_ms:.2f} ms (rows) vs {intervals_ms:.2f} ms (intervals, incl. connect)")
+    shutil.rmtree(workdir)
+
+
+def bench_series(seed: int = 1):
+    """Compression of the response-time series blocks against one row per point"""
+    rng = random.Random(seed)
+    workdir = Path(tempfile.mkdtemp(prefix="webguard-bench-"))
+    path = workdir / "series.db"
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+    CREATE TABLE sites (id INTEGER PRIMARY KEY, url TEXT);
+    CREATE TABLE rt_rows (site_id INTEGER, ts INTEGER, response_time REAL, PRIMARY KEY (site_id, ts)) WITHOUT ROWID;
+    CREATE TABLE series_blocks (
+        site_id INTEGER, metric TEXT, hour INTEGER, points INTEGER, data BLOB,
+        PRIMARY KEY (site_id, metric, hour)
+    ) WITHOUT ROWID;
+    """)
+
+    # Checks start on the scheduler tick with some milliseconds of jitter;
+    # each site has its own typical latency, seconds with µs precision as
+    # requests reports them, and ~1% failed checks without one
+    start = int((time.time() - DAYS * 86400) * 1000)
+    points = 0
+    for site_id in range(1, SITES + 1):
+        typical = rng.uniform(0.08, 0.8)
+        conn.execute("INSERT INTO sites VALUES (?, ?)", (site_id, f"https://site-{site_id:04d}.example.com/"))
+        rows = []
+        for n in range(DAYS * CHECKS_PER_DAY):
+            ts = start + n * 60_000 + rng.randint(0, 400)
+            rt = None if rng.random() < 0.01 else round(rng.lognormvariate(0, 0.25) * typical, 6)
+            rows.append((site_id, ts, rt))
+        conn.executemany("INSERT INTO rt_rows VALUES (?, ?, ?)", rows)
+
+        blocks: dict = {}
+        for _, ts, rt in rows:
+            hour = block_hour(ts)
+            offsets, values = blocks.setdefault(hour, ([], []))
+            offsets.append(ts - hour * 1000)
+            values.append(rt)
+        conn.executemany(
+            "INSERT INTO series_blocks VALUES (?, 'rt', ?, ?, ?)",
+            [(site_id, hour, len(o), encode_block(o, v)) for hour, (o, v) in blocks.items()],
+        )
+        points += len(rows)
+    conn.commit()
+
+    encoded = conn.execute("SELECT SUM(length(data)) FROM series_blocks").fetchone()[0]
+    day_ms = _timed(conn, "SELECT ts, response_time FROM rt_rows WHERE site_id = 1 AND ts >= ?",
+                    (start + (DAYS - 1) * 86400 * 1000,))
+    conn.close()
+    rows_mb = _table_mb(path, ["rt_rows"])
+    blocks_mb = _table_mb(path, ["series_blocks"])
+
+    db.DB_PATH = path
+    started = time.perf_counter()
+    for _ in range(5):
+        db.get_series("https://site-0001.example.com/", "rt", start / 1000 + (DAYS - 1) * 86400)
+    decode_ms = (time.perf_counter() - started) * 1000 / 5
+
+    print(f"\nResponse-time series, {SITES} sites x {DAYS} days ({points:,} points)")
+    print(f"raw (8-byte ts + 8-byte float): {points * 16 / 1e6:7.2f} MB")
+    print(f"one row per point:              {rows_mb:7.2f} MB ({rows_mb * 1e6 / points:.1f} bytes/point)")
+    print(f"hourly blocks:                  {blocks_mb:7.2f} MB ({encoded / points:.2f} bytes/point encoded)")
+    print(f"compression: {points * 16 / encoded:.1f}x vs raw, {rows_mb / blocks_mb:.1f}x vs rows on disk")
+    print(f"one site, last 24h: {day_ms:.2f} ms (rows) vs {decode_ms:.2f} ms (24 blocks decoded, incl. connect)")
+    shutil.rmtree(workdir)
+
+
+def bench_bitsets(sites: int = BITSET_SITES, days: int = BITSET_DAYS, seed: int = 1):
+    """Fleet-wide uptime and heatmap queries over the per-day uptime bitsets"""
+    rng = np.random.default_rng(seed)
+    workdir = Path(tempfile.mkdtemp(prefix="webguard-bench-"))
+    db.DB_PATH = workdir / "bitsets.db"
+    db.init_db()
+    print(f"\nBuilding uptime bitsets for {sites:,} sites x {days} days...")
+
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.executemany(
+        "INSERT INTO sites (id, url, client) VALUES (?, ?, ?)",
+        [(site_id, f"https://site-{site_id:05d}.example.com/", f"Client {site_id % 50}")
+         for site_id in range(1, sites + 1)],
+    )
+    first = day_of(int(time.time() * 1000)) - (days - 1) * DAY_SECONDS
+    day_starts = first + np.arange(days) * DAY_SECONDS
+    for site_id in range(1, sites + 1):
+        ran = np.zeros((days, SLOTS_PER_DAY), dtype=bool)
+        ran[:, site_id % 5::5] = True
+        up = ran & (rng.random((days, SLOTS_PER_DAY)) > 0.002)
+        up_bits = np.packbits(up, axis=1, bitorder="little")
+        ran_bits = np.packbits(ran, axis=1, bitorder="little")
+        conn.executemany(
+            "INSERT INTO uptime_bits VALUES (?, ?, ?, ?, ?, ?)",
+            zip([site_id] * days, day_starts.tolist(), map(bytes, up_bits), map(bytes, ran_bits),
+                up.sum(axis=1).tolist(), ran.sum(axis=1).tolist()),
+        )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    bits_mb = _table_mb(db.DB_PATH, ["uptime_bits"])
+
+    since = time.time() - days * 86400
+    started = time.perf_counter()
+    for _ in range(3):
+        uptime = db.get_slot_uptime(since)
+    uptime_ms = (time.perf_counter() - started) * 1000 / 3
+    started = time.perf_counter()
+    for _ in range(3):
+        heatmap = db.get_uptime_heatmap(days)
+    heatmap_ms = (time.perf_counter() - started) * 1000 / 3
+    started = time.perf_counter()
+    for _ in range(5):
+        db.get_slot_uptime(since, url="https://site-00001.example.com/")
+    site_ms = (time.perf_counter() - started) * 1000 / 5
+
+    fleet = statistics.mean(u["uptime_pct"] for u in uptime.values())
+    print(f"uptime_bits: {bits_mb:.1f} MB ({sites * days:,} site-days)")
+    print(f"{days}-day uptime, all {len(uptime):,} sites:  {uptime_ms:7.1f} ms (mean {fleet:.3f}%)")
+    print(f"{days}-day heatmap, {heatmap['up_slots'].shape[0]:,} x {heatmap['up_slots'].shape[1]}: "
+          f"{heatmap_ms:7.1f} ms")
+    print(f"{days}-day uptime, one site:     {site_ms:7.1f} ms (incl. connect)")
+    shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    bench_schema()
+    bench_intervals()
+    bench_series()
+    bench_bitsets()
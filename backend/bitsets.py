@@ -0,0 +1,101 @@
+from typing import Optional
+
+import numpy as np
+
+
+# Each site-day is split into one-minute slots (the shortest scheduled
+# uptime interval); a bitset holds one bit per slot, least significant
+# bit first
+SLOT_SECONDS = 60
+DAY_SECONDS = 86400
+SLOTS_PER_DAY = DAY_SECONDS // SLOT_SECONDS
+BITSET_BYTES = SLOTS_PER_DAY // 8
+
+# Set bits of every byte value, for popcounts on any numpy version
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint16)
+
+
+def day_of(ts_ms: int) -> int:
+    """Start (epoch seconds, UTC) of the day a timestamp belongs to"""
+    seconds = ts_ms // 1000
+    return seconds - seconds % DAY_SECONDS
+
+
+def slot_of(ts_ms: int) -> int:
+    """Slot of a timestamp within its day"""
+    return (ts_ms // 1000) % DAY_SECONDS // SLOT_SECONDS
+
+
+def bitset_mark(bits: Optional[bytes], ran: Optional[bytes], slot: int, value) -> bytes:
+    """
+    SQL function bitset_mark(bits, ran, slot, value): bits with the slot set
+    to value, or to (old bit AND value) when ran already has the slot. When
+    several checks share a slot, the slot is up only if all of them were.
+
+    Args:
+        bits: Bitset to update, or None for an empty one
+        ran: Mask of the slots checked so far, or None
+        slot: Slot index within the day
+        value: Truthy for a set bit
+    """
+    out = bytearray(bits) if bits else bytearray(BITSET_BYTES)
+    byte, bit = divmod(slot, 8)
+    seen = bool(ran) and ran[byte] >> bit & 1
+    if value and (not seen or out[byte] >> bit & 1):
+        out[byte] |= 1 << bit
+    else:
+        out[byte] &= ~(1 << bit) & 0xFF
+    return bytes(out)
+
+
+def bitset_count(bits: Optional[bytes]) -> int:
+    """SQL function bitset_count(bits): number of set bits"""
+    return int.from_bytes(bits, "little").bit_count() if bits else 0
+
+
+class BitsetAgg:
+    """SQL aggregate bitset_agg(slot, value) following bitset_mark's rule"""
+
+    def __init__(self):
+        self.bits = None
+        self.ran = None
+
+    def step(self, slot, value):
+        if slot is None:
+            return
+        self.bits = bitset_mark(self.bits, self.ran, slot, value)
+        self.ran = bitset_mark(self.ran, self.ran, slot, 1)
+
+    def finalize(self):
+        return self.bits
+
+
+def popcount(bitsets: np.ndarray) -> np.ndarray:
+    """Set bits per row of a (rows, BITSET_BYTES) uint8 array"""
+    return _POPCOUNT[bitsets].sum(axis=-1, dtype=np.int64)
+
+
+def slot_mask(start_slot: int, end_slot: int) -> np.ndarray:
+    """Bitset (uint8 array) with the slots in [start_slot, end_slot) set"""
+    slots = np.zeros(SLOTS_PER_DAY, dtype=bool)
+    slots[max(0, start_slot):max(0, end_slot)] = True
+    return np.packbits(slots, bitorder="little")
+
+
+def to_array(blobs: list) -> np.ndarray:
+    """Stack bitset blobs into a (len(blobs), BITSET_BYTES) uint8 array"""
+    if not blobs:
+        return np.empty((0, BITSET_BYTES), dtype=np.uint8)
+    return np.frombuffer(b"".join(blobs), dtype=np.uint8).reshape(len(blobs), BITSET_BYTES)
+
+
+def unpack_slots(blobs: list) -> np.ndarray:
+    """Bitset blobs as a (len(blobs), SLOTS_PER_DAY) bool array, slot order"""
+    return np.unpackbits(to_array(blobs), axis=1, bitorder="little").astype(bool)
+
+
+def register_bitset_functions(conn):
+    """Make the uptime bitset functions available on a connection"""
+    conn.create_function("bitset_mark", 4, bitset_mark, deterministic=True)
+    conn.create_function("bitset_count", 1, bitset_count, deterministic=True)
+    conn.create_aggregate("bitset_agg", 2, BitsetAgg)
@@ -0,0 +1,159 @@
+import time
+from typing import Dict, Optional
+
+from port_check import MONITORED_PORTS
+
+
+# Every probe check_single_website knows how to run
+CHECK_TYPES = ("uptime", "dns", "ssl", "ports", "reputation", "content")
+
+# Default cadence per check type (minutes). "uptime" falls back to
+# check_interval_minutes so existing configs keep their behaviour.
+DEFAULT_CADENCE_MINUTES = {
+    "dns": 5,
+    "content": 15,
+    "ports": 60,
+    "ssl": 1440,
+    "reputation": 1440,
+}
+
+# Outbound connections opened by one run of each check type
+CONNECTIONS_PER_CHECK = {
+    "uptime": 1,
+    "dns": 1,
+    "ssl": 1,
+    "ports": len(MONITORED_PORTS),
+    "reputation": 0,
+    "content": 1,
+    # DNS lookup + one TCP connect while a circuit breaker is open
+    "probe": 2,
+}
+
+
+def site_cadence(config: dict, site: dict | str) -> Dict[str, float]:
+    """
+    Resolve the cadence (in seconds) of every check type for one site
+
+    Per-site "cadence" entries override the global "check_cadence_minutes",
+    which override DEFAULT_CADENCE_MINUTES.
+
+    Args:
+        config: Full monitor configuration
+        site: Website entry from config["websites"]
+
+    Returns:
+        Dictionary of check type -> cadence in seconds
+    """
+    minutes = dict(DEFAULT_CADENCE_MINUTES)
+    minutes["uptime"] = config.get("check_interval_minutes", 5)
+    minutes.update(config.get("check_cadence_minutes", {}))
+
+    if isinstance(site, dict):
+        minutes.update(site.get("cadence", {}))
+
+    return {check: float(minutes[check]) * 60 for check in CHECK_TYPES}
+
+
+class CadenceTracker:
+    """
+    Remembers when each (url, check) last ran and what it returned, so a
+    scheduler tick only runs the checks that are due and reuses the last
+    result for the rest.
+    """
+
+    def __init__(self, tick_seconds: float):
+        self.tick_seconds = tick_seconds
+        self._last_run: Dict[tuple, float] = {}
+        self._last_result: Dict[tuple, object] = {}
+        self._seeded: set[str] = set()
+        # (timestamp, connections opened, connections without cadence)
+        self._connection_log: list[tuple[float, int, int]] = []
+
+    def is_seeded(self, url: str) -> bool:
+        """Whether stored results for a URL were already loaded"""
+        return url in self._seeded
+
+    def seed(self, url: str, last_results: Dict[str, tuple]):
+        """
+        Prime the tracker with results stored before a restart
+
+        Args:
+            url: Website URL
+            last_results: Check type -> (ran_at_epoch, result)
+        """
+        self._seeded.add(url)
+        for check, (ran_at, result) in last_results.items():
+            key = (url, check)
+            if key not in self._last_run:
+                self._last_run[key] = ran_at
+                self._last_result[key] = result
+
+    def due_checks(self, url: str, cadence: Dict[str, float], now: Optional[float] = None) -> set[str]:
+        """
+        Return the check types that are due for a URL
+
+        A check is due once its cadence has elapsed, minus half a tick of
+        slack so a 60s cadence on a 10s tick doesn't drift to 70s.
+        """
+        now = time.time() if now is None else now
+        slack = self.tick_seconds / 2
+        due = set()
+        for check in CHECK_TYPES:
+            last = self._last_run.get((url, check))
+            if last is None or now - last >= cadence[check] - slack:
+                due.add(check)
+        return due
+
+    def record(self, url: str, check: str, result: object, now: Optional[float] = None):
+        """Store the result of a check that just ran"""
+        key = (url, check)
+        self._last_run[key] = time.time() if now is None else now
+        self._last_result[key] = result
+
+    def skip(self, url: str, check: str, now: Optional[float] = None):
+        """Count a due check as run without touching its last result (its
+        host is behind an open circuit breaker, or the check was skipped or
+        timed out), so it isn't due again until its cadence elapses"""
+        self._last_run[(url, check)] = time.time() if now is None else now
+
+    def last_result(self, url: str, check: str, default: object = None) -> object:
+        """Return the last stored result of a check, or default"""
+        return self._last_result.get((url, check), default)
+
+    def forget(self, active_urls: set[str]):
+        """Drop state for websites that are no longer configured"""
+        for key in [k for k in self._last_run if k[0] not in active_urls]:
+            self._last_run.pop(key, None)
+            self._last_result.pop(key, None)
+        self._seeded &= active_urls
+
+    def record_connections(self, ran: set[str], due: set[str] | None = None, now: Optional[float] = None):
+        """
+        Account outbound connections for one site in this tick, next to
+        what the same tick would have cost if every check ran every time.
+
+        Args:
+            ran: Check types that actually ran
+            due: Check types that were due, when some were skipped
+        """
+        now = time.time() if now is None else now
+        due = ran if due is None else due
+        opened = sum(CONNECTIONS_PER_CHECK[c] for c in ran)
+        baseline = sum(CONNECTIONS_PER_CHECK[c] for c in CHECK_TYPES) if "uptime" in due else 0
+        self._connection_log.append((now, opened, baseline))
+
+    def connections_last_hour(self, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Outbound connections over the last hour
+
+        Returns:
+            Dictionary with 'opened' and 'baseline' (every check on every
+            uptime run) connection counts
+        """
+        now = time.time() if now is None else now
+        cutoff = now - 3600
+        self._connection_log = [entry for entry in self._connection_log if entry[0] >= cutoff]
+        return {
+            "opened": sum(entry[1] for entry in self._connection_log),
+            "baseline": sum(entry[2] for entry in self._connection_log),
+        }
@@ -0,0 +1,109 @@
+import time
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, NamedTuple, Optional
+
+
+# Stage outcomes
+OK = "ok"
+FAILED = "failed"
+SKIPPED = "skipped"
+TIMED_OUT = "timed out"
+
+
+class Stage(NamedTuple):
+    """
+    One check in the per-site dependency graph
+
+    func(dep_results, deadline) returns (ok: bool, value). deadline is a
+    time.monotonic() value the stage should clip its own timeouts to.
+    """
+    name: str
+    func: Callable[[dict, float], tuple]
+    deps: tuple = ()
+
+
+def remaining(deadline: float, floor: float = 0.1) -> float:
+    """Seconds left until a monotonic deadline, never below floor"""
+    return max(floor, deadline - time.monotonic())
+
+
+def _result(status: str, ok: bool, value: object = None, elapsed: float = 0.0) -> dict:
+    return {"status": status, "ok": ok, "value": value, "elapsed": elapsed}
+
+
+def run_stages(
+    stages: list[Stage],
+    deadline_s: float,
+    executor: Executor,
+    preset: Optional[Dict[str, dict]] = None,
+) -> Dict[str, dict]:
+    """
+    Run a dependency graph of stages under one deadline
+
+    Stages whose dependencies all succeeded run concurrently on executor.
+    A stage with a failed (or skipped) dependency is skipped without
+    running. When the deadline passes, stages still running or waiting
+    are reported as timed out and abandoned.
+
+    Args:
+        stages: Stages to run
+        deadline_s: Seconds the whole graph may take
+        executor: Executor the stage functions run on
+        preset: Results of stages that are not run this time but that
+            others depend on (e.g. the last DNS result); missing
+            dependencies count as satisfied
+
+    Returns:
+        Dictionary of stage name -> {'status', 'ok', 'value', 'elapsed'}
+    """
+    deadline = time.monotonic() + deadline_s
+    results: Dict[str, dict] = dict(preset or {})
+    pending = {stage.name: stage for stage in stages}
+    running = {}
+
+    while pending or running:
+        # Start (or short-circuit) every stage whose dependencies are done
+        progressed = True
+        while progressed:
+            progressed = False
+            for name, stage in list(pending.items()):
+                deps = [d for d in stage.deps if d in results or d in pending or d in running.values()]
+                if any(d not in results for d in deps):
+                    continue
+                del pending[name]
+                progressed = True
+                failed = [d for d in deps if not results[d]["ok"]]
+                if failed:
+                    results[name] = _result(SKIPPED, False, f"{', '.join(failed)} failed")
+                    continue
+                dep_results = {d: results[d] for d in deps}
+                future = executor.submit(stage.func, dep_results, deadline)
+                running[future] = name
+
+        if not running:
+            break
+
+        left = deadline - time.monotonic()
+        done = set()
+        if left > 0:
+            done, _ = wait(running, timeout=left, return_when=FIRST_COMPLETED)
+
+        if not done:
+            # Deadline passed: abandon whatever is still in flight
+            for future, name in running.items():
+                future.cancel()
+                results[name] = _result(TIMED_OUT, False, "Deadline exceeded", deadline_s)
+            for name in pending:
+                results[name] = _result(TIMED_OUT, False, "Deadline exceeded", deadline_s)
+            break
+
+        for future in done:
+            name = running.pop(future)
+            elapsed = deadline_s - (deadline - time.monotonic())
+            try:
+                ok, value = future.result()
+                results[name] = _result(OK if ok else FAILED, bool(ok), value, elapsed)
+            except Exception as e:
+                results[name] = _result(FAILED, False, str(e), elapsed)
+
+    return results
@@ -0,0 +1,114 @@
+import time
+from typing import Dict, Optional
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+# Defaults for config["circuit_breaker"]
+DEFAULT_BREAKER = {
+    "enabled": True,
+    "failure_threshold": 3,       # consecutive host failures before opening
+    "base_backoff_seconds": 60,   # first wait between cheap probes
+    "max_backoff_seconds": 1800,  # backoff doubles up to this bound
+    "probe_timeout_seconds": 2,   # timeout of the cheap probe
+}
+
+
+def breaker_settings(config: dict) -> dict:
+    """Merge config["circuit_breaker"] over the defaults"""
+    settings = dict(DEFAULT_BREAKER)
+    settings.update(config.get("circuit_breaker", {}))
+    return settings
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker
+
+    CLOSED runs the full check. After failure_threshold consecutive host
+    failures (DNS or connection errors) it goes OPEN: only a cheap probe
+    runs, on an exponential backoff. A successful probe moves it to
+    HALF_OPEN, where one full check decides between CLOSED and OPEN.
+    """
+
+    def __init__(self):
+        # host -> {'state', 'failures', 'opened_at', 'next_probe_at', 'backoff', 'last_error'}
+        self._hosts: Dict[str, dict] = {}
+
+    def restore(self, host: str, state: dict):
+        """Restore a host's state stored before a restart"""
+        self._hosts[host] = dict(state)
+
+    def state(self, host: str) -> dict:
+        return self._hosts.setdefault(host, {
+            "state": CLOSED,
+            "failures": 0,
+            "opened_at": None,
+            "next_probe_at": None,
+            "backoff": None,
+            "last_error": None,
+        })
+
+    def decide(self, host: str, now: Optional[float] = None) -> str:
+        """
+        What to run for a host in this tick
+
+        Returns:
+            "full" (closed or half-open), "probe" (open, backoff elapsed)
+            or "wait" (open, still backing off)
+        """
+        now = time.time() if now is None else now
+        entry = self.state(host)
+        if entry["state"] != OPEN:
+            return "full"
+        if entry["next_probe_at"] is None or now >= entry["next_probe_at"]:
+            return "probe"
+        return "wait"
+
+    def record_check(self, host: str, ok: bool, error: Optional[str], settings: dict,
+                     now: Optional[float] = None) -> bool:
+        """
+        Feed the outcome of a full check
+
+        Returns:
+            True if the host's state changed
+        """
+        now = time.time() if now is None else now
+        entry = self.state(host)
+        before = (entry["state"], entry["failures"])
+
+        if ok:
+            entry.update(state=CLOSED, failures=0, opened_at=None, next_probe_at=None,
+                         backoff=None, last_error=None)
+        else:
+            entry["failures"] += 1
+            entry["last_error"] = error
+            if entry["state"] == HALF_OPEN:
+                self._open(entry, settings, now, grow=True)
+            elif entry["failures"] >= int(settings["failure_threshold"]):
+                self._open(entry, settings, now, grow=False)
+
+        return before != (entry["state"], entry["failures"])
+
+    def record_probe(self, host: str, ok: bool, error: Optional[str], settings: dict,
+                     now: Optional[float] = None):
+        """Feed the outcome of a cheap probe run while OPEN"""
+        now = time.time() if now is None else now
+        entry = self.state(host)
+        if ok:
+            entry["state"] = HALF_OPEN
+        else:
+            entry["last_error"] = error
+            self._open(entry, settings, now, grow=True)
+
+    def _open(self, entry: dict, settings: dict, now: float, grow: bool):
+        base = float(settings["base_backoff_seconds"])
+        if grow and entry["backoff"]:
+            backoff = min(entry["backoff"] * 2, float(settings["max_backoff_seconds"]))
+        else:
+            backoff = base
+        if entry["state"] != OPEN:
+            entry["opened_at"] = entry["opened_at"] or now
+        entry.update(state=OPEN, backoff=backoff, next_probe_at=now + backoff)
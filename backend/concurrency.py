@@ -0,0 +1,208 @@
+import statistics
+import threading
+import time
+from typing import Dict, Optional
+
+
+# How fast a site's baseline latency may creep up per observation, so a
+# site that got permanently slower stops looking congested
+BASELINE_DRIFT = 0.05
+
+# Defaults for config["concurrency"]
+DEFAULT_CONCURRENCY = {
+    "initial": 4,                # in-flight site checks at startup
+    "min": 1,
+    "max": 64,
+    "additive_step": 1,          # added per healthy window while saturated
+    "decrease_factor": 0.5,      # applied on a congestion signal
+    "latency_inflation": 2.0,    # median latency / site baseline = congestion
+    "error_rate_threshold": 0.3, # share of new connection errors = congestion
+    "window": 10,                # completed checks per adjustment
+}
+
+
+def concurrency_settings(config: dict) -> dict:
+    """Merge config["concurrency"] over the defaults"""
+    settings = dict(DEFAULT_CONCURRENCY)
+    settings.update(config.get("concurrency", {}))
+    return settings
+
+
+class AIMDController:
+    """
+    Additive-increase / multiplicative-decrease limit on in-flight site
+    checks.
+
+    Every `window` completed checks the controller looks at how inflated
+    latencies are relative to each site's own baseline (its lowest recent
+    latency) and at the share of checks that newly failed to connect.
+    Either signal means the monitor is saturating its own network path, so
+    the limit is cut by decrease_factor. Otherwise, if the limit was
+    actually the bottleneck (work was queued) or cycles are lagging behind
+    the tick, it grows by additive_step.
+    """
+
+    def __init__(self, settings: Optional[dict] = None):
+        self._lock = threading.Lock()
+        self.settings = dict(settings or DEFAULT_CONCURRENCY)
+        self._limit = float(self.settings["initial"])
+        self._baselines: Dict[str, float] = {}
+        self._ratios: list[float] = []
+        self._errors = 0
+        self._completed = 0
+        self._saturated = False
+        self._lagging = False
+        self.last_signal = "start"
+        self.last_inflation: Optional[float] = None
+        self.last_error_rate = 0.0
+        # (epoch, limit, signal) after every adjustment
+        self.history: list[tuple[float, int, str]] = []
+
+    def configure(self, settings: dict):
+        """Apply fresh settings, keeping the learned limit within bounds"""
+        with self._lock:
+            self.settings = dict(settings)
+            self._limit = self._clamp(self._limit)
+
+    def limit(self) -> int:
+        with self._lock:
+            return int(self._limit)
+
+    def note_saturated(self):
+        """Work was waiting because the limit was reached"""
+        with self._lock:
+            self._saturated = True
+
+    def end_cycle(self, lag_s: float):
+        """Report how far a cycle overran its tick (0 if it didn't)"""
+        with self._lock:
+            self._lagging = self._lagging or lag_s > 0
+
+    def observe(self, key: str, latency: Optional[float], connect_error: bool):
+        """
+        Feed one completed site check
+
+        Args:
+            key: Site the latency belongs to (baselines are per site)
+            latency: Response latency in seconds, if it connected
+            connect_error: The check failed to connect although the site
+                answered before (dead sites don't count as congestion)
+        """
+        with self._lock:
+            self._completed += 1
+            if latency is not None and latency > 0:
+                base = self._baselines.get(key)
+                if base is not None:
+                    self._ratios.append(latency / base)
+                    base = min(latency, base * (1 + BASELINE_DRIFT))
+                self._baselines[key] = latency if base is None else base
+            if connect_error:
+                self._errors += 1
+            if self._completed >= int(self.settings["window"]):
+                self._adjust()
+
+    def forget(self, active_keys: set[str]):
+        """Drop baselines of websites that are no longer configured"""
+        with self._lock:
+            for key in [k for k in self._baselines if k not in active_keys]:
+                del self._baselines[key]
+
+    def _adjust(self):
+        settings = self.settings
+        self.last_error_rate = self._errors / self._completed
+        self.last_inflation = statistics.median(self._ratios) if self._ratios else None
+
+        inflated = self.last_inflation is not None and self.last_inflation > float(settings["latency_inflation"])
+        if inflated or self.last_error_rate > float(settings["error_rate_threshold"]):
+            self._limit = self._clamp(self._limit * float(settings["decrease_factor"]))
+            if inflated:
+                self.last_signal = f"latency x{self.last_inflation:.1f}"
+            else:
+                self.last_signal = f"errors {self.last_error_rate:.0%}"
+        elif self._saturated or self._lagging:
+            self._limit = self._clamp(self._limit + float(settings["additive_step"]))
+            self.last_signal = "saturated" if self._saturated else "cycle lag"
+        else:
+            self.last_signal = "steady"
+
+        self.history.append((time.time(), int(self._limit), self.last_signal))
+        del self.history[:-1000]
+        self._ratios = []
+        self._errors = 0
+        self._completed = 0
+        self._saturated = False
+        self._lagging = False
+
+    def _clamp(self, value: float) -> float:
+        return max(float(self.settings["min"]), min(float(self.settings["max"]), value))
+
+
+# Example usage: a local stand-in fleet whose latency grows with the
+# number of requests in flight, like a saturated NAT/conntrack path
+if __name__ == "__main__":
+    import http.server
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+    BASE_LATENCY = 0.05    # seconds per request when idle
+    KNEE = 16              # in-flight requests the path handles for free
+    PER_EXTRA = 0.02       # added latency per request beyond the knee
+    FLEET = 200            # stand-in sites
+    CYCLES = 12
+
+    in_flight = 0
+    in_flight_lock = threading.Lock()
+
+    class StandInSite(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            global in_flight
+            with in_flight_lock:
+                in_flight += 1
+                load = in_flight
+            time.sleep(BASE_LATENCY + max(0, load - KNEE) * PER_EXTRA)
+            with in_flight_lock:
+                in_flight -= 1
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StandInSite)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = [f"http://127.0.0.1:{server.server_port}/site/{i}" for i in range(FLEET)]
+
+    def fetch(url: str) -> float:
+        started = time.monotonic()
+        urllib.request.urlopen(url, timeout=5).read()
+        return time.monotonic() - started
+
+    controller = AIMDController({**DEFAULT_CONCURRENCY, "initial": 2, "window": 20})
+    pool = ThreadPoolExecutor(max_workers=DEFAULT_CONCURRENCY["max"])
+
+    print(f"Stand-in fleet: {FLEET} sites, latency {BASE_LATENCY * 1000:.0f}ms "
+          f"+ {PER_EXTRA * 1000:.0f}ms per request beyond {KNEE} in flight\n")
+    for cycle in range(CYCLES):
+        started = time.monotonic()
+        first = len(controller.history)
+        queue = list(urls)
+        running = {}
+        latencies = []
+        while queue or running:
+            while queue and len(running) < controller.limit():
+                url = queue.pop()
+                running[pool.submit(fetch, url)] = url
+            if queue:
+                controller.note_saturated()
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = running.pop(future)
+                latency = future.result()
+                latencies.append(latency)
+                controller.observe(url, latency, False)
+        elapsed = time.monotonic() - started
+        limits = [limit for _, limit, _ in controller.history[first:]]
+        print(f"cycle {cycle + 1:2d}: {elapsed:4.2f}s, median latency {statistics.median(latencies) * 1000:5.1f}ms, "
+              f"limit {min(limits):2d}-{max(limits):2d}, now {controller.limit():2d} ({controller.last_signal})")
+
+    server.shutdown()
@@ -0,0 +1,133 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Windows has no RLIMIT_NOFILE
+    resource = None
+
+
+# Lower value = served first when sockets are scarce
+PROBE_PRIORITY = {
+    "uptime": 0,
+    "probe": 0,
+    "dns": 1,
+    "content": 2,
+    "ssl": 3,
+    "ports": 4,
+}
+
+# File descriptors kept free for SQLite, logs, SMTP and the interpreter
+RESERVED_FDS = 64
+
+# Share of the remaining descriptors probes may hold at once
+PROBE_FD_SHARE = 0.8
+
+# Budget used when the fd limit can't be read
+FALLBACK_CAPACITY = 256
+
+
+class BudgetTimeout(Exception):
+    """Raised when no connection slot frees up before the caller's deadline"""
+
+
+def capacity_from_fd_limit() -> int:
+    """Connection slots derived from the process's soft RLIMIT_NOFILE"""
+    if resource is None:
+        return FALLBACK_CAPACITY
+    try:
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except (ValueError, OSError):
+        return FALLBACK_CAPACITY
+    if soft == resource.RLIM_INFINITY:
+        return FALLBACK_CAPACITY
+    return max(8, int((soft - RESERVED_FDS) * PROBE_FD_SHARE))
+
+
+class ConnectionBudget:
+    """
+    Process-wide budget of simultaneously open probe sockets
+
+    Every probe acquires slots before it opens a socket and releases them
+    when it closes it. When slots run out callers queue, uptime probes
+    ahead of scans, instead of failing with EMFILE.
+    """
+
+    def __init__(self, capacity: Optional[int] = None):
+        self.capacity = capacity or capacity_from_fd_limit()
+        self._available = self.capacity
+        self._cond = threading.Condition()
+        self._waiters: list = []  # heap of (priority, seq, slots)
+        self._seq = itertools.count()
+        # kind -> {'acquired', 'waited', 'wait_total', 'wait_max'}
+        self._stats: Dict[str, dict] = {}
+
+    def acquire(self, kind: str, slots: int = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Take `slots` connection slots, waiting in priority order
+
+        Returns:
+            False if the timeout expired first
+        """
+        slots = max(1, min(slots, self.capacity))
+        entry = (PROBE_PRIORITY.get(kind, len(PROBE_PRIORITY)), next(self._seq), slots)
+        started = time.monotonic()
+        end = None if timeout is None else started + timeout
+
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while self._waiters[0] is not entry or self._available < slots:
+                    left = None if end is None else end - time.monotonic()
+                    if left is not None and left <= 0:
+                        return False
+                    self._cond.wait(left)
+                heapq.heappop(self._waiters)
+                self._available -= slots
+            finally:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                # The head of the queue may have changed
+                self._cond.notify_all()
+
+            self._record_wait(kind, time.monotonic() - started)
+            return True
+
+    def release(self, slots: int = 1):
+        """Give back slots taken with acquire()"""
+        slots = max(1, min(slots, self.capacity))
+        with self._cond:
+            self._available = min(self.capacity, self._available + slots)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, kind: str, slots: int = 1, timeout: Optional[float] = None):
+        """Hold connection slots for the duration of a with-block"""
+        if not self.acquire(kind, slots, timeout):
+            raise BudgetTimeout(f"No connection slot for {kind} within {timeout:.1f}s")
+        try:
+            yield
+        finally:
+            self.release(slots)
+
+    def stats(self) -> Dict[str, dict]:
+        """Acquisitions and time spent waiting for the budget, per probe kind"""
+        with self._cond:
+            return {kind: dict(values) for kind, values in self._stats.items()}
+
+    def in_use(self) -> int:
+        with self._cond:
+            return self.capacity - self._available
+
+    def _record_wait(self, kind: str, waited: float):
+        stats = self._stats.setdefault(kind, {"acquired": 0, "waited": 0, "wait_total": 0.0, "wait_max": 0.0})
+        stats["acquired"] += 1
+        if waited > 0.001:
+            stats["waited"] += 1
+            stats["wait_total"] += waited
+            stats["wait_max"] = max(stats["wait_max"], waited)
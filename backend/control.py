@@ -0,0 +1,178 @@
+import json
+import threading
+from collections import deque
+from concurrent.futures import Future, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+
+# Defaults for config["control"]
+DEFAULT_CONTROL = {
+    "enabled": True,
+    "host": "127.0.0.1",         # loopback only: the API has no authentication
+    "port": 8765,
+    "timeout_seconds": 30,       # longest a caller waits for its results
+}
+
+
+def control_settings(config: dict) -> dict:
+    """Merge config["control"] over the defaults"""
+    settings = dict(DEFAULT_CONTROL)
+    settings.update(config.get("control", {}))
+    return settings
+
+
+class CheckNowQueue:
+    """
+    Priority lane of on-demand site checks
+
+    Requests are keyed by URL. A request for a site that is already queued
+    or running joins that check instead of starting another (singleflight),
+    so any number of callers share one result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: deque = deque()
+        self._in_flight: dict = {}  # url -> Future
+        self._ready = threading.Event()
+        self.coalesced = 0
+
+    def submit(self, url: str) -> Future:
+        """Future of a check of url, shared with any identical request in flight"""
+        with self._lock:
+            future = self._in_flight.get(url)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = self._in_flight[url] = Future()
+            self._pending.append(url)
+            self._ready.set()
+            return future
+
+    def take(self) -> list:
+        """URLs requested since the last call, oldest first"""
+        with self._lock:
+            urls = list(self._pending)
+            self._pending.clear()
+            self._ready.clear()
+            return urls
+
+    def wait(self, timeout: float) -> bool:
+        """Block until a request is pending or timeout; True if one is"""
+        return self._ready.wait(timeout)
+
+    def resolve(self, url: str, result: Optional[dict] = None, error: Optional[str] = None):
+        """Hand the result (or an error) to every caller waiting on url"""
+        with self._lock:
+            future = self._in_flight.pop(url, None)
+        if future is None:
+            return
+        if error is not None:
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result(result)
+
+    def abandon(self, urls, error: str):
+        """Fail the checks of urls that were taken but never resolved; a
+        newer request for the same URL that is still queued is left alone"""
+        with self._lock:
+            urls = [u for u in urls if u in self._in_flight and u not in self._pending]
+        for url in urls:
+            self.resolve(url, error=error)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"pending": len(self._pending), "in_flight": len(self._in_flight), "coalesced": self.coalesced}
+
+
+def _handler(queue: CheckNowQueue, targets: Callable[[Optional[str], Optional[str]], list], timeout_s: float):
+    class ControlHandler(BaseHTTPRequestHandler):
+        """
+        GET  /health                    -> queue stats
+        POST /check {"url": ...}        -> check one site now
+        POST /check {"client": ...}     -> check all of a client's sites now
+
+        /check answers once every requested check finished: 200 with
+        {"results": [...]} (a failed check carries "error"), 404 when no
+        monitored site matches, 504 when the checks outlast the timeout.
+        It only takes Content-Type: application/json, which a browser
+        won't send cross-origin without a preflight this server never
+        answers, so a web page can't trigger checks.
+        """
+
+        def _reply(self, code: int, body: dict):
+            data = json.dumps(body, default=str).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path != "/health":
+                return self._reply(404, {"error": "Not found"})
+            self._reply(200, {"ok": True, **queue.stats()})
+
+        def do_POST(self):
+            if self.path != "/check":
+                return self._reply(404, {"error": "Not found"})
+            content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+            if content_type != "application/json":
+                return self._reply(415, {"error": "Expected Content-Type: application/json"})
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                url, client = body.get("url"), body.get("client")
+            except (ValueError, AttributeError):
+                return self._reply(400, {"error": "Expected a JSON object"})
+            if not url and not client:
+                return self._reply(400, {"error": "Give a url or a client"})
+
+            urls = targets(url, client)
+            if not urls:
+                return self._reply(404, {"error": "No monitored site matches"})
+
+            futures = {u: queue.submit(u) for u in urls}
+            done, not_done = wait(futures.values(), timeout=timeout_s)
+            if not_done:
+                return self._reply(504, {"error": f"Checks still running after {timeout_s:g}s"})
+            results = []
+            for u, future in futures.items():
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append({"url": u, "error": str(e)})
+            self._reply(200, {"results": results})
+
+        def log_message(self, format, *args):
+            pass
+
+    return ControlHandler
+
+
+def start_control_server(settings: dict, queue: CheckNowQueue,
+                         targets: Callable[[Optional[str], Optional[str]], list]) -> Optional[ThreadingHTTPServer]:
+    """
+    Serve the control API on a daemon thread
+
+    Args:
+        settings: Result of control_settings()
+        queue: Lane the check-now requests go to
+        targets: Maps (url, client) of a request to the monitored URLs
+            it covers
+
+    Returns:
+        The server, or None if disabled or the address is in use
+    """
+    if not settings["enabled"]:
+        return None
+    handler = _handler(queue, targets, float(settings["timeout_seconds"]))
+    try:
+        server = ThreadingHTTPServer((settings["host"], int(settings["port"])), handler)
+    except OSError as e:
+        print(f"⚠️ Control API not started on {settings['host']}:{settings['port']}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="control-api", daemon=True).start()
+    return server
@@ -1,11 +1,797 @@
 from pathlib import Path
+import atexit
+import json
+import queue
 import sqlite3
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import Future
+from itertools import chain
 from typing import Optional
 
+import numpy as np
+
+from bitsets import (DAY_SECONDS, SLOT_SECONDS, SLOTS_PER_DAY, day_of, popcount,
+                     register_bitset_functions, slot_mask, slot_of, to_array)
+from series import block_hour, decode_block, encode_block, register_series_functions
+from sketch import RTSketch, register_sketch_functions
+
 # db/webguard.db relative to project root
 DB_PATH = Path(__file__).parent.parent / "db" / "webguard.db"
 
+# Queued writes are committed together once this many rows are waiting...
+FLUSH_ROWS = 500
+
+# ...or this many seconds after the oldest of them was queued
+FLUSH_SECONDS = 2.0
+
+# A batch that can't commit because another connection holds the write
+# lock past busy_timeout is retried whole, waiting twice as long each time
+# up to the max, and dropped once it has been failing this long. Any other
+# error is not retried: the batch is written again group by group at once
+# and only the groups that fail are dropped.
+WRITE_RETRY_SECONDS = 0.5
+WRITE_RETRY_MAX_SECONDS = 30.0
+WRITE_GIVE_UP_SECONDS = 600.0
+
+# Longest a check thread waits for the writer to create a sites row
+SITE_WRITE_TIMEOUT_SECONDS = 30.0
+
+# Bucket sizes (seconds) of the uptime/response-time rollups
+ROLLUP_RESOLUTIONS = (60, 3600, 86400)
+
+# How uptime checks are stored: "rows" keeps one check_results row per
+# check; "intervals" keeps one state_intervals row per run of identical
+# checks, with response times only in the series blocks
+STORAGE_MODES = ("rows", "intervals")
+DEFAULT_STORAGE = {"mode": "rows"}
+STORAGE_MODE = DEFAULT_STORAGE["mode"]
+
+# Silence after a check beyond which SLA time is unknown, per URL (set by
+# the monitor from each site's cadence) and for sites it hasn't set
+DEFAULT_SLA_GAP_SECONDS = 900
+_SLA_GAPS: dict = {}
+
+# Connection settings of the writer. WAL lets the dashboard read while the
+# monitor writes; NORMAL sync is durable in WAL mode except on power loss.
+WRITER_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+def _ensure_column(c: sqlite3.Cursor, table: str, column: str, declaration: str):
+    """Add a column to an existing table if an older schema lacks it"""
+    columns = [row[1] for row in c.execute(f"PRAGMA table_info({table})")]
+    if column not in columns:
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+
+def _now_ms() -> int:
+    """Current time as integer epoch milliseconds"""
+    return int(time.time() * 1000)
+
+
+def _iso_sql(column: str) -> str:
+    """SQL expression rendering an epoch-ms column as the old ISO-8601 text"""
+    return f"strftime('%Y-%m-%dT%H:%M:%f', {column} / 1000.0, 'unixepoch')"
+
+
+def _epoch_ms_sql(column: str) -> str:
+    """SQL expression converting an ISO-8601 text column to epoch milliseconds"""
+    return f"CAST(ROUND((julianday({column}) - 2440587.5) * 86400000) AS INTEGER)"
+
+
+def _table_exists(c: sqlite3.Cursor, name: str) -> bool:
+    return c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def _migrate_legacy_tables(c: sqlite3.Cursor):
+    """
+    Move rows of the old checks/port_scans tables (full URL and ISO
+    timestamp on every row) into sites/check_results/port_results, then
+    drop the old tables so their names can become views
+    """
+    if _table_exists(c, "checks"):
+        _ensure_column(c, "checks", "timeouts", "TEXT")
+        count = c.execute("SELECT COUNT(*) FROM checks").fetchone()[0]
+        c.execute("""
+        INSERT OR IGNORE INTO sites (url, client)
+        SELECT url, client FROM checks GROUP BY url
+        """)
+        c.execute(f"""
+        INSERT OR IGNORE INTO check_results (
+            site_id, ts, status_code, is_up, response_time, ssl_ok, ssl_days_left, error, timeouts
+        )
+        SELECT
+            s.id, {_epoch_ms_sql("k.checked_at")}, k.status_code, k.is_up, k.response_time,
+            k.ssl_ok, k.ssl_days_left, k.error, k.timeouts
+        FROM checks k JOIN sites s ON s.url = k.url
+        ORDER BY k.id
+        """)
+        c.execute("DROP TABLE checks")
+        print(f"🗄️ Migrated {count} checks to the normalized schema")
+
+    if _table_exists(c, "port_scans"):
+        _ensure_column(c, "port_scans", "timeout", "REAL")
+        count = c.execute("SELECT COUNT(*) FROM port_scans").fetchone()[0]
+        c.execute("INSERT OR IGNORE INTO sites (url) SELECT DISTINCT url FROM port_scans")
+        c.execute("""
+        UPDATE sites SET hostname = (
+            SELECT hostname FROM port_scans p WHERE p.url = sites.url ORDER BY p.id DESC LIMIT 1
+        )
+        WHERE hostname IS NULL
+        """)
+        c.execute(f"""
+        INSERT OR IGNORE INTO port_results (
+            site_id, ts, port, service, is_open, response_time, status, timeout
+        )
+        SELECT
+            s.id, {_epoch_ms_sql("p.scanned_at")}, p.port, p.service, p.is_open,
+            p.response_time, p.status, p.timeout
+        FROM port_scans p JOIN sites s ON s.url = p.url
+        """)
+        c.execute("DROP TABLE port_scans")
+        print(f"🗄️ Migrated {count} port scan rows to the normalized schema")
+
+
+# Incremental rollup upserts; the ? order is key, resolution, bucket,
+# up (0/1), has_rt (0/1), rt or 0, rt, rt, rt
+_ROLLUP_UPSERT = """
+INSERT INTO {table} (
+    {key}, resolution, bucket, checks, up_checks, rt_count, rt_sum, rt_min, rt_max, rt_sketch
+) VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, sketch_add(NULL, ?))
+ON CONFLICT({key}, resolution, bucket) DO UPDATE SET
+    checks = checks + 1,
+    up_checks = up_checks + excluded.up_checks,
+    rt_count = rt_count + excluded.rt_count,
+    rt_sum = rt_sum + excluded.rt_sum,
+    rt_min = min(COALESCE(rt_min, excluded.rt_min), COALESCE(excluded.rt_min, rt_min)),
+    rt_max = max(COALESCE(rt_max, excluded.rt_max), COALESCE(excluded.rt_max, rt_max)),
+    rt_sketch = sketch_merge(rt_sketch, excluded.rt_sketch)
+"""
+_SITE_ROLLUP_UPSERT = _ROLLUP_UPSERT.format(table="site_rollups", key="site_id")
+_CLIENT_ROLLUP_UPSERT = _ROLLUP_UPSERT.format(table="client_rollups", key="client")
+
+
+def _rollup_rows(key, ts_ms: int, is_up: bool, response_time: Optional[float]) -> list:
+    """Parameters of the rollup upserts one check contributes to"""
+    seconds = ts_ms // 1000
+    has_rt = response_time is not None
+    return [
+        (key, resolution, seconds - seconds % resolution, 1 if is_up else 0,
+         1 if has_rt else 0, response_time if has_rt else 0.0, response_time, response_time, response_time)
+        for resolution in ROLLUP_RESOLUTIONS
+    ]
+
+
+def _backfill_rollups(conn: sqlite3.Connection):
+    """Build the rollups from raw checks once, when the tables are new"""
+    if conn.execute("SELECT 1 FROM site_rollups LIMIT 1").fetchone():
+        return
+    if not conn.execute("SELECT 1 FROM check_results LIMIT 1").fetchone():
+        return
+
+    for resolution in ROLLUP_RESOLUTIONS:
+        bucket = f"(r.ts / 1000) - (r.ts / 1000) % {resolution}"
+        conn.execute(f"""
+        INSERT INTO site_rollups
+        SELECT r.site_id, {resolution}, {bucket}, COUNT(*), SUM(r.is_up),
+               COUNT(r.response_time), COALESCE(SUM(r.response_time), 0),
+               MIN(r.response_time), MAX(r.response_time), sketch_agg(r.response_time)
+        FROM check_results r
+        GROUP BY r.site_id, {bucket}
+        """)
+        conn.execute(f"""
+        INSERT INTO client_rollups
+        SELECT COALESCE(s.client, 'Unknown'), {resolution}, {bucket}, COUNT(*), SUM(r.is_up),
+               COUNT(r.response_time), COALESCE(SUM(r.response_time), 0),
+               MIN(r.response_time), MAX(r.response_time), sketch_agg(r.response_time)
+        FROM check_results r JOIN sites s ON s.id = r.site_id
+        GROUP BY COALESCE(s.client, 'Unknown'), {bucket}
+        """)
+    print("🗄️ Built uptime rollups from existing checks")
+
+
+def set_sla_gap(url: str, seconds: float):
+    """Longest silence after a check of url before the SLA intervals record
+    the time since as unknown (see sla.py) and, in intervals mode, before
+    its state interval is closed at that check"""
+    _SLA_GAPS[url] = float(seconds)
+
+
+def storage_settings(config: dict) -> dict:
+    """Merge config["storage"] over the defaults"""
+    settings = dict(DEFAULT_STORAGE)
+    settings.update(config.get("storage", {}))
+    if settings["mode"] not in STORAGE_MODES:
+        raise ValueError(f"Unknown storage mode {settings['mode']!r} (expected one of {', '.join(STORAGE_MODES)})")
+    return settings
+
+
+def set_storage_mode(mode: str):
+    """Choose how insert_check stores uptime checks from now on"""
+    global STORAGE_MODE
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"Unknown storage mode {mode!r}")
+    STORAGE_MODE = mode
+
+
+# Intervals mode: a check within gap_ms of its site's latest interval
+# extends it when state, status code and error are unchanged, otherwise it
+# closes that interval at its own timestamp and opens a new one. After a
+# longer silence the latest interval stays closed at its last check and
+# the new check opens an interval of its own, so the silence belongs to no
+# interval. Uptime over a window is the overlap of the 'up' intervals with
+# it, out of the time covered by any interval.
+_STATE_FEED_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS state_feed_insert INSTEAD OF INSERT ON state_feed
+BEGIN
+    UPDATE state_intervals SET
+        end_ts = NEW.ts,
+        n_checks = n_checks + (state = NEW.state AND status_code IS NEW.status_code AND error IS NEW.error)
+    WHERE id = (
+        SELECT id FROM state_intervals WHERE site_id = NEW.site_id ORDER BY start_ts DESC LIMIT 1
+    ) AND end_ts <= NEW.ts AND NEW.ts - end_ts <= NEW.gap_ms;
+    INSERT INTO state_intervals (site_id, state, status_code, error, start_ts, end_ts, n_checks)
+    SELECT NEW.site_id, NEW.state, NEW.status_code, NEW.error, NEW.ts, NEW.ts, 1
+    WHERE NOT EXISTS (
+        SELECT 1 FROM state_intervals
+        WHERE id = (SELECT id FROM state_intervals WHERE site_id = NEW.site_id ORDER BY start_ts DESC LIMIT 1)
+        AND state = NEW.state AND status_code IS NEW.status_code AND error IS NEW.error
+        AND NEW.ts - end_ts <= NEW.gap_ms
+    );
+END;
+"""
+
+
+# SLA intervals tile each site's history into up, down and unknown time.
+# A check within gap_ms of the site's latest interval extends it to the
+# check (the previous state holds until the check that changes it); after
+# a longer silence the gap becomes an 'unknown' interval. A new interval
+# opens whenever the state changes.
+_SLA_FEED_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS sla_feed_insert INSTEAD OF INSERT ON sla_feed
+BEGIN
+    UPDATE sla_intervals SET end_ts = max(end_ts, NEW.ts)
+    WHERE id = (
+        SELECT id FROM sla_intervals WHERE site_id = NEW.site_id ORDER BY end_ts DESC, id DESC LIMIT 1
+    ) AND NEW.ts - end_ts <= NEW.gap_ms;
+    INSERT INTO sla_intervals (site_id, state, start_ts, end_ts)
+    SELECT NEW.site_id, 'unknown', end_ts, NEW.ts FROM sla_intervals
+    WHERE id = (
+        SELECT id FROM sla_intervals WHERE site_id = NEW.site_id ORDER BY end_ts DESC, id DESC LIMIT 1
+    ) AND NEW.ts - end_ts > NEW.gap_ms;
+    INSERT INTO sla_intervals (site_id, state, start_ts, end_ts)
+    SELECT NEW.site_id, NEW.state, max(NEW.ts, COALESCE(latest.end_ts, NEW.ts)), max(NEW.ts, COALESCE(latest.end_ts, NEW.ts))
+    FROM (SELECT NULL) LEFT JOIN (
+        SELECT state, end_ts FROM sla_intervals WHERE site_id = NEW.site_id ORDER BY end_ts DESC, id DESC LIMIT 1
+    ) latest
+    WHERE latest.state IS NOT NEW.state;
+END;
+"""
+
+
+# Change feed: every write that changes what the dashboard shows also
+# inserts (site_id, kind) into the change_feed view, which bumps the
+# database-wide data version and stamps it on the site's row for that
+# kind. Readers compare versions instead of re-running their queries.
+_CHANGE_FEED_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS change_feed_insert INSTEAD OF INSERT ON change_feed
+BEGIN
+    UPDATE data_version SET seq = seq + 1 WHERE id = 0;
+    INSERT INTO site_versions (site_id, kind, seq)
+    VALUES (NEW.site_id, NEW.kind, (SELECT seq FROM data_version WHERE id = 0))
+    ON CONFLICT (site_id, kind) DO UPDATE SET seq = excluded.seq;
+END;
+"""
+
+_CHANGE_FEED_INSERT = "INSERT INTO change_feed (site_id, kind) VALUES (?, ?)"
+
+
+def _backfill_sla_intervals(conn: sqlite3.Connection):
+    """Replay raw checks (or state intervals) into the SLA intervals once, when the table is new"""
+    if conn.execute("SELECT 1 FROM sla_intervals LIMIT 1").fetchone():
+        return
+    gap_ms = DEFAULT_SLA_GAP_SECONDS * 1000
+    if conn.execute("SELECT 1 FROM check_results LIMIT 1").fetchone():
+        conn.execute("""
+        INSERT INTO sla_feed (site_id, ts, state, gap_ms)
+        SELECT site_id, ts, CASE WHEN is_up THEN 'up' ELSE 'down' END, ?
+        FROM check_results ORDER BY site_id, ts
+        """, (gap_ms,))
+    elif conn.execute("SELECT 1 FROM state_intervals LIMIT 1").fetchone():
+        # A state interval was covered by checks from start to end however
+        # long it is, so its end point may close any gap since its start;
+        # only the time between intervals is held to the default gap
+        conn.execute("""
+        INSERT INTO sla_feed (site_id, ts, state, gap_ms)
+        SELECT site_id, ts, state, gap_ms FROM (
+            SELECT site_id, start_ts AS ts, state, ? AS gap_ms, id, 0 AS point FROM state_intervals
+            UNION ALL
+            SELECT site_id, end_ts AS ts, state, max(?, end_ts - start_ts) AS gap_ms, id, 1 AS point FROM state_intervals
+        ) ORDER BY site_id, ts, id, point
+        """, (gap_ms, gap_ms))
+    else:
+        return
+    print("🗄️ Built SLA intervals from existing checks")
+
+
+# Appends one point to a series block; the ? order is site_id, metric,
+# hour, offset (ms into the hour), value
+_SERIES_APPEND = """
+INSERT INTO series_blocks (site_id, metric, hour, points, data)
+VALUES (?, ?, ?, 1, series_append(NULL, ?, ?))
+ON CONFLICT(site_id, metric, hour) DO UPDATE SET
+    points = points + 1,
+    data = series_merge(data, excluded.data)
+"""
+
+
+def _series_row(site_id: int, metric: str, ts_ms: int, value: Optional[float]) -> tuple:
+    """Parameters of _SERIES_APPEND for one point"""
+    hour = block_hour(ts_ms)
+    return (site_id, metric, hour, ts_ms - hour * 1000, value)
+
+
+# Marks one check in its site-day's uptime bitsets (see bitsets.py); the
+# ? order is site_id, day, slot, is_up. The slot counts are the popcounts
+# of the bitsets, kept so whole days never need their blobs decoded.
+_UPTIME_BITS_MARK = """
+INSERT INTO uptime_bits (site_id, day, up, ran, up_slots, ran_slots)
+VALUES (?1, ?2, bitset_mark(NULL, NULL, ?3, ?4), bitset_mark(NULL, NULL, ?3, 1), ?4, 1)
+ON CONFLICT(site_id, day) DO UPDATE SET
+    up = bitset_mark(up, ran, ?3, ?4),
+    ran = bitset_mark(ran, ran, ?3, 1),
+    up_slots = bitset_count(bitset_mark(up, ran, ?3, ?4)),
+    ran_slots = bitset_count(bitset_mark(ran, ran, ?3, 1))
+"""
+
+
+def _uptime_bits_row(site_id: int, ts_ms: int, is_up: bool) -> tuple:
+    """Parameters of _UPTIME_BITS_MARK for one check"""
+    return (site_id, day_of(ts_ms), slot_of(ts_ms), 1 if is_up else 0)
+
+
+def _backfill_uptime_bits(conn: sqlite3.Connection):
+    """Build the uptime bitsets from raw checks once, when the table is new"""
+    if conn.execute("SELECT 1 FROM uptime_bits LIMIT 1").fetchone():
+        return
+    if not conn.execute("SELECT 1 FROM check_results LIMIT 1").fetchone():
+        return
+
+    conn.execute(f"""
+    INSERT INTO uptime_bits
+    SELECT site_id, day, up, ran, bitset_count(up), bitset_count(ran)
+    FROM (
+        SELECT site_id, (ts / 1000) - (ts / 1000) % {DAY_SECONDS} AS day,
+               bitset_agg((ts / 1000) % {DAY_SECONDS} / {SLOT_SECONDS}, is_up) AS up,
+               bitset_agg((ts / 1000) % {DAY_SECONDS} / {SLOT_SECONDS}, 1) AS ran
+        FROM check_results
+        GROUP BY site_id, day
+    )
+    """)
+    print("🗄️ Built uptime bitsets from existing checks")
+
+
+def _migrate_rt_series(c: sqlite3.Cursor):
+    """Re-encode the row-per-point rt_series of the first intervals mode into series blocks"""
+    if not _table_exists(c, "rt_series"):
+        return
+    c.execute("DROP VIEW IF EXISTS interval_checks")
+    rows = c.execute("SELECT site_id, ts, response_time FROM rt_series ORDER BY site_id, ts").fetchall()
+    blocks: dict = {}
+    for site_id, ts, value in rows:
+        hour = block_hour(ts)
+        offsets, values = blocks.setdefault((site_id, hour), ([], []))
+        offsets.append(ts - hour * 1000)
+        values.append(value)
+    c.executemany(
+        "INSERT OR REPLACE INTO series_blocks (site_id, metric, hour, points, data) VALUES (?, 'rt', ?, ?, ?)",
+        [(site_id, hour, len(offsets), encode_block(offsets, values))
+         for (site_id, hour), (offsets, values) in blocks.items()],
+    )
+    c.execute("DROP TABLE rt_series")
+    print(f"🗄️ Packed {len(rows)} response times into {len(blocks)} series blocks")
+
+
+# Latest state of every site, one row each. Columns come in groups that
+# each check type refreshes together, stamped with the group's *_ts
+_STATUS_GROUPS = {
+    "checked_ts": ("status_code", "is_up", "response_time", "error"),
+    "ssl_ts": ("ssl_ok", "ssl_days_left"),
+    "dns_ts": ("dns_ok", "dns_info"),
+    "content_ts": ("content_state", "content_info"),
+    "reputation_ts": ("reputation",),
+    "ports_ts": ("open_ports",),
+}
+_STATUS_FIELDS = {field: stamp for stamp, fields in _STATUS_GROUPS.items() for field in fields}
+_STATUS_COLUMNS = [column for stamp, fields in _STATUS_GROUPS.items() for column in (*fields, stamp)]
+
+# One statement for every kind of update, so queued updates of a site
+# apply in the order they were made. A group whose stamp is NULL in the
+# new row keeps its stored values.
+_SITE_STATUS_UPSERT = f"""
+INSERT INTO site_status (site_id, {", ".join(_STATUS_COLUMNS)}, updated_ts)
+VALUES (?, {", ".join("?" for _ in _STATUS_COLUMNS)}, ?)
+ON CONFLICT(site_id) DO UPDATE SET
+""" + ",\n".join(
+    f"    {column} = CASE WHEN excluded.{stamp} IS NULL THEN {column} ELSE excluded.{column} END"
+    for stamp, fields in _STATUS_GROUPS.items() for column in (*fields, stamp)
+) + ",\n    updated_ts = excluded.updated_ts\n"
+
+_HOST_PORT_UPSERT = """
+INSERT INTO host_port_state (hostname, port, service, is_open, response_time, status, scanned_ts)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(hostname, port) DO UPDATE SET
+    service = excluded.service,
+    is_open = excluded.is_open,
+    response_time = excluded.response_time,
+    status = excluded.status,
+    scanned_ts = excluded.scanned_ts
+"""
+
+
+def _site_status_row(site_id: int, ts_ms: int, fields: dict) -> tuple:
+    """Parameters of _SITE_STATUS_UPSERT for the fields one update sets"""
+    unknown = set(fields) - set(_STATUS_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown site status fields: {', '.join(sorted(unknown))}")
+    row = [site_id]
+    for stamp, group in _STATUS_GROUPS.items():
+        present = any(field in fields for field in group)
+        for field in group:
+            value = fields.get(field)
+            if isinstance(value, bool):
+                value = int(value)
+            elif isinstance(value, (list, tuple)):
+                value = json.dumps(list(value))
+            row.append(value)
+        row.append(ts_ms if present else None)
+    row.append(ts_ms)
+    return tuple(row)
+
+
+def _backfill_site_status(conn: sqlite3.Connection):
+    """Fill the latest-state tables from the raw history once, when they are new"""
+    if conn.execute("SELECT 1 FROM site_status LIMIT 1").fetchone():
+        return
+    if not conn.execute("SELECT 1 FROM check_results LIMIT 1").fetchone():
+        return
+
+    conn.execute("""
+    INSERT INTO site_status (
+        site_id, status_code, is_up, response_time, error, checked_ts,
+        ssl_ok, ssl_days_left, ssl_ts, updated_ts
+    )
+    SELECT r.site_id, r.status_code, r.is_up, r.response_time, r.error, r.ts,
+           r.ssl_ok, r.ssl_days_left, CASE WHEN r.ssl_days_left IS NULL THEN NULL ELSE r.ts END, r.ts
+    FROM check_results r
+    JOIN (SELECT site_id, MAX(ts) AS ts FROM check_results GROUP BY site_id) latest
+      ON latest.site_id = r.site_id AND latest.ts = r.ts
+    """)
+    latest_scans = """
+    SELECT p.* FROM port_results p
+    JOIN (SELECT site_id, MAX(ts) AS ts FROM port_results GROUP BY site_id) latest
+      ON latest.site_id = p.site_id AND latest.ts = p.ts
+    """
+    conn.execute(f"""
+    INSERT OR REPLACE INTO host_port_state (hostname, port, service, is_open, response_time, status, scanned_ts)
+    SELECT s.hostname, p.port, p.service, p.is_open, p.response_time, p.status, p.ts
+    FROM ({latest_scans}) p JOIN sites s ON s.id = p.site_id
+    WHERE s.hostname IS NOT NULL
+    ORDER BY p.ts
+    """)
+    conn.execute(f"""
+    UPDATE site_status SET
+        open_ports = scan.open_ports,
+        ports_ts = scan.ts
+    FROM (
+        SELECT site_id, MAX(ts) AS ts,
+               json_group_array(port) FILTER (WHERE is_open = 1) AS open_ports
+        FROM ({latest_scans}) GROUP BY site_id
+    ) scan
+    WHERE scan.site_id = site_status.site_id
+    """)
+    print("🗄️ Built current site status from existing checks")
+
+
+# (DB_PATH, url) -> (site id, client, hostname)
+_site_cache: dict = {}
+_site_cache_lock = threading.Lock()
+# (DB_PATH, url) -> lock held while that site's row is being written
+_site_write_locks: dict = {}
+
+
+def _cached_site(key, client: Optional[str], hostname: Optional[str]):
+    with _site_cache_lock:
+        cached = _site_cache.get(key)
+    if cached and (client is None or cached[1] == client) and (hostname is None or cached[2] == hostname):
+        return cached
+    return None
+
+
+def _site_id(url: str, client: Optional[str] = None, hostname: Optional[str] = None) -> int:
+    """
+    Integer id of a site, creating or updating its sites row on first use
+    (and when its client or hostname changes). The row is written by the
+    writer thread ahead of anything queued after this call, which waits
+    for it (at most SITE_WRITE_TIMEOUT_SECONDS), so those rows can refer
+    to the id. Only callers for the same site wait on each other.
+    """
+    key = (DB_PATH, url)
+    cached = _cached_site(key, client, hostname)
+    if cached:
+        return cached[0]
+    with _site_cache_lock:
+        lock = _site_write_locks.setdefault(key, threading.Lock())
+
+    with lock:
+        # Another thread may have written the row while this one waited
+        cached = _cached_site(key, client, hostname)
+        if cached:
+            return cached[0]
+
+        def upsert(conn):
+            conn.execute("""
+            INSERT INTO sites (url, client, hostname) VALUES (?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                client = COALESCE(excluded.client, client),
+                hostname = COALESCE(excluded.hostname, hostname)
+            """, (url, client, hostname))
+            return conn.execute("SELECT id, client, hostname FROM sites WHERE url = ?", (url,)).fetchone()
+
+        row = _get_writer().call(upsert, timeout=SITE_WRITE_TIMEOUT_SECONDS)
+        with _site_cache_lock:
+            _site_cache[key] = row
+        return row[0]
+
+
+def _lookup_site_id(conn: sqlite3.Connection, url: str) -> Optional[int]:
+    """Id of an existing site, or None (never creates one)"""
+    row = conn.execute("SELECT id FROM sites WHERE url = ?", (url,)).fetchone()
+    return row[0] if row else None
+
+
+class _Writer(threading.Thread):
+    """
+    The single thread that writes to the database
+
+    Write functions queue groups of (sql, rows) and return immediately. A
+    group always lands in one transaction. The writer merges queued rows
+    by statement, runs each statement with executemany and commits the
+    batch when FLUSH_ROWS rows are waiting, FLUSH_SECONDS have passed, or
+    someone calls flush_writes(). A batch that finds the database locked is
+    retried with backoff; one that fails any other way is written again a
+    group at a time, so a bad row only costs its own group. The thread
+    itself never dies on a write error.
+    """
+
+    _WRITE = object()
+    _CALL = object()
+    _FLUSH = object()
+    _STOP = object()
+
+    def __init__(self, path: Path):
+        super().__init__(name="db-writer", daemon=True)
+        self.path = path
+        self._queue: queue.Queue = queue.Queue()
+
+    def submit(self, statements: list, guard: Optional[tuple] = None):
+        """Queue [(sql, rows), ...] to be committed together, only if the
+        guard (sql, params), run first, changes a row"""
+        self._queue.put((self._WRITE, (guard, statements)))
+
+    def call(self, fn, timeout: Optional[float] = None):
+        """Run fn(conn) in a transaction of its own on the writer thread and
+        return its result (raising its error)"""
+        future = Future()
+        self._queue.put((self._CALL, (fn, future)))
+        return future.result(timeout)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far is committed"""
+        done = threading.Event()
+        self._queue.put((self._FLUSH, done))
+        return done.wait(timeout)
+
+    def stop(self):
+        self._queue.put((self._STOP, None))
+        self.join()
+
+    def run(self):
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        for pragma in WRITER_PRAGMAS:
+            conn.execute(pragma)
+        register_sketch_functions(conn)
+        register_series_functions(conn)
+        register_bitset_functions(conn)
+
+        batch: list = []  # queued groups of [(sql, rows), ...]
+        size = 0
+        oldest = 0.0
+        try:
+            while True:
+                timeout = None if not batch else max(0.0, oldest + FLUSH_SECONDS - time.monotonic())
+                try:
+                    kind, payload = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    kind, payload = None, None
+
+                if kind is self._WRITE:
+                    if not batch:
+                        oldest = time.monotonic()
+                    batch.append(payload)
+                    size += sum(len(rows) for _, rows in payload[1])
+                    if size < FLUSH_ROWS and time.monotonic() - oldest < FLUSH_SECONDS:
+                        continue
+
+                if batch:
+                    self._commit(conn, batch, size)
+                    batch, size = [], 0
+                if kind is self._CALL:
+                    fn, future = payload
+                    try:
+                        future.set_result(self._transaction(conn, fn, "Site write"))
+                    except Exception as e:
+                        future.set_exception(e)
+                elif kind is self._FLUSH:
+                    payload.set()
+                elif kind is self._STOP:
+                    break
+        finally:
+            conn.close()
+            self._release_waiters()
+
+    def _release_waiters(self):
+        """Wake everyone still waiting on a queued flush or call"""
+        while True:
+            try:
+                kind, payload = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if kind is self._FLUSH:
+                payload.set()
+            elif kind is self._CALL:
+                payload[1].set_exception(RuntimeError("Database writer stopped"))
+
+    def _transaction(self, conn: sqlite3.Connection, fn, what: str):
+        """
+        Run fn(conn) in one transaction. While the database is busy or
+        locked the whole of it is retried with backoff, for at most
+        WRITE_GIVE_UP_SECONDS; any other error is raised straight away.
+        """
+        started = time.monotonic()
+        delay = WRITE_RETRY_SECONDS
+        while True:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                result = fn(conn)
+                conn.execute("COMMIT")
+                return result
+            except Exception as e:
+                # BEGIN itself fails while another connection holds the
+                # lock, and then there is no transaction to roll back
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                if not _is_busy(e):
+                    raise
+                if time.monotonic() - started + delay > WRITE_GIVE_UP_SECONDS:
+                    print(f"⚠️ {what} failed for {time.monotonic() - started:.0f}s, dropped: {e}")
+                    raise
+                print(f"⚠️ {what} failed ({e}), retrying in {delay:g}s")
+                time.sleep(delay)
+                delay = min(delay * 2, WRITE_RETRY_MAX_SECONDS)
+
+    def _commit(self, conn: sqlite3.Connection, batch: list, size: int):
+        try:
+            self._transaction(conn, lambda conn: _execute_groups(conn, batch), f"Batch write of {size} rows")
+            return
+        except Exception as e:
+            if _is_busy(e):
+                return  # reported by _transaction
+            print(f"⚠️ Batch write failed ({e}), retrying group by group")
+
+        dropped = 0
+        for group in batch:
+            try:
+                self._transaction(conn, lambda conn: _execute_groups(conn, [group]), "Group write")
+            except Exception as e:
+                dropped += 1
+                if not _is_busy(e):
+                    print(f"⚠️ Write group dropped: {e}")
+        if dropped:
+            print(f"⚠️ Dropped {dropped} of {len(batch)} write groups")
+
+
+def _is_busy(error: Exception) -> bool:
+    """Whether a write failed only because another connection holds the lock"""
+    return isinstance(error, sqlite3.OperationalError) and (
+        getattr(error, "sqlite_errorcode", 0) & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+        or "locked" in str(error)
+    )
+
+
+def _execute_groups(conn: sqlite3.Connection, groups: list):
+    """
+    Run the guard of every (guard, statements) group one row at a time,
+    then executemany the statements of the groups whose guard changed a
+    row (or that have none), merged by statement in first-queued order
+    """
+    merged: dict[str, list] = {}
+    for guard, statements in groups:
+        if guard is not None and conn.execute(*guard).rowcount <= 0:
+            continue
+        for sql, rows in statements:
+            merged.setdefault(sql, []).extend(rows)
+    for sql, rows in merged.items():
+        conn.executemany(sql, rows)
+
+
+_writer: Optional[_Writer] = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> _Writer:
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive() or _writer.path != DB_PATH:
+            if _writer is not None and _writer.is_alive():
+                _writer.stop()
+            _writer = _Writer(DB_PATH)
+            _writer.start()
+        return _writer
+
+
+def _write(sql: str, params: tuple):
+    """Queue one write for the writer thread"""
+    _get_writer().submit([(sql, [params])])
+
+
+def _write_many(sql: str, rows: list):
+    """Queue a write of several rows (executemany) for the writer thread"""
+    if rows:
+        _get_writer().submit([(sql, list(rows))])
+
+
+def _write_group(statements: list, guard: Optional[tuple] = None):
+    """Queue [(sql, rows), ...] that must commit in the same transaction,
+    and only if the guard (sql, params), when given, inserts or changes a
+    row"""
+    statements = [(sql, list(rows)) for sql, rows in statements if rows]
+    if statements or guard is not None:
+        _get_writer().submit(statements, guard)
+
+
+def flush_writes(timeout: Optional[float] = None) -> bool:
+    """
+    Commit everything queued so far (the monitor calls this once per cycle)
+
+    Returns:
+        False if the writer didn't finish within timeout
+    """
+    if _writer is None or not _writer.is_alive():
+        return True
+    return _writer.flush(timeout)
+
+
+def close_writer():
+    """Commit pending writes and stop the writer thread"""
+    global _writer
+    with _writer_lock:
+        if _writer is not None and _writer.is_alive():
+            _writer.stop()
+        _writer = None
+
+
+atexit.register(close_writer)
+
 
 def init_db():
     """
@@ -13,23 +799,125 @@ def init_db():
     """
     DB_PATH.parent.mkdir(exist_ok=True)
     conn = sqlite3.connect(DB_PATH)
+    register_sketch_functions(conn)
+    register_series_functions(conn)
+    register_bitset_functions(conn)
     c = conn.cursor()
+
+    # WAL is stored in the database file, so dashboard connections get it too
+    c.execute("PRAGMA journal_mode=WAL")
+
+    # Incremental auto-vacuum lets retention give free pages back a few at
+    # a time. Switching takes a single VACUUM (instant on a new file), done
+    # here before the writer thread starts.
+    if c.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        c.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        if c.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone():
+            print("🗄️ Switching the database to incremental auto-vacuum (one-time VACUUM)")
+        c.execute("VACUUM")
     
-    # Original checks table (enhanced)
+    # Sites dimension: every other table refers to a site by its integer id
     c.execute("""
-    CREATE TABLE IF NOT EXISTS checks (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        url TEXT NOT NULL,
+    CREATE TABLE IF NOT EXISTS sites (
+        id INTEGER PRIMARY KEY,
+        url TEXT NOT NULL UNIQUE,
         client TEXT,
-        checked_at TEXT NOT NULL,
+        hostname TEXT
+    );
+    """)
+
+    # Uptime checks. ts is epoch milliseconds. The rowid stays: it follows
+    # commit order, so readers can tail new rows with id > last seen id.
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS check_results (
+        id INTEGER PRIMARY KEY,
+        site_id INTEGER NOT NULL REFERENCES sites(id),
+        ts INTEGER NOT NULL,
         status_code INTEGER,
         is_up INTEGER,
         response_time REAL,
         ssl_ok INTEGER,
         ssl_days_left INTEGER,
-        error TEXT
+        error TEXT,
+        timeouts TEXT
     );
     """)
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_check_results_site_ts ON check_results(site_id, ts);")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_check_results_ts ON check_results(ts);")
+
+    # Port scans, clustered by site and scan time
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS port_results (
+        site_id INTEGER NOT NULL REFERENCES sites(id),
+        ts INTEGER NOT NULL,
+        port INTEGER NOT NULL,
+        service TEXT,
+        is_open INTEGER,
+        response_time REAL,
+        status TEXT,
+        timeout REAL,
+        PRIMARY KEY (site_id, ts, port)
+    ) WITHOUT ROWID;
+    """)
+
+    # Intervals storage mode: runs of identical checks. Writes go through
+    # the state_feed view, whose trigger extends or opens intervals.
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS state_intervals (
+        id INTEGER PRIMARY KEY,
+        site_id INTEGER NOT NULL REFERENCES sites(id),
+        state TEXT NOT NULL,
+        status_code INTEGER,
+        error TEXT,
+        start_ts INTEGER NOT NULL,
+        end_ts INTEGER NOT NULL,
+        n_checks INTEGER NOT NULL
+    );
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_state_intervals_site_start ON state_intervals(site_id, start_ts);")
+
+    # Response-time ("rt") and TTFB ("ttfb") series, one compressed block
+    # (see series.py) per site, metric and hour, appended to in SQL
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS series_blocks (
+        site_id INTEGER NOT NULL REFERENCES sites(id),
+        metric TEXT NOT NULL,
+        hour INTEGER NOT NULL,
+        points INTEGER NOT NULL,
+        data BLOB NOT NULL,
+        PRIMARY KEY (site_id, metric, hour)
+    ) WITHOUT ROWID;
+    """)
+    _migrate_rt_series(c)
+    columns = [row[1] for row in c.execute("PRAGMA table_info(state_feed)")]
+    if columns and "gap_ms" not in columns:
+        # Dropping the view drops its old trigger with it
+        c.execute("DROP VIEW state_feed")
+    c.execute("""
+    CREATE VIEW IF NOT EXISTS state_feed AS
+    SELECT site_id, end_ts AS ts, state, status_code, error, 0 AS gap_ms FROM state_intervals;
+    """)
+    c.execute(_STATE_FEED_TRIGGER)
+
+    _migrate_legacy_tables(c)
+
+    # The old url/ISO-timestamp tables live on as views, so existing
+    # queries keep working
+    c.execute(f"""
+    CREATE VIEW IF NOT EXISTS checks AS
+    SELECT
+        r.id, s.url, s.client, {_iso_sql("r.ts")} AS checked_at,
+        r.status_code, r.is_up, r.response_time, r.ssl_ok, r.ssl_days_left,
+        r.error, r.timeouts, r.site_id, r.ts
+    FROM check_results r JOIN sites s ON s.id = r.site_id;
+    """)
+    c.execute(f"""
+    CREATE VIEW IF NOT EXISTS port_scans AS
+    SELECT
+        s.url, s.hostname, {_iso_sql("p.ts")} AS scanned_at, p.port, p.service,
+        p.is_open, p.response_time, p.status, p.timeout, p.site_id, p.ts
+    FROM port_results p JOIN sites s ON s.id = p.site_id;
+    """)
     
     # NEW: Performance metrics table
     c.execute("""
@@ -107,6 +995,16 @@ def init_db():
         FOREIGN KEY (url) REFERENCES checks(url)
     );
     """)
+
+    # Last content hash per URL, compared by the content change check
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS content_state (
+        url TEXT PRIMARY KEY,
+        last_hash TEXT,
+        last_checked_at TEXT,
+        last_changed_at TEXT
+    );
+    """)
     
     # NEW: Anomaly detection table
     c.execute("""
@@ -124,86 +1022,297 @@ def init_db():
     );
     """)
     
-    # NEW: Port monitoring table
+    # Effective uptime interval per site (adaptive scheduling)
     c.execute("""
-    CREATE TABLE IF NOT EXISTS port_scans (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        url TEXT NOT NULL,
+    CREATE TABLE IF NOT EXISTS site_schedule (
+        url TEXT PRIMARY KEY,
+        interval_seconds REAL NOT NULL,
+        healthy_streak INTEGER DEFAULT 0,
+        rt_average REAL,
+        reason TEXT,
+        updated_at TEXT NOT NULL
+    );
+    """)
+    
+    # Per-host circuit breaker state
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS circuit_breakers (
+        host TEXT PRIMARY KEY,
+        state TEXT NOT NULL,
+        failures INTEGER DEFAULT 0,
+        opened_at REAL,
+        next_probe_at REAL,
+        backoff_seconds REAL,
+        last_error TEXT,
+        updated_at TEXT NOT NULL
+    );
+    """)
+
+    # Uptime and response-time rollups per site and per client, one row per
+    # (resolution, bucket start). Kept current by insert_check.
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS site_rollups (
+        site_id INTEGER NOT NULL REFERENCES sites(id),
+        resolution INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        checks INTEGER NOT NULL,
+        up_checks INTEGER NOT NULL,
+        rt_count INTEGER NOT NULL,
+        rt_sum REAL NOT NULL,
+        rt_min REAL,
+        rt_max REAL,
+        rt_sketch BLOB,
+        PRIMARY KEY (site_id, resolution, bucket)
+    ) WITHOUT ROWID;
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS client_rollups (
+        client TEXT NOT NULL,
+        resolution INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        checks INTEGER NOT NULL,
+        up_checks INTEGER NOT NULL,
+        rt_count INTEGER NOT NULL,
+        rt_sum REAL NOT NULL,
+        rt_min REAL,
+        rt_max REAL,
+        rt_sketch BLOB,
+        PRIMARY KEY (client, resolution, bucket)
+    ) WITHOUT ROWID;
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_client_rollups_bucket ON client_rollups(resolution, bucket);")
+    _backfill_rollups(conn)
+
+    # Per site and UTC day: which one-minute slots were checked (ran) and
+    # which of those were up, with their popcounts. The covering index
+    # answers fleet-wide range queries without touching the blobs.
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS uptime_bits (
+        site_id INTEGER NOT NULL REFERENCES sites(id),
+        day INTEGER NOT NULL,
+        up BLOB NOT NULL,
+        ran BLOB NOT NULL,
+        up_slots INTEGER NOT NULL,
+        ran_slots INTEGER NOT NULL,
+        PRIMARY KEY (site_id, day)
+    ) WITHOUT ROWID;
+    """)
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_uptime_bits_day ON uptime_bits(day, site_id, up_slots, ran_slots);"
+    )
+    _backfill_uptime_bits(conn)
+
+    # Time-weighted SLA: up/down/unknown intervals per site, written through
+    # the sla_feed view (see _SLA_FEED_TRIGGER) in both storage modes
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS sla_intervals (
+        id INTEGER PRIMARY KEY,
+        site_id INTEGER NOT NULL REFERENCES sites(id),
+        state TEXT NOT NULL,
+        start_ts INTEGER NOT NULL,
+        end_ts INTEGER NOT NULL
+    );
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sla_intervals_site_end ON sla_intervals(site_id, end_ts);")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sla_intervals_end ON sla_intervals(end_ts);")
+    c.execute("""
+    CREATE VIEW IF NOT EXISTS sla_feed AS
+    SELECT site_id, end_ts AS ts, state, 0 AS gap_ms FROM sla_intervals;
+    """)
+    c.execute(_SLA_FEED_TRIGGER)
+    _backfill_sla_intervals(conn)
+
+    # Latest state per site, upserted in the same transaction as every
+    # check so current status is one primary-key lookup. open_ports is a
+    # JSON list; host_port_state keeps the last scan of each host's ports.
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS site_status (
+        site_id INTEGER PRIMARY KEY REFERENCES sites(id),
+        status_code INTEGER,
+        is_up INTEGER,
+        response_time REAL,
+        error TEXT,
+        checked_ts INTEGER,
+        ssl_ok INTEGER,
+        ssl_days_left INTEGER,
+        ssl_ts INTEGER,
+        dns_ok INTEGER,
+        dns_info TEXT,
+        dns_ts INTEGER,
+        content_state TEXT,
+        content_info TEXT,
+        content_ts INTEGER,
+        reputation TEXT,
+        reputation_ts INTEGER,
+        open_ports TEXT,
+        ports_ts INTEGER,
+        updated_ts INTEGER NOT NULL
+    );
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS host_port_state (
         hostname TEXT NOT NULL,
-        scanned_at TEXT NOT NULL,
         port INTEGER NOT NULL,
         service TEXT,
         is_open INTEGER,
         response_time REAL,
         status TEXT,
-        FOREIGN KEY (url) REFERENCES checks(url)
+        scanned_ts INTEGER NOT NULL,
+        PRIMARY KEY (hostname, port)
+    ) WITHOUT ROWID;
+    """)
+    _backfill_site_status(conn)
+
+    # Data version and per-site change log kept by the change_feed view
+    # (see _CHANGE_FEED_TRIGGER); kind is check, status, ports or ttfb
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS data_version (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        seq INTEGER NOT NULL
+    );
+    """)
+    c.execute("INSERT OR IGNORE INTO data_version (id, seq) VALUES (0, 0)")
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS site_versions (
+        site_id INTEGER NOT NULL REFERENCES sites(id),
+        kind TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        PRIMARY KEY (site_id, kind)
+    ) WITHOUT ROWID;
+    """)
+    c.execute("""
+    CREATE VIEW IF NOT EXISTS change_feed AS
+    SELECT site_id, kind FROM site_versions;
+    """)
+    c.execute(_CHANGE_FEED_TRIGGER)
+
+    # Concurrency limit chosen by the AIMD controller, one row per cycle
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS engine_stats (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        recorded_at TEXT NOT NULL,
+        concurrency_limit INTEGER NOT NULL,
+        peak_in_flight INTEGER,
+        sites_checked INTEGER,
+        cycle_seconds REAL,
+        lag_seconds REAL,
+        latency_inflation REAL,
+        error_rate REAL,
+        signal TEXT
     );
     """)
     
     # Create indexes for better query performance
-    c.execute("CREATE INDEX IF NOT EXISTS idx_checks_url ON checks(url);")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_checks_checked_at ON checks(checked_at);")
     c.execute("CREATE INDEX IF NOT EXISTS idx_incidents_url ON incidents(url);")
     c.execute("CREATE INDEX IF NOT EXISTS idx_incidents_severity ON incidents(severity);")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_performance_url ON performance_metrics(url);")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_performance_url ON performance_metrics(url, checked_at);")
     c.execute("CREATE INDEX IF NOT EXISTS idx_security_url ON security_scans(url);")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_port_scans_url ON port_scans(url);")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_port_scans_hostname ON port_scans(hostname);")
 
     conn.commit()
     conn.close()
     print("✅ Database initialized with enhanced schema")
 
 
-def insert_check(url, client, status_code, is_up, response_time, ssl_ok, ssl_days_left, error):
-    """Original check insert function"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-    INSERT INTO checks (
-        url, client, checked_at, status_code, is_up, response_time,
-        ssl_ok, ssl_days_left, error
-    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        url,
-        client,
-        datetime.utcnow().isoformat(),
-        status_code,
-        1 if is_up else 0,
-        response_time,
-        None if ssl_ok is None else (1 if ssl_ok else 0),
-        ssl_days_left,
-        error
-    ))
-    conn.commit()
-    conn.close()
+def insert_check(url, client, status_code, is_up, response_time, ssl_ok, ssl_days_left, error,
+                 timeouts: Optional[dict] = None, status: Optional[dict] = None):
+    """
+    Original check insert function; timeouts maps check type -> seconds used.
+    Stored as a check_results row or, in intervals mode, as an extension of
+    the site's current state interval. The response-time series block, the
+    site and client rollups, the uptime bitsets, the SLA intervals and the
+    site's current status are updated in the same transaction, and the
+    change feed records a new data version. status holds the other
+    site_status fields the same site check refreshed (see
+    upsert_site_status). A check whose site and ts are already stored
+    (a replay) is ignored as a whole.
+    """
+    site_id = _site_id(url, client)
+    ts = _now_ms()
+    fields = {"status_code": status_code, "is_up": is_up, "response_time": response_time, "error": error}
+    fields.update(status or {})
+    gap_ms = int(_SLA_GAPS.get(url, DEFAULT_SLA_GAP_SECONDS) * 1000)
+    raw, guard = [], None
+    if STORAGE_MODE == "intervals":
+        # SSL and timeouts live on in site_status and the learned timeouts
+        raw = [
+            ("INSERT INTO state_feed (site_id, ts, state, status_code, error, gap_ms) VALUES (?, ?, ?, ?, ?, ?)",
+             [(site_id, ts, "up" if is_up else "down", status_code, error, gap_ms)]),
+        ]
+    else:
+        # The rollups, bitsets, series and SLA only count the check if its
+        # row was new
+        guard = ("""
+        INSERT INTO check_results (
+            site_id, ts, status_code, is_up, response_time,
+            ssl_ok, ssl_days_left, error, timeouts
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(site_id, ts) DO NOTHING
+        """, (
+            site_id,
+            ts,
+            status_code,
+            1 if is_up else 0,
+            response_time,
+            None if ssl_ok is None else (1 if ssl_ok else 0),
+            ssl_days_left,
+            error,
+            json.dumps(timeouts) if timeouts else None
+        ))
+    _write_group(raw + [
+        (_SERIES_APPEND, [_series_row(site_id, "rt", ts, response_time)]),
+        (_SITE_ROLLUP_UPSERT, _rollup_rows(site_id, ts, is_up, response_time)),
+        (_CLIENT_ROLLUP_UPSERT, _rollup_rows(client or "Unknown", ts, is_up, response_time)),
+        (_UPTIME_BITS_MARK, [_uptime_bits_row(site_id, ts, is_up)]),
+        ("INSERT INTO sla_feed (site_id, ts, state, gap_ms) VALUES (?, ?, ?, ?)",
+         [(site_id, ts, "up" if is_up else "down", gap_ms)]),
+        (_SITE_STATUS_UPSERT, [_site_status_row(site_id, ts, fields)]),
+        (_CHANGE_FEED_INSERT, [(site_id, "check")]),
+    ], guard)
+
+
+def upsert_site_status(url: str, fields: dict, client: Optional[str] = None):
+    """
+    Update the current status of a site without a new uptime check
+
+    Args:
+        url: Website URL
+        fields: site_status columns to set, e.g. dns_ok/dns_info,
+            ssl_ok/ssl_days_left, content_state/content_info, reputation.
+            Each group's *_ts column is stamped with the current time.
+        client: Client name, if known
+    """
+    if fields:
+        site_id = _site_id(url, client)
+        _write_group([
+            (_SITE_STATUS_UPSERT, [_site_status_row(site_id, _now_ms(), fields)]),
+            (_CHANGE_FEED_INSERT, [(site_id, "status")]),
+        ])
 
 
 def insert_performance_metric(url: str, response_time: float, ttfb: float, content_size: float, speed_grade: str):
-    """Insert performance metrics"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-    INSERT INTO performance_metrics (
-        url, checked_at, response_time, ttfb, content_size, speed_grade
-    ) VALUES (?, ?, ?, ?, ?, ?)
-    """, (
-        url,
-        datetime.utcnow().isoformat(),
-        response_time,
-        ttfb,
-        content_size,
-        speed_grade
-    ))
-    conn.commit()
-    conn.close()
+    """Insert performance metrics; the TTFB also goes to the site's ttfb series"""
+    site_id = _site_id(url)
+    _write_group([
+        ("""
+        INSERT INTO performance_metrics (
+            url, checked_at, response_time, ttfb, content_size, speed_grade
+        ) VALUES (?, ?, ?, ?, ?, ?)
+        """, [(
+            url,
+            datetime.utcnow().isoformat(),
+            response_time,
+            ttfb,
+            content_size,
+            speed_grade
+        )]),
+        (_SERIES_APPEND, [_series_row(site_id, "ttfb", _now_ms(), ttfb)]),
+        (_CHANGE_FEED_INSERT, [(site_id, "ttfb")]),
+    ])
 
 
 def insert_security_scan(url: str, security_score: float, missing_headers: str, headers_present: str):
     """Insert security scan results"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
+    _write("""
     INSERT INTO security_scans (
         url, scanned_at, security_score, missing_headers, headers_present
     ) VALUES (?, ?, ?, ?, ?)
@@ -214,15 +1323,11 @@ def insert_security_scan(url: str, security_score: float, missing_headers: str,
         missing_headers,
         headers_present
     ))
-    conn.commit()
-    conn.close()
 
 
 def insert_incident(url: str, incident_type: str, severity: str, message: str, details: str = ""):
     """Insert incident/alert"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
+    _write("""
     INSERT INTO incidents (
         url, incident_type, severity, message, details, created_at
     ) VALUES (?, ?, ?, ?, ?, ?)
@@ -234,15 +1339,11 @@ def insert_incident(url: str, incident_type: str, severity: str, message: str, d
         details,
         datetime.utcnow().isoformat()
     ))
-    conn.commit()
-    conn.close()
 
 
 def insert_ssl_details(url: str, ssl_data: dict):
     """Insert detailed SSL information"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
+    _write("""
     INSERT INTO ssl_details (
         url, checked_at, days_left, expiry_date, issued_date, issuer,
         subject_cn, tls_version, cipher_name, cipher_bits,
@@ -262,15 +1363,11 @@ def insert_ssl_details(url: str, ssl_data: dict):
         1 if ssl_data.get('is_self_signed') else 0,
         1 if ssl_data.get('chain_valid') else 0
     ))
-    conn.commit()
-    conn.close()
 
 
 def insert_content_change(url: str, content_hash: str, content_size: int, changed: bool, change_details: str = ""):
     """Insert content monitoring data"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
+    _write("""
     INSERT INTO content_monitoring (
         url, checked_at, content_hash, content_size, changed, change_details
     ) VALUES (?, ?, ?, ?, ?, ?)
@@ -282,16 +1379,12 @@ def insert_content_change(url: str, content_hash: str, content_size: int, change
         1 if changed else 0,
         change_details
     ))
-    conn.commit()
-    conn.close()
 
 
 def insert_anomaly(url: str, anomaly_type: str, severity: str, metric_value: float, 
                    expected_value: float, deviation: float, message: str):
     """Insert detected anomaly"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
+    _write("""
     INSERT INTO anomalies (
         url, detected_at, anomaly_type, severity, metric_value,
         expected_value, deviation_percentage, message
@@ -306,8 +1399,6 @@ def insert_anomaly(url: str, anomaly_type: str, severity: str, metric_value: flo
         deviation,
         message
     ))
-    conn.commit()
-    conn.close()
 
 
 def get_recent_incidents(url: Optional[str] = None, limit: int = 50):
@@ -338,13 +1429,15 @@ def get_recent_incidents(url: Optional[str] = None, limit: int = 50):
 def get_performance_trends(url: str, days: int = 7):
     """Get performance trends for a URL"""
     conn = sqlite3.connect(DB_PATH)
+    # Compare the stored ISO text directly so the (url, checked_at) index applies
+    since = (datetime.utcnow() - timedelta(days=days)).isoformat()
     query = """
     SELECT * FROM performance_metrics 
     WHERE url = ? 
-    AND datetime(checked_at) >= datetime('now', '-' || ? || ' days')
+    AND checked_at >= ?
     ORDER BY checked_at DESC
     """
-    trends = conn.execute(query, (url, days)).fetchall()
+    trends = conn.execute(query, (url, since)).fetchall()
     conn.close()
     return trends
 
@@ -389,15 +1482,11 @@ def get_unresolved_incidents(severity: Optional[str] = None):
 
 def resolve_incident(incident_id: int):
     """Mark an incident as resolved"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
+    _write("""
     UPDATE incidents 
     SET resolved = 1, resolved_at = ?
     WHERE id = ?
     """, (datetime.utcnow().isoformat(), incident_id))
-    conn.commit()
-    conn.close()
 
 
 def get_website_health_score(url: str) -> dict:
@@ -409,7 +1498,11 @@ def get_website_health_score(url: str) -> dict:
     # Get latest data
     uptime_query = """
     SELECT AVG(is_up) as uptime 
-    FROM (SELECT is_up FROM checks WHERE url = ? ORDER BY checked_at DESC LIMIT 100)
+    FROM (
+        SELECT is_up FROM check_results
+        WHERE site_id = (SELECT id FROM sites WHERE url = ?)
+        ORDER BY ts DESC LIMIT 100
+    )
     """
     uptime = conn.execute(uptime_query, (url,)).fetchone()[0] or 0
     
@@ -464,44 +1557,104 @@ def get_website_health_score(url: str) -> dict:
     }
 
 
-def insert_port_scan_results(url: str, hostname: str, results: list):
-    """Insert port scan results"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    timestamp = datetime.utcnow().isoformat()
-    
-    for result in results:
-        c.execute("""
-        INSERT INTO port_scans (
-            url, hostname, scanned_at, port, service, is_open, response_time, status
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            url,
-            hostname,
-            timestamp,
+def insert_port_scan_results(url: str, hostname: str, results: list, timeout: Optional[float] = None):
+    """
+    Insert port scan results; timeout is the per-port connect timeout used.
+    The host's port state and the site's open ports are updated in the
+    same transaction.
+    """
+    site_id = _site_id(url, hostname=hostname)
+    ts = _now_ms()
+    rows = [
+        (
             result['port'],
             result['service'],
             1 if result['is_open'] else 0,
             result.get('response_time', 0),
-            result['status']
-        ))
-    
-    conn.commit()
+            result['status'],
+        )
+        for result in results
+    ]
+    open_ports = [row[0] for row in rows if row[2]]
+    _write_group([
+        ("""
+        INSERT OR REPLACE INTO port_results (
+            site_id, ts, port, service, is_open, response_time, status, timeout
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(site_id, ts, *row, timeout) for row in rows]),
+        (_HOST_PORT_UPSERT, [(hostname, *row, ts) for row in rows]),
+        (_SITE_STATUS_UPSERT, [_site_status_row(site_id, ts, {"open_ports": open_ports})]),
+        (_CHANGE_FEED_INSERT, [(site_id, "ports")]),
+    ])
+
+
+def get_data_version() -> int:
+    """Current data version; it grows with every write the change feed records"""
+    conn = sqlite3.connect(DB_PATH)
+    row = conn.execute("SELECT seq FROM data_version WHERE id = 0").fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+
+def get_changes(since_seq: int = 0) -> list:
+    """
+    Sites changed after a data version
+
+    Returns:
+        List of (seq, url, kind), oldest first, with the latest change of
+        each (site, kind) newer than since_seq
+    """
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute("""
+    SELECT v.seq, s.url, v.kind FROM site_versions v JOIN sites s ON s.id = v.site_id
+    WHERE v.seq > ? ORDER BY v.seq
+    """, (since_seq,)).fetchall()
+    conn.close()
+    return rows
+
+
+def get_site_status(url: str) -> Optional[dict]:
+    """Current status of a site (one primary-key lookup), or None if never checked"""
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    row = conn.execute("""
+    SELECT s.url, s.client, s.hostname, st.*
+    FROM sites s JOIN site_status st ON st.site_id = s.id
+    WHERE s.url = ?
+    """, (url,)).fetchone()
     conn.close()
+    if row is None:
+        return None
+    status = dict(row)
+    status["open_ports"] = json.loads(status["open_ports"]) if status["open_ports"] else []
+    return status
+
+
+def get_host_ports(hostname: str) -> list:
+    """Last scanned state of every port of a host"""
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute(f"""
+    SELECT port, service, is_open, response_time, status, {_iso_sql("scanned_ts")} AS scanned_at
+    FROM host_port_state
+    WHERE hostname = ?
+    ORDER BY port
+    """, (hostname,)).fetchall()
+    conn.close()
+    return rows
 
 
 def get_latest_port_scan(url: str):
     """Get the latest port scan results for a URL"""
     conn = sqlite3.connect(DB_PATH)
-    query = """
-    SELECT port, service, is_open, response_time, status, scanned_at
-    FROM port_scans 
-    WHERE url = ? 
-    AND scanned_at = (SELECT MAX(scanned_at) FROM port_scans WHERE url = ?)
+    site_id = _lookup_site_id(conn, url)
+    query = f"""
+    SELECT port, service, is_open, response_time, status, {_iso_sql("ts")} AS scanned_at
+    FROM port_results
+    WHERE site_id = ?
+    AND ts = (SELECT MAX(ts) FROM port_results WHERE site_id = ?)
     ORDER BY port
     """
-    results = conn.execute(query, (url, url)).fetchall()
+    results = conn.execute(query, (site_id, site_id)).fetchall()
     conn.close()
     return results
 
@@ -509,13 +1662,478 @@ def get_latest_port_scan(url: str):
 def get_port_scan_history(url: str, limit: int = 10):
     """Get port scan history for a URL"""
     conn = sqlite3.connect(DB_PATH)
-    query = """
-    SELECT DISTINCT scanned_at
-    FROM port_scans 
-    WHERE url = ? 
-    ORDER BY scanned_at DESC 
+    site_id = _lookup_site_id(conn, url)
+    query = f"""
+    SELECT DISTINCT {_iso_sql("ts")}
+    FROM port_results
+    WHERE site_id = ?
+    ORDER BY ts DESC
     LIMIT ?
     """
-    scans = conn.execute(query, (url, limit)).fetchall()
+    scans = conn.execute(query, (site_id, limit)).fetchall()
+    conn.close()
+    return [scan[0] for scan in scans]
+
+def _iso_to_epoch(value: Optional[str]) -> Optional[float]:
+    """Convert a stored ISO-8601 timestamp (naive = UTC) to epoch seconds"""
+    if not value:
+        return None
+    try:
+        ts = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+def upsert_site_schedule(url: str, interval_seconds: float, healthy_streak: int,
+                         rt_average: Optional[float], reason: str):
+    """Store the effective uptime interval of a site"""
+    _write("""
+    INSERT INTO site_schedule (
+        url, interval_seconds, healthy_streak, rt_average, reason, updated_at
+    ) VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(url) DO UPDATE SET
+        interval_seconds = excluded.interval_seconds,
+        healthy_streak = excluded.healthy_streak,
+        rt_average = excluded.rt_average,
+        reason = excluded.reason,
+        updated_at = excluded.updated_at
+    """, (url, interval_seconds, healthy_streak, rt_average, reason, datetime.utcnow().isoformat()))
+
+
+def get_site_schedules() -> dict:
+    """Get the stored adaptive schedule state of every site, keyed by URL"""
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute(
+        "SELECT url, interval_seconds, healthy_streak, rt_average FROM site_schedule"
+    ).fetchall()
+    conn.close()
+    return {row[0]: (row[1], row[2], row[3]) for row in rows}
+
+
+def upsert_circuit_breaker(host: str, state: dict):
+    """Store the circuit breaker state of a host"""
+    _write("""
+    INSERT INTO circuit_breakers (
+        host, state, failures, opened_at, next_probe_at, backoff_seconds,
+        last_error, updated_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(host) DO UPDATE SET
+        state = excluded.state,
+        failures = excluded.failures,
+        opened_at = excluded.opened_at,
+        next_probe_at = excluded.next_probe_at,
+        backoff_seconds = excluded.backoff_seconds,
+        last_error = excluded.last_error,
+        updated_at = excluded.updated_at
+    """, (
+        host,
+        state["state"],
+        state["failures"],
+        state["opened_at"],
+        state["next_probe_at"],
+        state["backoff"],
+        state["last_error"],
+        datetime.utcnow().isoformat()
+    ))
+
+
+def get_circuit_breakers() -> dict:
+    """Get the stored circuit breaker state of every host"""
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute("""
+    SELECT host, state, failures, opened_at, next_probe_at, backoff_seconds, last_error
+    FROM circuit_breakers
+    """).fetchall()
+    conn.close()
+    return {
+        row[0]: {
+            "state": row[1],
+            "failures": row[2],
+            "opened_at": row[3],
+            "next_probe_at": row[4],
+            "backoff": row[5],
+            "last_error": row[6],
+        }
+        for row in rows
+    }
+
+
+def insert_engine_stats(concurrency_limit: int, peak_in_flight: int, sites_checked: int,
+                        cycle_seconds: float, lag_seconds: float,
+                        latency_inflation: Optional[float], error_rate: float, signal: str):
+    """Record one monitoring cycle's concurrency limit and the signals behind it"""
+    _write("""
+    INSERT INTO engine_stats (
+        recorded_at, concurrency_limit, peak_in_flight, sites_checked,
+        cycle_seconds, lag_seconds, latency_inflation, error_rate, signal
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (datetime.utcnow().isoformat(), concurrency_limit, peak_in_flight, sites_checked,
+          cycle_seconds, lag_seconds, latency_inflation, error_rate, signal))
+
+
+def get_content_hash(url: str) -> Optional[str]:
+    """Get the last stored content hash of a URL (None if never checked)"""
+    conn = sqlite3.connect(DB_PATH)
+    row = conn.execute("SELECT last_hash FROM content_state WHERE url = ?", (url,)).fetchone()
+    conn.close()
+    return row[0] if row else None
+
+
+def upsert_content_state(url: str, content_hash: str, changed: bool):
+    """Store the latest content hash of a URL"""
+    now = datetime.utcnow().isoformat()
+    _write("""
+    INSERT INTO content_state (url, last_hash, last_checked_at, last_changed_at)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(url) DO UPDATE SET
+        last_hash = excluded.last_hash,
+        last_checked_at = excluded.last_checked_at,
+        last_changed_at = CASE WHEN ? THEN excluded.last_changed_at ELSE last_changed_at END
+    """, (url, content_hash, now, now, 1 if changed else 0))
+
+
+def rollup_ranges(since: int, until: int) -> list:
+    """
+    Cover [since, until) (epoch seconds) with as few rollup buckets as
+    possible: minutes up to the first whole hour, hours up to the first
+    whole day, days in the middle, and the same in reverse at the end
+
+    Returns:
+        List of (resolution, start, end)
+    """
+    lo = since - since % 60
+    hi = until + (-until) % 60
+    ranges = []
+    for resolution, coarser in ((60, 3600), (3600, 86400)):
+        head = min(hi, lo + (-lo) % coarser)
+        if lo < head:
+            ranges.append((resolution, lo, head))
+            lo = head
+        tail = max(lo, hi - hi % coarser)
+        if tail < hi:
+            ranges.append((resolution, tail, hi))
+            hi = tail
+    if lo < hi:
+        ranges.append((86400, lo, hi))
+    return ranges
+
+
+def get_rollup_summary(since: float, until: Optional[float] = None,
+                       url: Optional[str] = None, client: Optional[str] = None) -> dict:
+    """
+    Uptime and response-time statistics over a time window, read from the
+    rollups (a few hundred rows at most, whatever the window)
+
+    Args:
+        since: Window start, epoch seconds
+        until: Window end, epoch seconds (default: now)
+        url: Only this site
+        client: Only this client's sites (ignored when url is given)
+
+    Returns:
+        Dictionary with checks, up_checks, uptime_pct, rt_avg, rt_min,
+        rt_max, p50, p95 and p99 (None where there is no data)
+    """
+    until = time.time() if until is None else until
+    ranges = rollup_ranges(int(since), int(until))
+    window = " OR ".join("(resolution = ? AND bucket >= ? AND bucket < ?)" for _ in ranges) or "0"
+    params = [value for r in ranges for value in r]
+
+    conn = sqlite3.connect(DB_PATH)
+    if url is not None:
+        table, where = "site_rollups", "site_id = (SELECT id FROM sites WHERE url = ?) AND "
+        params.insert(0, url)
+    elif client is not None:
+        table, where = "client_rollups", "client = ? AND "
+        params.insert(0, client)
+    else:
+        table, where = "client_rollups", ""
+    rows = conn.execute(f"""
+    SELECT checks, up_checks, rt_count, rt_sum, rt_min, rt_max, rt_sketch
+    FROM {table}
+    WHERE {where}({window})
+    """, params).fetchall()
+    conn.close()
+
+    checks = sum(row[0] for row in rows)
+    up_checks = sum(row[1] for row in rows)
+    rt_count = sum(row[2] for row in rows)
+    sketch = RTSketch()
+    for row in rows:
+        sketch.merge(RTSketch.from_bytes(row[6]))
+    rt_mins = [row[4] for row in rows if row[4] is not None]
+    rt_maxs = [row[5] for row in rows if row[5] is not None]
+    return {
+        "checks": checks,
+        "up_checks": up_checks,
+        "uptime_pct": up_checks / checks * 100 if checks else None,
+        "rt_avg": sum(row[3] for row in rows) / rt_count if rt_count else None,
+        "rt_min": min(rt_mins) if rt_mins else None,
+        "rt_max": max(rt_maxs) if rt_maxs else None,
+        "p50": sketch.quantile(0.50),
+        "p95": sketch.quantile(0.95),
+        "p99": sketch.quantile(0.99),
+    }
+
+
+def get_interval_uptime(since: float, until: Optional[float] = None, url: Optional[str] = None) -> dict:
+    """
+    Time-weighted uptime over a window from the state intervals (intervals
+    storage mode): each interval counts for the part of it inside the window,
+    and silences longer than the site's SLA gap, which no interval covers,
+    count as neither up nor down
+
+    Args:
+        since: Window start, epoch seconds
+        until: Window end, epoch seconds (default: now)
+        url: Only this site
+
+    Returns:
+        Dictionary with up_seconds, down_seconds, uptime_pct (None without
+        data), checks (estimated from the overlapping share of each
+        interval) and intervals (number of state runs in the window)
+    """
+    until = time.time() if until is None else until
+    lo, hi = int(since * 1000), int(until * 1000)
+    params = [hi, lo] * 3 + [lo, hi]
+    where = ""
+    if url is not None:
+        where = "AND site_id = (SELECT id FROM sites WHERE url = ?)"
+        params.append(url)
+
+    conn = sqlite3.connect(DB_PATH)
+    row = conn.execute(f"""
+    SELECT
+        SUM(CASE WHEN state = 'up' THEN max(0, min(end_ts, ?) - max(start_ts, ?)) ELSE 0 END),
+        SUM(CASE WHEN state = 'up' THEN 0 ELSE max(0, min(end_ts, ?) - max(start_ts, ?)) END),
+        SUM(CASE WHEN end_ts = start_ts THEN n_checks
+                 ELSE n_checks * 1.0 * max(0, min(end_ts, ?) - max(start_ts, ?)) / (end_ts - start_ts) END),
+        COUNT(*)
+    FROM state_intervals
+    WHERE end_ts >= ? AND start_ts <= ? {where}
+    """, params).fetchone()
+    conn.close()
+
+    up_ms, down_ms, checks, intervals = (value or 0 for value in row)
+    total = up_ms + down_ms
+    return {
+        "up_seconds": up_ms / 1000,
+        "down_seconds": down_ms / 1000,
+        "uptime_pct": up_ms / total * 100 if total else None,
+        "checks": round(checks),
+        "intervals": intervals,
+    }
+
+
+def get_slot_uptime(since: float, until: Optional[float] = None, url: Optional[str] = None) -> dict:
+    """
+    Uptime of every site over a window from the per-day bitsets: whole days
+    add up their stored popcounts, the partial days at either end are
+    masked to the window and popcounted
+
+    Args:
+        since: Window start, epoch seconds
+        until: Window end, epoch seconds (default: now)
+        url: Only this site
+
+    Returns:
+        Dictionary keyed by URL with ran_slots, up_slots and uptime_pct
+        (one-minute slots that were checked / up in the window)
+    """
+    until = time.time() if until is None else until
+    lo_ms, hi_ms = int(since * 1000), int(until * 1000)
+    if hi_ms <= lo_ms:
+        return {}
+    first, last = day_of(lo_ms), day_of(hi_ms - 1)
+    head, tail = slot_of(lo_ms), slot_of(hi_ms - 1) + 1
+    if first == last:
+        edges = {first: slot_mask(head, tail)}
+    else:
+        edges = {first: slot_mask(head, SLOTS_PER_DAY), last: slot_mask(0, tail)}
+
+    conn = sqlite3.connect(DB_PATH)
+    where, params = "", []
+    if url is not None:
+        where, params = "AND site_id = (SELECT id FROM sites WHERE url = ?)", [url]
+    whole = conn.execute(f"""
+    SELECT site_id, SUM(up_slots), SUM(ran_slots)
+    FROM uptime_bits
+    WHERE day > ? AND day < ? {where}
+    GROUP BY site_id
+    """, [first, last] + params).fetchall()
+    partial = conn.execute(f"""
+    SELECT site_id, day, up, ran
+    FROM uptime_bits
+    WHERE day IN (?, ?) {where}
+    """, [first, last] + params).fetchall()
+    urls = dict(conn.execute("SELECT id, url FROM sites").fetchall())
+    conn.close()
+
+    counts: dict = {}
+    for site_id, up_slots, ran_slots in whole:
+        counts[site_id] = [up_slots, ran_slots]
+    if partial:
+        masks = np.stack([edges[row[1]] for row in partial])
+        up = popcount(to_array([row[2] for row in partial]) & masks)
+        ran = popcount(to_array([row[3] for row in partial]) & masks)
+        for (site_id, *_), up_slots, ran_slots in zip(partial, up.tolist(), ran.tolist()):
+            total = counts.setdefault(site_id, [0, 0])
+            total[0] += up_slots
+            total[1] += ran_slots
+
+    return {
+        urls[site_id]: {
+            "ran_slots": ran_slots,
+            "up_slots": up_slots,
+            "uptime_pct": up_slots / ran_slots * 100 if ran_slots else None,
+        }
+        for site_id, (up_slots, ran_slots) in counts.items()
+        if site_id in urls
+    }
+
+
+def get_uptime_heatmap(days: int = 90, url: Optional[str] = None) -> dict:
+    """
+    Per-site, per-day slot counts for availability heatmaps, covering the
+    last days UTC days up to and including today
+
+    Args:
+        days: Number of days
+        url: Only this site
+
+    Returns:
+        Dictionary with urls (list), days (epoch seconds of each day,
+        int64 array) and up_slots / ran_slots (int64 arrays shaped
+        (len(urls), days)); uptime per cell is up_slots / ran_slots
+    """
+    today = day_of(_now_ms())
+    first = today - (days - 1) * DAY_SECONDS
+    where, params = "", [first]
+    if url is not None:
+        where, params = "AND site_id = (SELECT id FROM sites WHERE url = ?)", [first, url]
+
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute(f"""
+    SELECT site_id, day, up_slots, ran_slots
+    FROM uptime_bits
+    WHERE day >= ? {where}
+    """, params).fetchall()
+    sites = conn.execute("SELECT id, url FROM sites ORDER BY url").fetchall()
+    conn.close()
+
+    cells = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=4 * len(rows)).reshape(-1, 4)
+    present = set(np.unique(cells[:, 0]).tolist())
+    sites = [(site_id, site_url) for site_id, site_url in sites if site_id in present]
+    ids = np.array([site_id for site_id, _ in sites], dtype=np.int64)
+    order = np.argsort(ids)
+    row_of = order[np.searchsorted(ids, cells[:, 0], sorter=order)]
+    col_of = (cells[:, 1] - first) // DAY_SECONDS
+
+    up = np.zeros((len(sites), days), dtype=np.int64)
+    ran = np.zeros((len(sites), days), dtype=np.int64)
+    up[row_of, col_of] = cells[:, 2]
+    ran[row_of, col_of] = cells[:, 3]
+    return {
+        "urls": [site_url for _, site_url in sites],
+        "days": first + np.arange(days, dtype=np.int64) * DAY_SECONDS,
+        "up_slots": up,
+        "ran_slots": ran,
+    }
+
+
+def get_recent_response_times(url: str, limit: int = 200) -> list:
+    """Get the response times of the latest successful checks of a URL"""
+    conn = sqlite3.connect(DB_PATH)
+    site_id = _lookup_site_id(conn, url)
+    latest = conn.execute("""
+    SELECT ts, response_time FROM check_results
+    WHERE site_id = ? AND response_time IS NOT NULL
+    ORDER BY ts DESC LIMIT ?
+    """, (site_id, limit)).fetchall()
+
+    # In intervals mode (or after switching to it) the newest response
+    # times are only in the series blocks
+    newest = latest[0][0] if latest else 0
+    points = []
+    for hour, data in conn.execute("""
+    SELECT hour, data FROM series_blocks
+    WHERE site_id = ? AND metric = 'rt' AND hour >= ?
+    ORDER BY hour DESC
+    """, (site_id, block_hour(newest))):
+        offsets, values = decode_block(data)
+        points[:0] = [
+            (hour * 1000 + offset, value)
+            for offset, value in zip(offsets.tolist(), values.tolist())
+            if value == value and hour * 1000 + offset > newest
+        ]
+        if len(points) >= limit:
+            break
+    conn.close()
+
+    rows = sorted(latest + points)[-limit:]
+    return [row[1] for row in rows]
+
+
+def get_series(url: str, metric: str, since: float, until: Optional[float] = None) -> tuple:
+    """
+    Response-time ("rt") or TTFB ("ttfb") series of a site over a window,
+    decoded from one block per hour
+
+    Args:
+        since: Window start, epoch seconds
+        until: Window end, epoch seconds (default: now)
+
+    Returns:
+        (timestamps in epoch ms, values in seconds with NaN for failed
+        checks), both numpy arrays
+    """
+    until = time.time() if until is None else until
+    conn = sqlite3.connect(DB_PATH)
+    blocks = conn.execute("""
+    SELECT hour, data FROM series_blocks
+    WHERE site_id = (SELECT id FROM sites WHERE url = ?) AND metric = ? AND hour >= ? AND hour <= ?
+    ORDER BY hour
+    """, (url, metric, block_hour(int(since * 1000)), int(until))).fetchall()
+    conn.close()
+
+    ts_parts, value_parts = [np.empty(0, dtype=np.int64)], [np.empty(0)]
+    for hour, data in blocks:
+        offsets, values = decode_block(data)
+        ts_parts.append(offsets + hour * 1000)
+        value_parts.append(values)
+    ts, values = np.concatenate(ts_parts), np.concatenate(value_parts)
+    keep = (ts >= since * 1000) & (ts <= until * 1000)
+    return ts[keep], values[keep]
+
+
+def get_last_check_results(url: str) -> dict:
+    """
+    Get the last stored result of the slow-cadence checks for a URL, so the
+    scheduler doesn't repeat them right after a restart.
+
+    Returns:
+        Dictionary of check type -> (ran_at_epoch, result)
+    """
+    conn = sqlite3.connect(DB_PATH)
+    site_id = _lookup_site_id(conn, url)
+    last = {}
+
+    row = conn.execute(
+        "SELECT ssl_ts, ssl_ok, ssl_days_left, ports_ts FROM site_status WHERE site_id = ?", (site_id,)
+    ).fetchone()
+    if row and row[0] and row[2] is not None:
+        last["ssl"] = (row[0] / 1000, (bool(row[1]), row[2]))
+    if row and row[3]:
+        last["ports"] = (row[3] / 1000, None)
+
+    row = conn.execute(
+        "SELECT last_checked_at FROM content_state WHERE url = ?", (url,)
+    ).fetchone()
+    if row and _iso_to_epoch(row[0]):
+        last["content"] = (_iso_to_epoch(row[0]), ("No change", "Restored from database"))
+
     conn.close()
-    return [scan[0] for scan in scans]
\ No newline at end of file
+    return last
@@ -1,10 +1,12 @@
 import json
 import time
 import socket
+from collections import deque
 import hashlib
-import sqlite3
 from urllib.parse import urlparse
 from pathlib import Path
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 import requests
 import schedule
@@ -20,12 +22,97 @@ from email_alerts import (
     send_malicious_url_alert
 )
 
-from port_check import check_multiple_ports, get_port_recommendations
-from db import init_db, insert_check, insert_port_scan_results
+from port_check import check_multiple_ports, get_port_recommendations, MONITORED_PORTS
+from db import (
+    init_db,
+    insert_check,
+    insert_port_scan_results,
+    get_last_check_results,
+    upsert_site_schedule,
+    get_site_schedules,
+    upsert_circuit_breaker,
+    get_circuit_breakers,
+    get_recent_response_times,
+    insert_engine_stats,
+    get_content_hash,
+    upsert_content_state,
+    upsert_site_status,
+    flush_writes,
+    storage_settings,
+    set_storage_mode,
+    set_sla_gap,
+)
+from cadence import CadenceTracker, site_cadence, CHECK_TYPES
+from adaptive import AdaptiveInterval, adaptive_settings
+from circuit_breaker import CLOSED, CircuitBreaker, breaker_settings
+from check_dag import Stage, run_stages, remaining, SKIPPED, TIMED_OUT
+from timeouts import TimeoutLearner, timeout_settings
+from conn_budget import ConnectionBudget, BudgetTimeout
+from concurrency import AIMDController, concurrency_settings, DEFAULT_CONCURRENCY
+from retention import retention_settings, start_maintenance
+from sla import sla_settings, sla_gap_seconds
+from control import CheckNowQueue, control_settings, start_control_server
+from politeness import (
+    HostRateLimiter,
+    politeness_settings,
+    host_keys,
+    parse_retry_after,
+    TOKENS_PER_CHECK,
+)
 
 CONFIG_PATH = Path(__file__).parent / "config.json"
 DB_PATH = Path(__file__).parent.parent / "db" / "webguard.db"
 
+# How often the scheduler wakes up to look for due checks
+SCHEDULER_TICK_SECONDS = 10
+
+# Default time budget for all checks of one site
+SITE_DEADLINE_SECONDS = 15
+
+# Longest the monitor waits for the database writer to commit; a writer
+# stuck behind another connection's lock keeps retrying in the background
+FLUSH_TIMEOUT_SECONDS = 60
+
+# Upper bound on sites checked at once; the AIMD controller picks the
+# actual limit below it
+SITE_WORKERS = DEFAULT_CONCURRENCY["max"]
+SITE_EXECUTOR = ThreadPoolExecutor(max_workers=SITE_WORKERS, thread_name_prefix="site")
+
+# Worker threads the per-site check stages run on (up to four run in
+# parallel per site)
+STAGE_EXECUTOR = ThreadPoolExecutor(max_workers=4 * SITE_WORKERS, thread_name_prefix="stage")
+
+# Last run time and result of every (url, check) pair
+CADENCE = CadenceTracker(SCHEDULER_TICK_SECONDS)
+
+# Effective uptime interval of every site (adaptive mode)
+ADAPTIVE = AdaptiveInterval()
+
+# Per-host circuit breakers for targets that keep failing
+BREAKER = CircuitBreaker()
+
+# Per-site timeouts learned from recent check durations
+TIMEOUTS = TimeoutLearner()
+
+# Per-host/IP request budget shared by every probe type
+LIMITER = HostRateLimiter()
+
+# Process-wide budget of open probe sockets, sized from RLIMIT_NOFILE
+BUDGET = ConnectionBudget()
+
+# In-flight site check limit, tuned from latency, errors and cycle lag
+CONCURRENCY = AIMDController()
+
+# Breaker state is updated from the site worker threads
+BREAKER_LOCK = threading.Lock()
+
+# On-demand checks from the control API, served ahead of scheduled work
+CHECK_NOW = CheckNowQueue()
+
+# Checks a check-now request runs; port scans open a connection per
+# monitored port and stay on their cadence
+CHECK_NOW_TYPES = set(CHECK_TYPES) - {"ports"}
+
 
 # ═══════════════════════════════════════════════════════════
 # MONITORING UTILITY FUNCTIONS
@@ -68,6 +155,36 @@ def dns_check(domain: str) -> tuple[bool, str]:
         return False, str(e)
 
 
+def cheap_probe(url: str, timeout_s: float = 2) -> tuple[bool, str]:
+    """
+    Cheapest reachability test for a host: DNS lookup plus one TCP connect
+    to the URL's port, used while its circuit breaker is open
+    
+    Args:
+        url: Website URL
+        timeout_s: Connect timeout in seconds
+        
+    Returns:
+        Tuple of (reachable: bool, info: str)
+    """
+    parsed = urlparse(url)
+    domain = domain_from_url(url)
+    dns_ok, dns_info = dns_check(domain)
+    if not dns_ok:
+        return False, f"DNS: {dns_info}"
+
+    try:
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    except ValueError:
+        return False, "Invalid port"
+
+    try:
+        with socket.create_connection((domain, port), timeout=timeout_s):
+            return True, f"TCP {port} reachable"
+    except Exception as e:
+        return False, f"TCP {port}: {e}"
+
+
 def score_url_reputation(url: str) -> str:
     """
     Simple offline heuristic URL reputation scoring
@@ -115,32 +232,11 @@ def score_url_reputation(url: str) -> str:
     return "Safe"
 
 
-def ensure_content_table(conn: sqlite3.Connection):
-    """
-    Ensure content_state table exists in database
-    
-    Args:
-        conn: SQLite connection object
-    """
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS content_state (
-            url TEXT PRIMARY KEY,
-            last_hash TEXT,
-            last_checked_at TEXT,
-            last_changed_at TEXT
-        )
-        """
-    )
-    conn.commit()
-
-
-def content_change_check(db_path: Path, url: str, timeout_s: int = 8) -> tuple[str, str]:
+def content_change_check(url: str, timeout_s: float = 8) -> tuple[str, str]:
     """
     Check if website content has changed
     
     Args:
-        db_path: Path to SQLite database
         url: URL to check
         timeout_s: Request timeout in seconds
         
@@ -158,45 +254,21 @@ def content_change_check(db_path: Path, url: str, timeout_s: int = 8) -> tuple[s
     except Exception as e:
         return "Unavailable", str(e)
 
-    conn = sqlite3.connect(db_path)
-    ensure_content_table(conn)
+    last_hash = get_content_hash(url)
 
-    row = conn.execute(
-        "SELECT last_hash FROM content_state WHERE url = ?",
-        (url,),
-    ).fetchone()
-
-    now = pd.Timestamp.utcnow().isoformat()
-
-    if row is None:
+    if last_hash is None:
         # First time checking this URL
-        conn.execute(
-            "INSERT INTO content_state(url, last_hash, last_checked_at, last_changed_at) VALUES(?,?,?,?)",
-            (url, content_hash, now, now),
-        )
-        conn.commit()
-        conn.close()
+        upsert_content_state(url, content_hash, changed=True)
         return "No change", "Baseline saved"
 
-    last_hash = row[0] or ""
     if last_hash != content_hash:
         # Content has changed
-        conn.execute(
-            "UPDATE content_state SET last_hash=?, last_checked_at=?, last_changed_at=? WHERE url=?",
-            (content_hash, now, now, url),
-        )
-        conn.commit()
-        conn.close()
+        upsert_content_state(url, content_hash, changed=True)
         return "Changed", "Content updated"
-    else:
-        # No change
-        conn.execute(
-            "UPDATE content_state SET last_checked_at=? WHERE url=?",
-            (now, url),
-        )
-        conn.commit()
-        conn.close()
-        return "No change", "No update"
+
+    # No change
+    upsert_content_state(url, content_hash, changed=False)
+    return "No change", "No update"
 
 
 # ═══════════════════════════════════════════════════════════
@@ -219,9 +291,18 @@ def check_single_website(
     ssl_warning_days: int,
     email_enabled: bool,
     alert_email: str | None,
+    due_checks: set[str] | None = None,
+    deadline_s: float = SITE_DEADLINE_SECONDS,
+    timeout_cfg: dict | None = None,
+    politeness_cfg: dict | None = None,
 ):
     """
     Check a single website for uptime, SSL, DNS, reputation, and content changes
+
+    The checks run as a dependency graph: DNS gates HTTP, SSL and ports,
+    HTTP gates content, and reputation needs no network. Independent
+    checks run concurrently, a failed dependency skips its dependents, and
+    everything still running at deadline_s is abandoned.
     
     Args:
         url: Website URL to check
@@ -229,148 +310,305 @@ def check_single_website(
         ssl_warning_days: Days before SSL expiry to trigger warning
         email_enabled: Whether email alerts are enabled
         alert_email: Email address to send alerts to
+        due_checks: Check types to run now; the others reuse their last
+            stored result. None runs every check.
+        deadline_s: Seconds the whole site check may take
+        timeout_cfg: Adaptive timeout settings (see timeouts.timeout_settings);
+            None uses the fixed default timeouts
+        politeness_cfg: Rate limiter settings, used to honour Retry-After
+
+    Returns:
+        Set of check types that actually ran (not skipped or cached)
     """
-    status_code = None
-    response_time = None
-    ssl_ok = None
-    ssl_days_left = None
-    error = None
-    is_up = False
+    due = set(CHECK_TYPES) if due_checks is None else due_checks
+    parsed = urlparse(url)
+    domain = domain_from_url(url)
+
+    # Timeouts learned from this site's history, recorded with the results
+    timeout_cfg = timeout_cfg or timeout_settings({})
+    timeouts = TIMEOUTS.timeouts(url, timeout_cfg)
+    window = int(timeout_cfg["window"])
 
-    print(f"\n{'='*70}")
-    print(f"🌐 MONITORING: {url}")
-    print(f"{'='*70}")
+    # Stages run concurrently, so each one collects its own output and the
+    # site's report is printed in a fixed order at the end
+    logs = {check: [] for check in CHECK_TYPES}
+
+    def in_time(deadline: float) -> bool:
+        # A stage abandoned at the deadline must not store anything over
+        # the result already reported for it
+        return time.monotonic() <= deadline
+
+    def record(check: str, result: object, deadline: float):
+        if in_time(deadline):
+            CADENCE.record(url, check, result)
 
     # ─────────────────────────────────────────────────────────
     # 1) HTTP/HTTPS REQUEST - Status & Response Time
     # ─────────────────────────────────────────────────────────
-    try:
-        response = requests.get(url, timeout=10)
-        status_code = response.status_code
-        response_time = response.elapsed.total_seconds()
-        is_up = 200 <= status_code < 400
-        
-        status_icon = "✅" if is_up else "❌"
-        print(f"{status_icon} Status: {status_code} | Response Time: {response_time:.4f}s")
-    except Exception as e:
-        error = "Unable to identify"
-        print(f"❌ Status: DOWN | Error: Unable to identify")
+    def stage_uptime(deps: dict, deadline: float):
+        log = logs["uptime"]
+        try:
+            with BUDGET.slot("uptime", timeout=remaining(deadline)):
+                response = requests.get(url, timeout=min(timeouts["uptime"], remaining(deadline)))
+            status_code = response.status_code
+            response_time = response.elapsed.total_seconds()
+            TIMEOUTS.observe(url, "uptime", response_time, window)
+            is_up = 200 <= status_code < 400
+            
+            status_icon = "✅" if is_up else "❌"
+            log.append(f"{status_icon} Status: {status_code} | Response Time: {response_time:.4f}s")
+
+            # Throttled: leave the whole host alone until it says otherwise
+            if status_code in (429, 503):
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if retry_after:
+                    LIMITER.back_off(_limiter_keys(url), retry_after, politeness_cfg or politeness_settings({}))
+                    log.append(f"   └─ Retry-After: backing off {retry_after:g}s")
+            record("uptime", (status_code, is_up, response_time, None), deadline)
+            # Any HTTP answer lets the content check go ahead
+            return True, status_code
+        except BudgetTimeout as e:
+            log.append(f"❌ Status: not checked | Error: {e}")
+            record("uptime", (None, False, None, "Connection budget exhausted"), deadline)
+            return False, "Connection budget exhausted"
+        except Exception as e:
+            if isinstance(e, requests.Timeout):
+                # Otherwise a site slower than its learned timeout never
+                # adds a sample and stays down
+                TIMEOUTS.observe_timeout(url, "uptime", timeout_cfg)
+            log.append(f"❌ Status: DOWN | Error: Unable to identify")
+            record("uptime", (None, False, None, "Unable to identify"), deadline)
+            return False, "Unable to identify"
 
     # ─────────────────────────────────────────────────────────
     # 2) SSL CHECK - Days Until Expiry
     # ─────────────────────────────────────────────────────────
-    parsed = urlparse(url)
-    if parsed.scheme == "https" and parsed.hostname:
-        hostname = parsed.hostname
-        days_left = get_ssl_expiry_days(hostname)
-        if days_left is not None:
-            ssl_days_left = days_left
-            ssl_ok = days_left > 0
-            ssl_icon = "🔒" if ssl_days_left > ssl_warning_days else "⚠️"
-            print(f"{ssl_icon} SSL Days Left: {ssl_days_left} days")
-
-            # SSL EXPIRY ALERT
-            if ssl_days_left <= ssl_warning_days:
-                send_ssl_expiry_alert(client, url, ssl_days_left, email_enabled, alert_email)
-        else:
-            ssl_ok = None
-            print(f"⚠️ SSL Days Left: N/A (Could not determine)")
-    else:
-        print(f"ℹ️ SSL Days Left: N/A (HTTP only)")
+    def stage_ssl(deps: dict, deadline: float):
+        log = logs["ssl"]
+        if not (parsed.scheme == "https" and parsed.hostname):
+            log.append(f"ℹ️ SSL Days Left: N/A (HTTP only)")
+            record("ssl", (None, None), deadline)
+            return True, None
+
+        started = time.monotonic()
+        with BUDGET.slot("ssl", timeout=remaining(deadline)):
+            days_left = get_ssl_expiry_days(parsed.hostname, timeout=min(timeouts["ssl"], remaining(deadline)))
+        if days_left is None:
+            log.append(f"⚠️ SSL Days Left: N/A (Could not determine)")
+            record("ssl", (None, None), deadline)
+            return False, None
+
+        TIMEOUTS.observe(url, "ssl", time.monotonic() - started, window)
+        ssl_icon = "🔒" if days_left > ssl_warning_days else "⚠️"
+        log.append(f"{ssl_icon} SSL Days Left: {days_left} days")
+
+        # SSL EXPIRY ALERT
+        if days_left <= ssl_warning_days:
+            send_ssl_expiry_alert(client, url, days_left, email_enabled, alert_email)
+        record("ssl", (days_left > 0, days_left), deadline)
+        return True, days_left
 
     # ─────────────────────────────────────────────────────────
     # 3) DNS MONITORING - Domain Resolution
     # ─────────────────────────────────────────────────────────
-    domain = domain_from_url(url)
-    dns_ok, dns_info = dns_check(domain)
-    
-    dns_icon = "✅" if dns_ok else "❌"
-    dns_status = "Resolved" if dns_ok else "Failed"
-    print(f"{dns_icon} DNS Monitoring: {dns_status}")
-    if dns_ok:
-        print(f"   └─ {dns_info}")
-    else:
-        print(f"   └─ Error: Unable to resolve domain")
-        send_dns_failure_alert(client, url, domain, dns_info, email_enabled, alert_email)
+    def stage_dns(deps: dict, deadline: float):
+        log = logs["dns"]
+        with BUDGET.slot("dns", timeout=remaining(deadline)):
+            dns_ok, dns_info = dns_check(domain)
+        
+        dns_icon = "✅" if dns_ok else "❌"
+        dns_status = "Resolved" if dns_ok else "Failed"
+        log.append(f"{dns_icon} DNS Monitoring: {dns_status}")
+        if dns_ok:
+            log.append(f"   └─ {dns_info}")
+        else:
+            log.append(f"   └─ Error: Unable to resolve domain")
+            send_dns_failure_alert(client, url, domain, dns_info, email_enabled, alert_email)
+        record("dns", (dns_ok, dns_info), deadline)
+        return dns_ok, dns_info
 
     # ─────────────────────────────────────────────────────────
     # 4) PORT MONITORING - Open Ports Scan
     # ─────────────────────────────────────────────────────────
-    if domain:
-        print(f"🔍 Port Monitoring: Scanning common ports...")
-        try:
-            # Scan only critical ports for speed
-            critical_ports = [22, 80, 443, 21, 25, 3306, 5432, 8080]
-            port_results = check_multiple_ports(domain, critical_ports, timeout=1)
-            
-            open_ports = port_results.get('open_ports', [])
-            all_results = port_results.get('results', [])
+    def stage_ports(deps: dict, deadline: float):
+        log = logs["ports"]
+        if not domain:
+            log.append(f"ℹ️ Port Monitoring: Skipped (no domain)")
+            record("ports", None, deadline)
+            return True, None
+
+        log.append(f"🔍 Port Monitoring: Scanning common ports...")
+        # Ports are probed in parallel, so one timeout bounds the scan
+        with BUDGET.slot("ports", len(MONITORED_PORTS), timeout=remaining(deadline)):
+            port_timeout = min(timeouts["ports"], remaining(deadline))
+            port_results = check_multiple_ports(
+                domain, MONITORED_PORTS, timeout=port_timeout, max_workers=len(MONITORED_PORTS)
+            )
+        
+        open_ports = port_results.get('open_ports', [])
+        all_results = port_results.get('results', [])
+        for result in all_results:
+            if result['is_open']:
+                TIMEOUTS.observe(url, "ports", result['response_time'], window)
+        
+        # Past the deadline the run has already reported ports as timed out
+        if not in_time(deadline):
+            return False, None
+
+        # SAVE TO DATABASE using your existing function
+        insert_port_scan_results(url, domain, all_results, port_timeout)
+        
+        if open_ports:
+            log.append(f"   └─ Found {len(open_ports)} open port(s): {', '.join(map(str, open_ports))}")
             
-            # SAVE TO DATABASE using your existing function
-            insert_port_scan_results(url, domain, all_results)
+            # Show details of open ports
+            for result in all_results:
+                if result['is_open']:
+                    log.append(f"      • Port {result['port']} ({result['service']}) - {result['status']}")
             
-            if open_ports:
-                print(f"   └─ Found {len(open_ports)} open port(s): {', '.join(map(str, open_ports))}")
+            # Get security recommendations
+            recommendations = get_port_recommendations(port_results)
+            if recommendations:
+                log.append(f"   └─ Security Recommendations:")
+                for rec in recommendations[:3]:  # Show top 3 recommendations
+                    log.append(f"      {rec}")
                 
-                # Show details of open ports
-                for result in all_results:
-                    if result['is_open']:
-                        print(f"      • Port {result['port']} ({result['service']}) - {result['status']}")
+                # Alert on critical security issues (Telnet, exposed databases)
+                critical_ports_check = [23, 3306, 5432, 27017, 6379]
+                critical_open = [p for p in critical_ports_check if p in open_ports]
                 
-                # Get security recommendations
-                recommendations = get_port_recommendations(port_results)
-                if recommendations:
-                    print(f"   └─ Security Recommendations:")
-                    for rec in recommendations[:3]:  # Show top 3 recommendations
-                        print(f"      {rec}")
-                    
-                    # Alert on critical security issues (Telnet, exposed databases)
-                    critical_ports_check = [23, 3306, 5432, 27017, 6379]
-                    critical_open = [p for p in critical_ports_check if p in open_ports]
-                    
-                    if critical_open:
-                        send_port_security_alert(client, url, domain, critical_open, recommendations, email_enabled, alert_email)
-            else:
-                print(f"   └─ No common ports found open")
-                
-        except Exception as e:
-            print(f"⚠️ Port Monitoring: Unable to scan - {str(e)}")
-    else:
-        print(f"ℹ️ Port Monitoring: Skipped (no domain)")
+                if critical_open:
+                    send_port_security_alert(client, url, domain, critical_open, recommendations, email_enabled, alert_email)
+        else:
+            log.append(f"   └─ No common ports found open")
+        record("ports", None, deadline)
+        return True, open_ports
 
     # ─────────────────────────────────────────────────────────
     # 5) URL REPUTATION CHECK - Security Scoring
     # ─────────────────────────────────────────────────────────
-    reputation = score_url_reputation(url)
-    
-    if reputation == "Malicious":
-        print(f"❌ URL Reputation: MALICIOUS ⚠️")
-        send_malicious_url_alert(client, url, email_enabled, alert_email)
-    elif reputation == "Risky":
-        print(f"⚠️ URL Reputation: Risky ⚠️")
-    else:
-        print(f"✅ URL Reputation: Safe")
+    def stage_reputation(deps: dict, deadline: float):
+        log = logs["reputation"]
+        reputation = score_url_reputation(url)
+        
+        if reputation == "Malicious":
+            log.append(f"❌ URL Reputation: MALICIOUS ⚠️")
+            send_malicious_url_alert(client, url, email_enabled, alert_email)
+        elif reputation == "Risky":
+            log.append(f"⚠️ URL Reputation: Risky ⚠️")
+        else:
+            log.append(f"✅ URL Reputation: Safe")
+        record("reputation", reputation, deadline)
+        return True, reputation
 
     # ─────────────────────────────────────────────────────────
     # 6) CONTENT CHANGE DETECTION - Page Content Monitoring
     # ─────────────────────────────────────────────────────────
-    content_state, content_info = content_change_check(DB_PATH, url)
-    
-    if content_state == "Changed":
-        print(f"⚠️ Content Change: Changed ⚠️")
-        print(f"   └─ Content has changed!")
+    def stage_content(deps: dict, deadline: float):
+        log = logs["content"]
+        started = time.monotonic()
+        with BUDGET.slot("content", timeout=remaining(deadline)):
+            content_state, content_info = content_change_check(
+                url, timeout_s=min(timeouts["content"], remaining(deadline))
+            )
+        if content_state != "Unavailable":
+            TIMEOUTS.observe(url, "content", time.monotonic() - started, window)
         
-    elif content_state == "No change":
-        print(f"✅ Content Change: No change")
-    else:
-        print(f"⚠️ Content Change: {content_state}")
-        print(f"   └─ Unable to identify")
+        if content_state == "Changed":
+            log.append(f"⚠️ Content Change: Changed ⚠️")
+            log.append(f"   └─ Content has changed!")
+            
+        elif content_state == "No change":
+            log.append(f"✅ Content Change: No change")
+        else:
+            log.append(f"⚠️ Content Change: {content_state}")
+            log.append(f"   └─ Unable to identify")
+        record("content", (content_state, content_info), deadline)
+        return content_state != "Unavailable", content_state
+
+    stages = [
+        Stage("dns", stage_dns),
+        Stage("uptime", stage_uptime, ("dns",)),
+        Stage("ssl", stage_ssl, ("dns",)),
+        Stage("ports", stage_ports, ("dns",)),
+        Stage("reputation", stage_reputation),
+        Stage("content", stage_content, ("uptime",)),
+    ]
+
+    # Checks that are not due stand in with their last result
+    preset = {}
+    last_dns = CADENCE.last_result(url, "dns")
+    if "dns" not in due and last_dns is not None:
+        preset["dns"] = {"status": "cached", "ok": last_dns[0], "value": last_dns[1], "elapsed": 0.0}
+    last_uptime = CADENCE.last_result(url, "uptime")
+    if "uptime" not in due and last_uptime is not None:
+        preset["uptime"] = {"status": "cached", "ok": last_uptime[0] is not None, "value": last_uptime[0], "elapsed": 0.0}
+
+    started = time.monotonic()
+    results = run_stages([s for s in stages if s.name in due], deadline_s, STAGE_EXECUTOR, preset)
+    elapsed = time.monotonic() - started
+
+    # Short-circuited and timed-out checks wait for their next cadence like
+    # any other, keeping whatever they last reported, rather than taking the
+    # whole deadline again on every tick
+    ran = set()
+    for check in due:
+        if results[check]["status"] in (SKIPPED, TIMED_OUT):
+            CADENCE.skip(url, check)
+        else:
+            ran.add(check)
+
+    # What this run learned about the site, for its current-status row
+    status = {}
+    if "ssl" in ran:
+        status["ssl_ok"], status["ssl_days_left"] = CADENCE.last_result(url, "ssl") or (None, None)
+    if "dns" in ran:
+        status["dns_ok"], status["dns_info"] = CADENCE.last_result(url, "dns") or (None, None)
+    if "content" in ran:
+        status["content_state"], status["content_info"] = CADENCE.last_result(url, "content") or (None, None)
+    if "reputation" in ran:
+        status["reputation"] = CADENCE.last_result(url, "reputation")
+
+    # Sites are checked concurrently; print each report in one piece
+    out = [f"\n{'='*70}"]
+    out.append(f"🌐 MONITORING: {url}")
+    out.append(f"   └─ Due checks: {', '.join(c for c in CHECK_TYPES if c in due) or 'none'} ({elapsed:.2f}s)")
+    if timeout_cfg["enabled"]:
+        out.append("   └─ Timeouts: " + ", ".join(f"{c} {t:g}s" for c, t in timeouts.items()))
+    out.append(f"{'='*70}")
+
+    labels = {
+        "uptime": "Status", "ssl": "SSL Days Left", "dns": "DNS Monitoring",
+        "ports": "Port Monitoring", "reputation": "URL Reputation", "content": "Content Change",
+    }
+    for check in ("uptime", "ssl", "dns", "ports", "reputation", "content"):
+        result = results.get(check)
+        if check not in due:
+            if check != "reputation":
+                out.append(f"↩️ {labels[check]}: skipped (not due)")
+        elif result["status"] in (SKIPPED, TIMED_OUT):
+            out.append(f"⏭️ {labels[check]}: {result['status']} ({result['value']})")
+        out.extend(logs[check])
+
+    # The remaining steps only describe a fresh uptime result
+    if "uptime" not in due:
+        upsert_site_status(url, status, client)
+        out.append(f"{'='*70}")
+        print("\n".join(out))
+        return ran
+
+    if results["uptime"]["status"] in (SKIPPED, TIMED_OUT):
+        error = f"{results['uptime']['status'].capitalize()}: {results['uptime']['value']}"
+        CADENCE.record(url, "uptime", (None, False, None, error))
+
+    status_code, is_up, response_time, error = CADENCE.last_result(url, "uptime")
+    ssl_ok, ssl_days_left = CADENCE.last_result(url, "ssl") or (None, None)
 
     # ─────────────────────────────────────────────────────────
     # Last Checked timestamp
     # ─────────────────────────────────────────────────────────
     last_checked = pd.Timestamp.utcnow().isoformat()
-    print(f"🕐 Last Checked: {last_checked}")
+    out.append(f"🕐 Last Checked: {last_checked}")
 
     # ─────────────────────────────────────────────────────────
     # 7) DOWNTIME ALERT
@@ -402,28 +640,264 @@ def check_single_website(
         response_time=response_time,
         ssl_ok=ssl_ok,
         ssl_days_left=ssl_days_left,
-        error=error
+        error=error,
+        timeouts=timeouts,
+        status=status
     )
 
-    print(f"{'='*70}")
+    out.append(f"{'='*70}")
+    print("\n".join(out))
+    return ran
 
 
 # ═══════════════════════════════════════════════════════════
 # JOB SCHEDULER
 # ═══════════════════════════════════════════════════════════
 
-def job():
-    """Load config fresh each time the job runs and check all websites"""
+def _seed_cadence(url: str):
+    """Restore last run times of slow-cadence checks stored before a restart"""
+    if CADENCE.is_seeded(url):
+        return
+    try:
+        CADENCE.seed(url, get_last_check_results(url))
+    except Exception as e:
+        print(f"⚠️ Could not restore last results for {url}: {e}")
+        CADENCE.seed(url, {})
+
+
+def _limiter_keys(url: str) -> list[str]:
+    """Rate limiter keys of a site: hostname plus its last resolved IPs"""
+    dns = CADENCE.last_result(url, "dns")
+    ips = dns[1].split(", ") if dns and dns[0] else []
+    return host_keys(domain_from_url(url), ips)
+
+
+def _site_tokens(due: set[str]) -> int:
+    """Requests a site check sends to its host"""
+    return sum(TOKENS_PER_CHECK.get(check, 0) for check in due)
+
+
+def _seed_timeouts(url: str, settings: dict):
+    """Warm the timeout learner up with response times stored before a restart"""
+    if TIMEOUTS.is_seeded(url):
+        return
+    window = int(settings["window"])
+    try:
+        TIMEOUTS.seed(url, "uptime", get_recent_response_times(url, window), window)
+    except Exception as e:
+        print(f"⚠️ Could not restore response times for {url}: {e}")
+        TIMEOUTS.seed(url, "uptime", [], window)
+
+
+def _adapt_interval(url: str, base_s: float, settings: dict):
+    """Feed the fresh uptime result to the adaptive scheduler and store it"""
+    status_code, is_up, response_time, error = CADENCE.last_result(url, "uptime")
+    state = ADAPTIVE.observe(url, is_up, response_time, base_s, settings)
+    interval_s = ADAPTIVE.interval(url, base_s, settings)
+
+    if settings["enabled"]:
+        print(f"⏱️ {url}: next uptime check in {interval_s:g}s ({state['reason']})")
+
+    try:
+        upsert_site_schedule(
+            url,
+            interval_s,
+            state["streak"],
+            state["rt_avg"],
+            state["reason"] if settings["enabled"] else "fixed",
+        )
+    except Exception as e:
+        print(f"⚠️ Could not store schedule for {url}: {e}")
+
+
+def _save_breaker(host: str):
+    try:
+        upsert_circuit_breaker(host, BREAKER.state(host))
+    except Exception as e:
+        print(f"⚠️ Could not store circuit breaker for {host}: {e}")
+
+
+def _update_breaker(url: str, host: str, settings: dict):
+    """Feed the fresh uptime result of a full check to the host's breaker"""
+    status_code, is_up, response_time, error = CADENCE.last_result(url, "uptime")
+    # Any HTTP answer means the host is reachable, even a 5xx
+    reachable = status_code is not None
+    with BREAKER_LOCK:
+        before = BREAKER.state(host)["state"]
+        changed = BREAKER.record_check(host, reachable, error, settings)
+        state = BREAKER.state(host)
+    if changed:
+        if state["state"] != before:
+            print(f"🔌 Circuit breaker for {host}: {before} → {state['state']}")
+        _save_breaker(host)
+
+
+def _run_probe(url: str, client: str, host: str, due: set[str], settings: dict, probed: dict) -> bool:
+    """
+    Run the cheap probe for a host whose breaker is open (once per tick)
+
+    Returns:
+        True if the host answered and a full trial check should follow
+    """
+    if host not in probed:
+        try:
+            with BUDGET.slot("probe", timeout=settings["probe_timeout_seconds"]):
+                ok, info = cheap_probe(url, settings["probe_timeout_seconds"])
+        except BudgetTimeout as e:
+            print(f"⏳ {host}: {e}, probing next tick")
+            return False
+        BREAKER.record_probe(host, ok, info, settings)
+        _save_breaker(host)
+        probed[host] = (ok, info)
+        CADENCE.record_connections({"probe"}, due)
+    ok, info = probed[host]
+
+    state = BREAKER.state(host)
+    if ok:
+        print(f"🔌 Circuit breaker for {host}: probe OK ({info}) → half-open trial")
+        return True
+
+    print(f"⛔ Circuit OPEN for {host}: {info} (next probe in {state['backoff']:g}s)")
+    error = f"Circuit open: {info}"
+    ssl_ok, ssl_days_left = CADENCE.last_result(url, "ssl") or (None, None)
+    CADENCE.record(url, "uptime", (None, False, None, error))
+    insert_check(
+        url=url,
+        client=client,
+        status_code=None,
+        is_up=False,
+        response_time=None,
+        ssl_ok=ssl_ok,
+        ssl_days_left=ssl_days_left,
+        error=error
+    )
+    return False
+
+
+def _check_site(site: tuple, ssl_warning_days: int, email_enabled: bool, alert_email: str | None,
+                deadline_s: float, timeout_cfg: dict, polite: dict, adaptive: dict, breaker: dict):
+    """
+    Run one site's due checks and feed the results to the schedulers
+    (runs on SITE_EXECUTOR)
+
+    Returns:
+        (latency, connect_error) for the concurrency controller
+    """
+    url, client, due, base_s = site
+    before = CADENCE.last_result(url, "uptime")
+
+    ran = check_single_website(
+        url, client, ssl_warning_days, email_enabled, alert_email, due, deadline_s, timeout_cfg, polite
+    )
+    CADENCE.record_connections(ran | (due & {"uptime"}), due)
+    if "uptime" not in due:
+        return None, False
+
+    _adapt_interval(url, base_s, adaptive)
+    host = domain_from_url(url)
+    if breaker["enabled"] and host:
+        _update_breaker(url, host, breaker)
+
+    status_code, is_up, response_time, error = CADENCE.last_result(url, "uptime")
+    # Only a site that answered last time and now can't be reached hints
+    # at our own path being congested; dead sites and DNS failures don't
+    answered_before = before is not None and before[0] is not None
+    connect_error = answered_before and status_code is None and not str(error).startswith("Skipped")
+    return response_time, connect_error
+
+
+def _monitored_sites(config: dict) -> list[tuple[str, str]]:
+    """(url, client) of every configured website"""
+    sites = []
+    for site in config.get("websites", []):
+        if isinstance(site, dict):
+            url, client = site.get("url"), site.get("client", "Unknown")
+        else:
+            url, client = site, "Unknown"
+        if url:
+            sites.append((url, client))
+    return sites
+
+
+def _check_now_targets(url: str | None, client: str | None) -> list[str]:
+    """Monitored URLs a control API request covers"""
+    return [
+        site_url for site_url, site_client in _monitored_sites(load_config())
+        if site_url == url or (url is None and site_client == client)
+    ]
+
+
+def _flush() -> bool:
+    """flush_writes() with a bound, so a stuck writer can't stall the monitor"""
+    if flush_writes(FLUSH_TIMEOUT_SECONDS):
+        return True
+    print(f"⚠️ Database writes not committed after {FLUSH_TIMEOUT_SECONDS}s; still retrying")
+    return False
+
+
+def _check_result(url: str) -> dict:
+    """A site's latest results, as returned to check-now callers"""
+    status_code, is_up, response_time, error = CADENCE.last_result(url, "uptime") or (None, None, None, None)
+    ssl_ok, ssl_days_left = CADENCE.last_result(url, "ssl") or (None, None)
+    dns_ok, dns_info = CADENCE.last_result(url, "dns") or (None, None)
+    content_state, content_info = CADENCE.last_result(url, "content") or (None, None)
+    return {
+        "url": url,
+        "checked_at": pd.Timestamp.utcnow().isoformat(),
+        "is_up": is_up,
+        "status_code": status_code,
+        "response_time": response_time,
+        "error": error,
+        "ssl_ok": ssl_ok,
+        "ssl_days_left": ssl_days_left,
+        "dns_ok": dns_ok,
+        "dns_info": dns_info,
+        "reputation": CADENCE.last_result(url, "reputation"),
+        "content_state": content_state,
+        "content_info": content_info,
+    }
+
+
+def job(check_now_only: bool = False):
+    """
+    Load config fresh on every tick and run the checks that are due
+
+    Check-now requests from the control API run their site's checks (all
+    but the port scan) ahead of the scheduled ones and past an open circuit breaker; requests
+    that arrive while the cycle runs join it. With check_now_only, only
+    the requested sites are checked.
+    """
+    taken = set()
+    try:
+        _run_job(check_now_only, taken)
+    finally:
+        # Whatever went wrong, nobody waits on a check that won't come
+        CHECK_NOW.abandon(taken, "Check aborted by a monitor error")
+
+
+def _run_job(check_now_only: bool, taken: set):
+    """job(); every check-now URL it takes from the queue is added to taken"""
+    requested = set(CHECK_NOW.take())
+    taken.update(requested)
     config = load_config()
     websites = config.get("websites", [])
     ssl_warning_days = config.get("ssl_expiry_warning_days", 14)
     email_enabled = config.get("email_enabled", True)
     alert_email = config.get("alert_email")
+    adaptive = adaptive_settings(config)
+    breaker = breaker_settings(config)
+    timeout_cfg = timeout_settings(config)
+    polite = politeness_settings(config)
+    concurrency = concurrency_settings(config)
+    set_storage_mode(storage_settings(config)["mode"])
+    sla = sla_settings(config)
 
-    print("\n" + "="*70)
-    print(f"🛡️  Running WebGuard monitoring job... [Email alerts: {'ENABLED ✅' if email_enabled else 'DISABLED ❌'}]")
-    print("="*70)
-
+    priority_sites = []
+    due_sites = []
+    probe_sites = []
+    active_urls = set()
+    # url -> (client, base_s), for check-now requests arriving mid-cycle
+    known_sites = {}
     for site in websites:
         if isinstance(site, dict):
             url = site.get("url")
@@ -432,11 +906,193 @@ def job():
             url = site
             client = "Unknown"
 
-        if url:
-            check_single_website(url, client, ssl_warning_days, email_enabled, alert_email)
+        if not url:
+            continue
+
+        active_urls.add(url)
+        _seed_cadence(url)
+        _seed_timeouts(url, timeout_cfg)
+        cadence = site_cadence(config, site)
+        base_s = cadence["uptime"]
+        cadence["uptime"] = ADAPTIVE.interval(url, base_s, adaptive)
+        # Adaptive scheduling may stretch a stable site up to max_minutes,
+        # and an open breaker only probes its host every backoff
+        host = domain_from_url(url)
+        longest_s = max(base_s, adaptive["max_minutes"] * 60 if adaptive["enabled"] else 0)
+        sla_gap_s = sla_gap_seconds(longest_s, sla)
+        if breaker["enabled"] and host and BREAKER.state(host)["state"] != CLOSED:
+            sla_gap_s += float(breaker["max_backoff_seconds"])
+        set_sla_gap(url, sla_gap_s)
+        known_sites[url] = (client, base_s)
+
+        if url in requested:
+            priority_sites.append((url, client, set(CHECK_NOW_TYPES), base_s))
+            continue
+        if check_now_only:
+            continue
+        due = CADENCE.due_checks(url, cadence)
+
+        decision = BREAKER.decide(host) if breaker["enabled"] and host else "full"
+        if decision == "wait":
+            # The skipped baseline counts once per uptime run, not per tick
+            if "uptime" in due:
+                CADENCE.record_connections(set(), due)
+                CADENCE.skip(url, "uptime")
+            continue
+        if decision == "probe":
+            probe_sites.append((url, client, host, due, base_s))
+            continue
+
+        if due:
+            due_sites.append((url, client, due, base_s))
+
+    CADENCE.forget(active_urls)
+    TIMEOUTS.forget(active_urls)
+
+    for url in requested - active_urls:
+        CHECK_NOW.resolve(url, error="Not a monitored website")
+    priority = {site[0] for site in priority_sites}
+
+    if not due_sites and not probe_sites and not priority_sites:
+        return
+
+    if check_now_only:
+        print(f"⚡ Check now: {', '.join(sorted(priority))}")
+    else:
+        print("\n" + "="*70)
+        print(f"🛡️  Running WebGuard monitoring job... [Email alerts: {'ENABLED ✅' if email_enabled else 'DISABLED ❌'}]")
+        print("="*70)
 
+    # Hosts behind an open breaker only get the cheap probe; a host that
+    # answers gets one full (half-open) trial check right away
+    probed = {}
+    for url, client, host, due, base_s in probe_sites:
+        if host not in probed and LIMITER.try_acquire(_limiter_keys(url), TOKENS_PER_CHECK["probe"], polite):
+            continue
+        if _run_probe(url, client, host, due, breaker, probed):
+            due_sites.append((url, client, due | {"uptime"}, base_s))
+
+    deadline_s = config.get("site_deadline_seconds", SITE_DEADLINE_SECONDS)
+
+    # Up to CONCURRENCY.limit() sites are checked at once. Sites whose host
+    # is out of tokens are set aside so the workers move on to other hosts
+    # instead of waiting.
+    CONCURRENCY.configure(concurrency)
+    CONCURRENCY.forget(active_urls)
+    queue = deque(priority_sites + due_sites)
+    deferred = []
+    in_flight = {}
+    peak = 0
+    checked = 0
+    started = time.monotonic()
+    tick_end = started + SCHEDULER_TICK_SECONDS
+    while queue or deferred or in_flight:
+        # Check-now requests jump the queue; one for a site whose check is
+        # already running shares that check's result
+        for url in CHECK_NOW.take():
+            taken.add(url)
+            if url not in known_sites:
+                CHECK_NOW.resolve(url, error="Not a monitored website")
+                continue
+            priority.add(url)
+            if url in in_flight.values():
+                continue
+            queue = deque(site for site in queue if site[0] != url)
+            deferred = [entry for entry in deferred if entry[1][0] != url]
+            client, base_s = known_sites[url]
+            queue.appendleft((url, client, set(CHECK_NOW_TYPES), base_s))
+
+        limit = min(CONCURRENCY.limit(), SITE_WORKERS)
+        while queue and len(in_flight) < limit:
+            url, client, due, base_s = site = queue.popleft()
+            wait_s = LIMITER.try_acquire(_limiter_keys(url), _site_tokens(due), polite)
+            if wait_s > 0:
+                deferred.append((time.monotonic() + wait_s, site))
+                continue
+            future = SITE_EXECUTOR.submit(
+                _check_site, site, ssl_warning_days, email_enabled, alert_email,
+                deadline_s, timeout_cfg, polite, adaptive, breaker,
+            )
+            in_flight[future] = url
+        peak = max(peak, len(in_flight))
+        if queue:
+            CONCURRENCY.note_saturated()
+
+        if not in_flight:
+            if not deferred:
+                break
+            # Only throttled hosts are left: wait for the first one if it
+            # frees up within this tick, leave the rest for the next tick
+            deferred.sort(key=lambda entry: entry[0])
+            ready_at = deferred[0][0]
+            if ready_at > tick_end:
+                for at, (url, *_rest) in deferred:
+                    print(f"🐢 {url}: host rate limited, deferred to next tick")
+                    if url in priority:
+                        CHECK_NOW.resolve(url, error=f"Host rate limited, retry in {at - time.monotonic():.0f}s")
+                break
+            time.sleep(max(0.0, ready_at - time.monotonic()))
+            queue.extend(site for _, site in deferred)
+            deferred = []
+            continue
+
+        next_ready = min((entry[0] for entry in deferred), default=None)
+        timeout = None if next_ready is None else max(0.0, next_ready - time.monotonic())
+        done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            url = in_flight.pop(future)
+            checked += 1
+            try:
+                latency, connect_error = future.result()
+            except Exception as e:
+                print(f"⚠️ Check of {url} failed: {e}")
+                if url in priority:
+                    CHECK_NOW.resolve(url, error=str(e))
+                continue
+            CONCURRENCY.observe(url, latency, connect_error)
+            if url in priority:
+                # Callers read the dashboard right after, so commit first
+                _flush()
+                CHECK_NOW.resolve(url, _check_result(url))
+
+        # Hosts whose tokens have refilled go back into the queue
+        now = time.monotonic()
+        queue.extend(site for ready_at, site in deferred if ready_at <= now)
+        deferred = [entry for entry in deferred if entry[0] > now]
+
+    if check_now_only:
+        _flush()
+        return
+
+    cycle_s = time.monotonic() - started
+    lag_s = max(0.0, cycle_s - SCHEDULER_TICK_SECONDS)
+    CONCURRENCY.end_cycle(lag_s)
+    insert_engine_stats(
+        CONCURRENCY.limit(), peak, checked, cycle_s, lag_s,
+        CONCURRENCY.last_inflation, CONCURRENCY.last_error_rate, CONCURRENCY.last_signal,
+    )
+
+    # Everything this cycle wrote goes to disk in one group commit
+    _flush()
+
+    connections = CADENCE.connections_last_hour()
+    saved = connections["baseline"] - connections["opened"]
     print("\n" + "="*70)
     print("✅ Monitoring cycle complete")
+    print(
+        f"🔌 Outbound connections (last hour): {connections['opened']} "
+        f"(all checks every run: {connections['baseline']}, saved: {max(saved, 0)})"
+    )
+    waits = ", ".join(
+        f"{kind} {st['waited']}/{st['acquired']} waited (avg {st['wait_total'] / st['waited'] * 1000:.0f}ms, "
+        f"max {st['wait_max'] * 1000:.0f}ms)" if st["waited"] else f"{kind} no waits"
+        for kind, st in sorted(BUDGET.stats().items())
+    )
+    print(f"🧮 Connection budget: {BUDGET.capacity} slots | {waits or 'unused'}")
+    print(
+        f"🚦 Concurrency: limit {CONCURRENCY.limit()} (peak {peak} in flight, "
+        f"{CONCURRENCY.last_signal}) | cycle {cycle_s:.1f}s, lag {lag_s:.1f}s"
+    )
     print("="*70 + "\n")
 
 
@@ -449,47 +1105,65 @@ def main():
     
     # Initialize database
     init_db()
+
+    # Pick up adaptive intervals where the last run left them
+    for url, (interval_s, streak, rt_avg) in get_site_schedules().items():
+        ADAPTIVE.restore(url, interval_s, streak, rt_avg)
+
+    # ...and keep dead hosts behind their open circuit breakers
+    for host, state in get_circuit_breakers().items():
+        BREAKER.restore(host, state)
     
-    # Load initial config to get interval
+    # Load initial config to report the cadences in use
     config = load_config()
     interval = config.get("check_interval_minutes", 5)
 
     # Clear any existing scheduled jobs
     schedule.clear()
     
-    # Schedule the job
-    schedule.every(interval).minutes.do(job)
+    # Tick often; each tick only runs the checks whose cadence has elapsed
+    schedule.every(SCHEDULER_TICK_SECONDS).seconds.do(job)
+
+    # Retention, archiving and vacuum run on their own thread, with the
+    # settings read fresh from config each time
+    retention = retention_settings(config)
+    schedule.every(retention["run_every_hours"]).hours.do(
+        lambda: start_maintenance(retention_settings(load_config()))
+    )
+
+    cadence = site_cadence(config, {})
 
     print("\n" + "🛡️ " * 20)
     print("    WebGuard Monitoring Service Started")
     print("🛡️ " * 20)
     print(f"\n⏱️  Check Interval: {interval} minutes")
+    print("⏱️  Check Cadence: " + ", ".join(f"{c} {cadence[c] / 60:g}m" for c in CHECK_TYPES))
     print(f"📧 Email Alerts: {'ENABLED' if config.get('email_enabled', True) else 'DISABLED'}")
     print(f"🌐 Monitoring {len(config.get('websites', []))} website(s)")
+    if storage_settings(config)["mode"] == "intervals":
+        print("🗜️ Storage: state intervals + response-time series")
+    if retention["enabled"]:
+        print(
+            f"🧹 Retention: raw checks {retention['raw_days']} days"
+            f"{', then monthly archive files' if retention['archive'] else ''}"
+        )
     print(f"\n💡 Config will be reloaded on each check cycle")
     print(f"💡 Press Ctrl+C to stop\n")
     
+    # Check-now requests from the dashboard
+    control = control_settings(config)
+    if start_control_server(control, CHECK_NOW, _check_now_targets):
+        print(f"🎛️ Control API: http://{control['host']}:{control['port']}")
+
     # Run immediately once
     job()
+    start_maintenance(retention)
 
-    # Track last known interval to detect changes
-    last_interval = interval
-
-    # Main loop
+    # Main loop; check-now requests are also served between ticks
     while True:
         schedule.run_pending()
-        
-        # Check if interval has changed every 10 seconds
-        config = load_config()
-        current_interval = config.get("check_interval_minutes", 5)
-        
-        if current_interval != last_interval:
-            print(f"\n⚙️  Interval changed from {last_interval} to {current_interval} minutes. Rescheduling...")
-            schedule.clear()
-            schedule.every(current_interval).minutes.do(job)
-            last_interval = current_interval
-        
-        time.sleep(10)  # Check every 10 seconds
+        if CHECK_NOW.wait(1):
+            job(check_now_only=True)
 
 
 if __name__ == "__main__":
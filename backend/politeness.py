@@ -0,0 +1,122 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, Optional
+
+from port_check import MONITORED_PORTS
+
+
+# Defaults for config["politeness"]
+DEFAULT_POLITENESS = {
+    "enabled": True,
+    "rate_per_second": 2.0,       # sustained requests per second per host/IP
+    "burst": 12,                  # bucket size; one full site check fits
+    "max_retry_after_seconds": 3600,
+}
+
+# Requests one run of each check type sends to the target host. DNS goes
+# to the resolver and reputation is offline, so they are free.
+TOKENS_PER_CHECK = {
+    "uptime": 1,
+    "ssl": 1,
+    "ports": len(MONITORED_PORTS),
+    "content": 1,
+    "probe": 1,
+}
+
+
+def politeness_settings(config: dict) -> dict:
+    """Merge config["politeness"] over the defaults"""
+    settings = dict(DEFAULT_POLITENESS)
+    settings.update(config.get("politeness", {}))
+    return settings
+
+
+def host_keys(hostname: str, ips: Iterable[str] = ()) -> list[str]:
+    """Limiter keys of a target: its hostname and every resolved IP"""
+    keys = [f"host:{hostname}"] if hostname else []
+    keys += [f"ip:{ip}" for ip in ips if ip]
+    return keys
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """
+    Parse a Retry-After header (delta-seconds or HTTP-date)
+
+    Returns:
+        Seconds to wait, or None if the header is missing or invalid
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, retry_at - now)
+
+
+class HostRateLimiter:
+    """
+    Token buckets keyed by hostname and resolved IP, shared by every probe
+    type. A probe needs tokens from all of its keys, so sites that share an
+    origin or CDN address share its budget. Retry-After empties a key's
+    bucket until the server's deadline.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> [tokens, last_refill, blocked_until]
+        self._buckets: Dict[str, list] = {}
+
+    def try_acquire(self, keys: list[str], tokens: float, settings: dict, now: Optional[float] = None) -> float:
+        """
+        Take tokens from every key, or none at all
+
+        Returns:
+            0 if granted, otherwise seconds until the request could be
+            granted (the caller should go work on another host meanwhile)
+        """
+        if not settings["enabled"] or not keys or tokens <= 0:
+            return 0.0
+
+        now = time.monotonic() if now is None else now
+        rate = float(settings["rate_per_second"])
+        burst = float(settings["burst"])
+        tokens = min(tokens, burst)
+
+        with self._lock:
+            wait_s = 0.0
+            for key in keys:
+                bucket = self._refill(key, now, rate, burst)
+                if bucket[2] > now:
+                    wait_s = max(wait_s, bucket[2] - now)
+                elif bucket[0] < tokens:
+                    wait_s = max(wait_s, (tokens - bucket[0]) / rate)
+            if wait_s > 0:
+                return wait_s
+            for key in keys:
+                self._buckets[key][0] -= tokens
+            return 0.0
+
+    def back_off(self, keys: list[str], seconds: float, settings: dict, now: Optional[float] = None):
+        """Honour a Retry-After: no tokens for these keys for `seconds`"""
+        now = time.monotonic() if now is None else now
+        seconds = min(float(seconds), float(settings["max_retry_after_seconds"]))
+        with self._lock:
+            for key in keys:
+                bucket = self._refill(key, now, float(settings["rate_per_second"]), float(settings["burst"]))
+                bucket[0] = 0.0
+                bucket[2] = max(bucket[2], now + seconds)
+
+    def _refill(self, key: str, now: float, rate: float, burst: float) -> list:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [burst, now, 0.0]
+            return bucket
+        bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        return bucket
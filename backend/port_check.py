@@ -1,4 +1,5 @@
 import socket
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Tuple
 from datetime import datetime
 
@@ -29,6 +30,9 @@ COMMON_PORTS = {
     27017: "MongoDB",
 }
 
+# Ports probed by the monitor on every port scan
+MONITORED_PORTS = [22, 80, 443, 21, 25, 3306, 5432, 8080]
+
 
 def check_single_port(hostname: str, port: int, timeout: int = 5) -> Dict[str, any]:
     """
@@ -111,7 +115,7 @@ def check_single_port(hostname: str, port: int, timeout: int = 5) -> Dict[str, a
         }
 
 
-def check_multiple_ports(hostname: str, ports: List[int], timeout: int = 5) -> Dict[str, any]:
+def check_multiple_ports(hostname: str, ports: List[int], timeout: int = 5, max_workers: int = 1) -> Dict[str, any]:
     """
     Check multiple ports on a host
     
@@ -119,6 +123,7 @@ def check_multiple_ports(hostname: str, ports: List[int], timeout: int = 5) -> D
         hostname: Domain or IP address
         ports: List of port numbers to check
         timeout: Connection timeout in seconds per port
+        max_workers: Ports probed in parallel (1 = one after another)
         
     Returns:
         Dictionary with results for all ports
@@ -127,8 +132,13 @@ def check_multiple_ports(hostname: str, ports: List[int], timeout: int = 5) -> D
     open_ports = []
     closed_ports = []
     
-    for port in ports:
-        result = check_single_port(hostname, port, timeout)
+    if max_workers > 1 and len(ports) > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(ports))) as pool:
+            port_results = list(pool.map(lambda p: check_single_port(hostname, p, timeout), ports))
+    else:
+        port_results = [check_single_port(hostname, port, timeout) for port in ports]
+    
+    for port, result in zip(ports, port_results):
         results.append(result)
         
         if result['is_open']:
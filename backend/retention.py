@@ -0,0 +1,295 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import db
+
+
+# Defaults for config["retention"]
+DEFAULT_RETENTION = {
+    "enabled": True,
+    "raw_days": 30,              # raw checks/port scans kept in the live DB
+    "archive": True,             # move older raw rows to monthly files (else delete)
+    "minute_rollup_days": 7,
+    "hour_rollup_days": 365,     # day rollups are kept forever
+    "uptime_bits_days": 400,     # per-day uptime bitsets
+    "run_every_hours": 6,
+    "vacuum_pages": 2000,        # pages freed per incremental vacuum step
+}
+
+# Raw rows are moved one day per transaction so the writer thread never
+# waits on maintenance for long
+_DAY_MS = 86400 * 1000
+
+# Schema of a monthly archive file; the views mirror the live database
+ARCHIVE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {schema}.sites (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    client TEXT,
+    hostname TEXT
+);
+CREATE TABLE IF NOT EXISTS {schema}.check_results (
+    id INTEGER PRIMARY KEY,
+    site_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    status_code INTEGER,
+    is_up INTEGER,
+    response_time REAL,
+    ssl_ok INTEGER,
+    ssl_days_left INTEGER,
+    error TEXT,
+    timeouts TEXT
+);
+CREATE INDEX IF NOT EXISTS {schema}.idx_check_results_site_ts ON check_results(site_id, ts);
+CREATE TABLE IF NOT EXISTS {schema}.series_blocks (
+    site_id INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    points INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (site_id, metric, hour)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS {schema}.port_results (
+    site_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    port INTEGER NOT NULL,
+    service TEXT,
+    is_open INTEGER,
+    response_time REAL,
+    status TEXT,
+    timeout REAL,
+    PRIMARY KEY (site_id, ts, port)
+) WITHOUT ROWID;
+CREATE VIEW IF NOT EXISTS {schema}.checks AS
+SELECT
+    r.id, s.url, s.client, strftime('%Y-%m-%dT%H:%M:%f', r.ts / 1000.0, 'unixepoch') AS checked_at,
+    r.status_code, r.is_up, r.response_time, r.ssl_ok, r.ssl_days_left,
+    r.error, r.timeouts, r.site_id, r.ts
+FROM check_results r JOIN sites s ON s.id = r.site_id;
+CREATE VIEW IF NOT EXISTS {schema}.port_scans AS
+SELECT
+    s.url, s.hostname, strftime('%Y-%m-%dT%H:%M:%f', p.ts / 1000.0, 'unixepoch') AS scanned_at,
+    p.port, p.service, p.is_open, p.response_time, p.status, p.timeout, p.site_id, p.ts
+FROM port_results p JOIN sites s ON s.id = p.site_id;
+"""
+
+
+def retention_settings(config: dict) -> dict:
+    """Merge config["retention"] over the defaults"""
+    settings = dict(DEFAULT_RETENTION)
+    settings.update(config.get("retention", {}))
+    return settings
+
+
+def archive_dir(db_path: Optional[Path] = None) -> Path:
+    """Directory holding the monthly archive files, next to the live DB"""
+    return (db_path or db.DB_PATH).parent / "archive"
+
+
+def archive_path(month: str, db_path: Optional[Path] = None) -> Path:
+    """Archive file of a month ('YYYY-MM')"""
+    return archive_dir(db_path) / f"webguard-{month}.db"
+
+
+def _month_of(ts_ms: int) -> str:
+    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).strftime("%Y-%m")
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(db.DB_PATH, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+
+def _attach_month(conn: sqlite3.Connection, month: str) -> str:
+    """Attach (creating if needed) a month's archive file, returning its schema name"""
+    schema = "archive_" + month.replace("-", "_")
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    if schema not in attached:
+        path = archive_path(month)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn.execute("ATTACH DATABASE ? AS " + schema, (str(path),))
+        conn.executescript(ARCHIVE_SCHEMA.format(schema=schema))
+    return schema
+
+
+def _move_raw_rows(conn: sqlite3.Connection, cutoff_ms: int, archive: bool) -> dict:
+    """Move (or delete) raw rows older than cutoff, one day per transaction"""
+    moved = {"checks": 0, "port_scans": 0}
+    oldest = conn.execute(
+        "SELECT MIN(ts) FROM (SELECT MIN(ts) AS ts FROM check_results UNION ALL SELECT MIN(ts) FROM port_results "
+        "UNION ALL SELECT MIN(hour) * 1000 FROM series_blocks)"
+    ).fetchone()[0]
+    if oldest is None or oldest >= cutoff_ms:
+        return moved
+
+    start = oldest - oldest % _DAY_MS
+    while start < cutoff_ms:
+        end = min(start + _DAY_MS, cutoff_ms)
+        schema = _attach_month(conn, _month_of(start)) if archive else None
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if schema:
+                conn.execute(f"INSERT OR REPLACE INTO {schema}.sites SELECT id, url, client, hostname FROM main.sites")
+                conn.execute(f"""
+                INSERT OR IGNORE INTO {schema}.check_results
+                SELECT id, site_id, ts, status_code, is_up, response_time, ssl_ok, ssl_days_left, error, timeouts
+                FROM main.check_results WHERE ts >= ? AND ts < ?
+                """, (start, end))
+                conn.execute(f"""
+                INSERT OR IGNORE INTO {schema}.series_blocks
+                SELECT site_id, metric, hour, points, data FROM main.series_blocks
+                WHERE hour * 1000 >= ? AND hour * 1000 < ?
+                """, (start, end))
+                conn.execute(f"""
+                INSERT OR IGNORE INTO {schema}.port_results
+                SELECT site_id, ts, port, service, is_open, response_time, status, timeout
+                FROM main.port_results WHERE ts >= ? AND ts < ?
+                """, (start, end))
+            moved["checks"] += conn.execute(
+                "DELETE FROM main.check_results WHERE ts >= ? AND ts < ?", (start, end)
+            ).rowcount
+            # State intervals are a handful of rows per site and stay live;
+            # the series blocks age out with the raw checks
+            conn.execute(
+                "DELETE FROM main.series_blocks WHERE hour * 1000 >= ? AND hour * 1000 < ?", (start, end)
+            )
+            moved["port_scans"] += conn.execute(
+                "DELETE FROM main.port_results WHERE ts >= ? AND ts < ?", (start, end)
+            ).rowcount
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        start = end
+
+    for row in conn.execute("PRAGMA database_list").fetchall():
+        if row[1].startswith("archive_"):
+            conn.execute("DETACH DATABASE " + row[1])
+    return moved
+
+
+def _expire_rollups(conn: sqlite3.Connection, settings: dict) -> int:
+    """Drop minute and hour rollups and uptime bitsets past their retention"""
+    now = int(time.time())
+    removed = 0
+    for resolution, key in ((60, "minute_rollup_days"), (3600, "hour_rollup_days")):
+        if settings.get(key) is None:
+            continue
+        cutoff = now - int(settings[key]) * 86400
+        for table in ("site_rollups", "client_rollups"):
+            removed += conn.execute(
+                f"DELETE FROM {table} WHERE resolution = ? AND bucket < ?", (resolution, cutoff)
+            ).rowcount
+    if settings.get("uptime_bits_days") is not None:
+        cutoff = now - int(settings["uptime_bits_days"]) * 86400
+        removed += conn.execute("DELETE FROM uptime_bits WHERE day < ?", (cutoff,)).rowcount
+    return removed
+
+
+def _reclaim_space(conn: sqlite3.Connection, pages: int):
+    """
+    Return free pages to the filesystem a step at a time. Only a file in
+    incremental auto-vacuum mode (set up by db.init_db()) can; a full
+    VACUUM would lock out the writer for the whole rewrite.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return
+    while conn.execute("PRAGMA freelist_count").fetchone()[0] > 0:
+        conn.execute(f"PRAGMA incremental_vacuum({int(pages)})")
+
+
+def run_maintenance(settings: dict) -> dict:
+    """
+    Apply the retention policy once: archive old raw rows, expire old
+    rollups, refresh the query planner statistics and reclaim free pages
+
+    Returns:
+        Counts of what was moved and removed
+    """
+    conn = _connect()
+    try:
+        cutoff_ms = int((time.time() - float(settings["raw_days"]) * 86400) * 1000)
+        moved = _move_raw_rows(conn, cutoff_ms, bool(settings["archive"]))
+        conn.execute(
+            "DELETE FROM engine_stats WHERE recorded_at < ?",
+            (datetime.utcfromtimestamp(cutoff_ms / 1000).isoformat(),),
+        )
+        expired = _expire_rollups(conn, settings)
+
+        conn.execute("PRAGMA analysis_limit=1000")
+        conn.execute("ANALYZE")
+        _reclaim_space(conn, settings["vacuum_pages"])
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+    return {**moved, "rollups": expired}
+
+
+_running = threading.Lock()
+
+
+def start_maintenance(settings: dict) -> bool:
+    """
+    Run maintenance on a background thread (skipped if a run is still going)
+
+    Returns:
+        True if a run was started
+    """
+    if not settings["enabled"] or not _running.acquire(blocking=False):
+        return False
+
+    def _run():
+        started = time.monotonic()
+        try:
+            stats = run_maintenance(settings)
+            print(
+                f"🧹 Maintenance: {stats['checks']} checks and {stats['port_scans']} port scan rows "
+                f"{'archived' if settings['archive'] else 'deleted'}, {stats['rollups']} old rollups dropped "
+                f"({time.monotonic() - started:.1f}s)"
+            )
+        except Exception as e:
+            print(f"⚠️ Maintenance failed: {e}")
+        finally:
+            _running.release()
+
+    threading.Thread(target=_run, name="db-maintenance", daemon=True).start()
+    return True
+
+
+def open_history(since: float, until: Optional[float] = None) -> sqlite3.Connection:
+    """
+    Connection for historical queries: the archive files of every month in
+    [since, until] are attached and the temporary views checks_history and
+    port_scans_history union them with the live tables
+
+    Args:
+        since: Window start, epoch seconds
+        until: Window end, epoch seconds (default: now)
+    """
+    until = time.time() if until is None else until
+    conn = sqlite3.connect(f"file:{db.DB_PATH}", uri=True)
+
+    checks = ["SELECT * FROM main.checks"]
+    ports = ["SELECT * FROM main.port_scans"]
+    month = datetime.fromtimestamp(since, tz=timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last = datetime.fromtimestamp(until, tz=timezone.utc)
+    while month <= last:
+        name = month.strftime("%Y-%m")
+        path = archive_path(name)
+        if path.exists():
+            schema = "archive_" + name.replace("-", "_")
+            conn.execute("ATTACH DATABASE ? AS " + schema, (f"file:{path}?mode=ro",))
+            checks.append(f"SELECT * FROM {schema}.checks")
+            ports.append(f"SELECT * FROM {schema}.port_scans")
+        month = month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+
+    conn.execute("CREATE TEMP VIEW checks_history AS " + " UNION ALL ".join(checks))
+    conn.execute("CREATE TEMP VIEW port_scans_history AS " + " UNION ALL ".join(ports))
+    return conn
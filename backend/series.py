@@ -0,0 +1,129 @@
+import struct
+from typing import Iterable, Optional
+
+import numpy as np
+
+
+# Points are grouped into one block per site, metric and hour
+BLOCK_SECONDS = 3600
+
+# Values are stored as integer microseconds (requests' elapsed times have
+# microsecond precision, so response times round-trip exactly)
+VALUE_SCALE = 1_000_000
+
+# Header: version, point count, last offset (ms into the hour), last
+# offset delta (ms), last non-null value (µs). Keeping the encoder state in
+# the header lets a point be appended without decoding the block.
+_VERSION = 1
+_HEADER = struct.Struct("<BHIiq")
+
+
+def block_hour(ts_ms: int) -> int:
+    """Start (epoch seconds) of the block a timestamp belongs to"""
+    seconds = ts_ms // 1000
+    return seconds - seconds % BLOCK_SECONDS
+
+
+def _zigzag(n: int) -> int:
+    return (n << 1) ^ (n >> 63)
+
+
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def append_point(blob: Optional[bytes], offset_ms: int, value: Optional[float]) -> bytes:
+    """
+    Append one point to an encoded block
+
+    Each point is two varints: the delta-of-delta of its offset, then its
+    value as (zigzag(value delta) << 1) | 1, or 0 for a missing value.
+
+    Args:
+        blob: Encoded block, or None to start one
+        offset_ms: Milliseconds since the start of the block's hour
+        value: Seconds, or None (e.g. a failed check)
+    """
+    if blob:
+        version, count, last_offset, last_delta, last_value = _HEADER.unpack_from(blob)
+        if version != _VERSION:
+            raise ValueError(f"Unsupported series block version {version}")
+        body = blob[_HEADER.size:]
+    else:
+        count, last_offset, last_delta, last_value, body = 0, 0, 0, 0, b""
+
+    delta = offset_ms - last_offset
+    point = _varint(_zigzag(delta - last_delta))
+    if value is None:
+        point += b"\x00"
+    else:
+        micros = round(value * VALUE_SCALE)
+        point += _varint((_zigzag(micros - last_value) << 1) | 1)
+        last_value = micros
+    return _HEADER.pack(_VERSION, count + 1, offset_ms, delta, last_value) + body + point
+
+
+def encode_block(offsets: Iterable[int], values: Iterable[Optional[float]]) -> bytes:
+    """Encode a whole block from offsets (ms into the hour) and values"""
+    blob = None
+    for offset_ms, value in zip(offsets, values):
+        blob = append_point(blob, int(offset_ms), value)
+    return blob or b""
+
+
+def decode_block(blob: Optional[bytes]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Decode a block with vectorized numpy operations
+
+    Returns:
+        (offsets in ms as int64, values in seconds as float64 with NaN
+        for missing values)
+    """
+    if not blob:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    version, count = _HEADER.unpack_from(blob)[:2]
+    if version != _VERSION:
+        raise ValueError(f"Unsupported series block version {version}")
+
+    # Varints: a byte below 0x80 ends a number; sum each number's 7-bit
+    # groups shifted by their position within it
+    raw = np.frombuffer(blob, dtype=np.uint8, offset=_HEADER.size)
+    ends = np.flatnonzero(raw < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    position = np.arange(raw.size) - np.repeat(starts, ends - starts + 1)
+    groups = (raw & 0x7F).astype(np.uint64) << (7 * position).astype(np.uint64)
+    numbers = np.add.reduceat(groups, starts)
+    if numbers.size != 2 * count:
+        raise ValueError("Corrupt series block")
+
+    def unzigzag(u: np.ndarray) -> np.ndarray:
+        return (u >> np.uint64(1)).astype(np.int64) ^ -(u & np.uint64(1)).astype(np.int64)
+
+    offsets = np.cumsum(np.cumsum(unzigzag(numbers[0::2])))
+
+    codes = numbers[1::2]
+    present = (codes & np.uint64(1)).astype(bool)
+    values = np.full(count, np.nan)
+    values[present] = np.cumsum(unzigzag(codes[present] >> np.uint64(1))) / VALUE_SCALE
+    return offsets, values
+
+
+def series_merge(left: Optional[bytes], right: Optional[bytes]) -> bytes:
+    """SQL function series_merge(a, b): block a with b's points appended"""
+    if not right:
+        return left or b""
+    offsets, values = decode_block(right)
+    for offset_ms, value in zip(offsets.tolist(), values.tolist()):
+        left = append_point(left, offset_ms, None if value != value else value)
+    return left
+
+
+def register_series_functions(conn):
+    """Make the series block functions available on a connection"""
+    conn.create_function("series_append", 3, append_point, deterministic=True)
+    conn.create_function("series_merge", 2, series_merge, deterministic=True)
@@ -0,0 +1,183 @@
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import db
+
+
+# Defaults for config["sla"]
+DEFAULT_SLA = {
+    "target_pct": 99.9,
+    "gap_factor": 3,             # silence of this many check intervals is unknown time
+    "min_gap_minutes": 10,
+    "maintenance": [],           # [{"start", "end", "url" | "client", "reason"}], UTC ISO times
+}
+
+
+def sla_settings(config: dict) -> dict:
+    """Merge config["sla"] over the defaults"""
+    settings = dict(DEFAULT_SLA)
+    settings.update(config.get("sla", {}))
+    return settings
+
+
+def sla_gap_seconds(interval_s: float, settings: dict) -> float:
+    """Silence after a check (seconds) beyond which a site's state is unknown"""
+    return max(float(settings["min_gap_minutes"]) * 60, float(settings["gap_factor"]) * interval_s)
+
+
+def _epoch_ms(value: str) -> int:
+    """Epoch ms of an ISO time; times without an offset are UTC"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def maintenance_windows(settings: dict) -> list:
+    """
+    Parse config["sla"]["maintenance"]
+
+    Returns:
+        List of (start_ms, end_ms, url, client); url and client are None
+        for a window that covers every site
+    """
+    windows = []
+    for entry in settings.get("maintenance", []):
+        start, end = _epoch_ms(entry["start"]), _epoch_ms(entry["end"])
+        if end <= start:
+            raise ValueError(f"Maintenance window ends before it starts: {entry}")
+        windows.append((start, end, entry.get("url"), entry.get("client")))
+    return windows
+
+
+def _merge(spans: list) -> list:
+    """Union of (start, end) spans as sorted, non-overlapping spans"""
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _overlap(start: int, end: int, spans: list) -> int:
+    """Length of [start, end) covered by merged spans"""
+    return sum(max(0, min(end, hi) - max(start, lo)) for lo, hi in spans)
+
+
+def site_availability(since: float, until: Optional[float] = None, url: Optional[str] = None,
+                      client: Optional[str] = None, settings: Optional[dict] = None,
+                      conn: Optional[sqlite3.Connection] = None) -> dict:
+    """
+    Time-weighted availability of every site over a window, from the SLA
+    intervals: only the intervals overlapping the window are read, each
+    clipped to it, and maintenance windows are taken out of both the up
+    and the down time
+
+    Args:
+        since: Window start, epoch seconds
+        until: Window end, epoch seconds (default: now)
+        url: Only this site
+        client: Only this client's sites
+        settings: Result of sla_settings() (default: no maintenance,
+            default target)
+        conn: Connection to read with (default: a new one to db.DB_PATH)
+
+    Returns:
+        Dictionary keyed by URL with client, up_seconds, down_seconds,
+        unknown_seconds (no data, including before the first and after the
+        last check), maintenance_seconds, incidents (down intervals in the
+        window), availability_pct (up / (up + down), None without data)
+        and meets_target
+    """
+    settings = settings or DEFAULT_SLA
+    until = time.time() if until is None else until
+    lo, hi = int(since * 1000), int(until * 1000)
+    where, params = "", [lo, hi, lo, hi]
+    if url is not None:
+        where, params = "AND s.url = ?", params + [url]
+    elif client is not None:
+        where, params = "AND s.client = ?", params + [client]
+
+    own = conn is None
+    conn = sqlite3.connect(db.DB_PATH) if own else conn
+    try:
+        rows = conn.execute(f"""
+        SELECT s.url, s.client, i.state, max(i.start_ts, ?), min(i.end_ts, ?)
+        FROM sla_intervals i JOIN sites s ON s.id = i.site_id
+        WHERE i.end_ts > ? AND i.start_ts < ? {where}
+        ORDER BY s.url, i.start_ts
+        """, params).fetchall()
+    finally:
+        if own:
+            conn.close()
+
+    windows = maintenance_windows(settings)
+    sites: dict = {}
+    for site_url, site_client, state, start, end in rows:
+        site = sites.get(site_url)
+        if site is None:
+            excluded = _merge([
+                (max(w_start, lo), min(w_end, hi)) for w_start, w_end, w_url, w_client in windows
+                if w_start < hi and w_end > lo
+                and w_url in (None, site_url) and w_client in (None, site_client)
+            ])
+            site = sites[site_url] = {
+                "client": site_client, "up": 0, "down": 0, "incidents": 0,
+                "maintenance": sum(end - start for start, end in excluded), "excluded": excluded,
+            }
+        if state == "unknown":
+            continue
+        counted = (end - start) - _overlap(start, end, site["excluded"])
+        site[state] += counted
+        if state == "down" and (counted or not any(a <= start < b for a, b in site["excluded"])):
+            site["incidents"] += 1
+
+    target = float(settings["target_pct"])
+    result = {}
+    for site_url, site in sites.items():
+        known = site["up"] + site["down"]
+        availability = site["up"] / known * 100 if known else None
+        result[site_url] = {
+            "client": site["client"],
+            "up_seconds": site["up"] / 1000,
+            "down_seconds": site["down"] / 1000,
+            "unknown_seconds": (hi - lo - known - site["maintenance"]) / 1000,
+            "maintenance_seconds": site["maintenance"] / 1000,
+            "incidents": site["incidents"],
+            "availability_pct": availability,
+            "meets_target": None if availability is None else availability >= target,
+        }
+    return result
+
+
+def client_availability(since: float, until: Optional[float] = None,
+                        settings: Optional[dict] = None, conn: Optional[sqlite3.Connection] = None) -> dict:
+    """
+    Time-weighted availability per client over a window: the up, down,
+    unknown and maintenance time of the client's sites added together
+
+    Returns:
+        Dictionary keyed by client with sites and the fields of
+        site_availability()
+    """
+    settings = settings or DEFAULT_SLA
+    clients: dict = {}
+    for site in site_availability(since, until, settings=settings, conn=conn).values():
+        totals = clients.setdefault(site["client"] or "Unknown", {
+            "sites": 0, "up_seconds": 0.0, "down_seconds": 0.0, "unknown_seconds": 0.0,
+            "maintenance_seconds": 0.0, "incidents": 0,
+        })
+        totals["sites"] += 1
+        for key in ("up_seconds", "down_seconds", "unknown_seconds", "maintenance_seconds", "incidents"):
+            totals[key] += site[key]
+
+    target = float(settings["target_pct"])
+    for totals in clients.values():
+        known = totals["up_seconds"] + totals["down_seconds"]
+        totals["availability_pct"] = totals["up_seconds"] / known * 100 if known else None
+        totals["meets_target"] = None if totals["availability_pct"] is None else totals["availability_pct"] >= target
+    return clients
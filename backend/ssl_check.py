@@ -5,14 +5,14 @@ from typing import Dict, Optional, List
 import OpenSSL
 
 
-def get_ssl_expiry_days(hostname: str, port: int = 443) -> Optional[int]:
+def get_ssl_expiry_days(hostname: str, port: int = 443, timeout: float = 10) -> Optional[int]:
     """
     Returns number of days until SSL expiry for a hostname.
     If it fails, returns None.
     """
     try:
         context = ssl.create_default_context()
-        with socket.create_connection((hostname, port), timeout=10) as sock:
+        with socket.create_connection((hostname, port), timeout=timeout) as sock:
             with context.wrap_socket(sock, server_hostname=hostname) as ssock:
                 cert = ssock.getpeercert()
 
@@ -0,0 +1,110 @@
+import math
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+
+# Hard-coded timeouts the monitor used before they were learned; they stay
+# the ceiling and the value used during warm-up
+DEFAULT_TIMEOUTS = {
+    "uptime": 10.0,
+    "ssl": 10.0,
+    "ports": 1.0,
+    "content": 8.0,
+}
+
+# Defaults for config["adaptive_timeouts"]
+DEFAULT_ADAPTIVE_TIMEOUTS = {
+    "enabled": False,
+    "percentile": 99,         # percentile of recent durations to build on
+    "multiplier": 3.0,        # headroom over that percentile
+    "warmup_samples": 20,     # samples needed before leaving the default
+    "window": 200,            # recent samples kept per site and check
+    "floor_seconds": {"uptime": 1.0, "ssl": 1.0, "ports": 0.3, "content": 1.0},
+    "ceiling_seconds": dict(DEFAULT_TIMEOUTS),
+}
+
+
+def timeout_settings(config: dict) -> dict:
+    """Merge config["adaptive_timeouts"] over the defaults"""
+    settings = dict(DEFAULT_ADAPTIVE_TIMEOUTS)
+    user = config.get("adaptive_timeouts", {})
+    settings.update(user)
+    settings["floor_seconds"] = {**DEFAULT_ADAPTIVE_TIMEOUTS["floor_seconds"], **user.get("floor_seconds", {})}
+    settings["ceiling_seconds"] = {**DEFAULT_ADAPTIVE_TIMEOUTS["ceiling_seconds"], **user.get("ceiling_seconds", {})}
+    return settings
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class TimeoutLearner:
+    """
+    Learns per-site timeouts from the durations of successful checks:
+    multiplier x the chosen percentile, clamped to [floor, ceiling], with
+    the ceiling used until warmup_samples durations have been seen. A
+    check that times out counts as a sample at the ceiling, so a site
+    that slowed down past its learned timeout widens it again instead of
+    timing out for good.
+    """
+
+    def __init__(self):
+        # (url, check) -> deque of recent durations (seconds)
+        self._samples: Dict[tuple, deque] = {}
+        self._seeded: set[str] = set()
+
+    def is_seeded(self, url: str) -> bool:
+        return url in self._seeded
+
+    def seed(self, url: str, check: str, durations: Iterable[float], window: int):
+        """Prime a site's history with durations stored before a restart"""
+        self._seeded.add(url)
+        history = self._history(url, check, window)
+        for duration in durations:
+            if duration is not None:
+                history.append(float(duration))
+
+    def observe(self, url: str, check: str, duration: Optional[float], window: int):
+        """Add the duration of a successful check"""
+        if duration is not None and duration >= 0:
+            self._history(url, check, window).append(float(duration))
+
+    def observe_timeout(self, url: str, check: str, settings: dict):
+        """Record a check that ran out of time, as a sample at the ceiling"""
+        if settings["enabled"]:
+            self._history(url, check, int(settings["window"])).append(float(settings["ceiling_seconds"][check]))
+
+    def timeout(self, url: str, check: str, settings: dict) -> float:
+        """Timeout (seconds) the next run of a check should use"""
+        ceiling = float(settings["ceiling_seconds"][check])
+        if not settings["enabled"]:
+            return ceiling
+
+        history = self._samples.get((url, check))
+        if not history or len(history) < int(settings["warmup_samples"]):
+            return ceiling
+
+        learned = _percentile(list(history), float(settings["percentile"])) * float(settings["multiplier"])
+        floor = float(settings["floor_seconds"][check])
+        return round(min(ceiling, max(floor, learned)), 3)
+
+    def timeouts(self, url: str, settings: dict) -> Dict[str, float]:
+        """Timeouts of every learned check type for a site"""
+        return {check: self.timeout(url, check, settings) for check in DEFAULT_TIMEOUTS}
+
+    def forget(self, active_urls: set[str]):
+        """Drop history of websites that are no longer configured"""
+        for key in [k for k in self._samples if k[0] not in active_urls]:
+            del self._samples[key]
+        self._seeded &= active_urls
+
+    def _history(self, url: str, check: str, window: int) -> deque:
+        key = (url, check)
+        history = self._samples.get(key)
+        if history is None or history.maxlen != window:
+            history = deque(history or (), maxlen=window)
+            self._samples[key] = history
+        return history
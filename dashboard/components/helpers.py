@@ -2,62 +2,865 @@ import json
 import sqlite3
 import hashlib
 import socket
-from pathlib import Path
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from urllib.parse import urlparse
 
+import numpy as np
 import pandas as pd
 import requests
 import streamlit as st
 
 from config import DB_PATH, CONFIG_PATH
+from bitsets import DAY_SECONDS, SLOT_SECONDS, SLOTS_PER_DAY, unpack_slots
+from db import rollup_ranges
+from series import decode_block
+from sketch import merged_quantiles
+from sla import client_availability, site_availability, sla_settings
 
 
-@st.cache_data
-def load_data():
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query(
-        """
-        SELECT
-            id,
-            url,
-            client,
-            checked_at,
-            status_code,
-            is_up,
-            response_time,
-            ssl_ok,
-            ssl_days_left,
-            error
-        FROM checks
-        ORDER BY checked_at DESC
-        LIMIT 500
+@st.cache_resource
+def _read_connection(db_path: str):
+    """
+    One read-only connection to the monitor's database, shared by every
+    session and rerun. WAL lets it read while the monitor writes; the lock
+    serializes the sessions' queries on it.
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+    conn.execute("PRAGMA query_only=ON")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn, threading.Lock()
+
+
+def _read(sql: str, params=()) -> list:
+    """Rows of a parametrized query on the shared read-only connection"""
+    conn, lock = _read_connection(str(DB_PATH))
+    with lock:
+        return conn.execute(sql, params).fetchall()
+
+
+def _read_df(sql: str, params=()) -> pd.DataFrame:
+    """DataFrame of a parametrized query on the shared read-only connection"""
+    conn, lock = _read_connection(str(DB_PATH))
+    with lock:
+        return pd.read_sql_query(sql, conn, params=params)
+
+
+# Every loader below is cached on the monitor's data version (see the
+# change feed in backend/db.py) as well as its arguments: a rerun with no
+# new data costs one integer read, and a site's frames are only reloaded
+# after the monitor wrote for that site.
+@st.cache_data(ttl=1, show_spinner=False)
+def data_version() -> int:
+    """
+    The monitor's data version, read at most once a second. A database
+    from before the change feed gets a version that changes every 30
+    seconds instead.
+    """
+    try:
+        rows = _read("SELECT seq FROM data_version WHERE id = 0")
+    except sqlite3.OperationalError:
+        return -int(time.time() // 30)
+    return rows[0][0] if rows else 0
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _site_versions(version: int) -> dict:
+    """
+    Version of each site's latest change, read once per data version,
+    keyed by url and by (url, kind)
+    """
+    try:
+        rows = _read("SELECT s.url, v.kind, v.seq FROM site_versions v JOIN sites s ON s.id = v.site_id")
+    except sqlite3.OperationalError:
+        return {}
+    versions = {}
+    for url, kind, seq in rows:
+        versions[(url, kind)] = seq
+        versions[url] = max(versions.get(url, 0), seq)
+    return versions
+
+
+def site_version(url, kind=None) -> int:
+    """
+    Version of one site's data; it only changes when the monitor writes for
+    that site (only writes of one kind - "check", "status", "ttfb" or
+    "ports" - if kind is given)
+    """
+    version = data_version()
+    if version <= 0:
+        return version
+    return _site_versions(version).get(url if kind is None else (url, kind), 0)
+
+
+CHECK_COLUMNS = ["id", "url", "client", "checked_at", "status_code", "is_up",
+                 "response_time", "ssl_ok", "ssl_days_left", "error"]
+
+
+@st.cache_data(ttl=600, max_entries=64)
+def _load_checks(version, url=None, client=None, since=None, until=None, down_only=False, limit=500):
+    clauses, params = [], []
+    if url is not None:
+        clauses.append("s.url = ?")
+        params.append(url)
+    if client is not None:
+        clauses.append("COALESCE(s.client, 'Unknown') = ?")
+        params.append(client)
+    since_ms = None if since is None else int(since * 1000)
+    until_ms = None if until is None else int(until * 1000)
+
+    try:
+        if load_config().get("storage", {}).get("mode") == "intervals":
+            df = _interval_checks(clauses, params, since_ms, until_ms, down_only, limit)
+        else:
+            if since_ms is not None:
+                clauses.append("r.ts >= ?")
+                params.append(since_ms)
+            if until_ms is not None:
+                clauses.append("r.ts < ?")
+                params.append(until_ms)
+            if down_only:
+                clauses.append("r.is_up = 0")
+            df = _read_df(
+                f"""
+                SELECT
+                    r.id,
+                    s.url,
+                    s.client,
+                    strftime('%Y-%m-%dT%H:%M:%f', r.ts / 1000.0, 'unixepoch') AS checked_at,
+                    r.status_code,
+                    r.is_up,
+                    r.response_time,
+                    r.ssl_ok,
+                    r.ssl_days_left,
+                    r.error
+                FROM check_results r JOIN sites s ON s.id = r.site_id
+                {"WHERE " + " AND ".join(clauses) if clauses else ""}
+                ORDER BY r.ts DESC
+                {"LIMIT ?" if limit is not None else ""}
+                """,
+                params + ([limit] if limit is not None else []),
+            )
+    except sqlite3.OperationalError:
+        # No database yet
+        df = pd.DataFrame(columns=CHECK_COLUMNS)
+    return df
+
+
+def load_checks(url=None, client=None, since=None, until=None, down_only=False, limit=500):
+    """
+    Checks, newest first, with every filter applied in SQL so only the
+    rows a page renders are read
+
+    Args:
+        url: Only this site
+        client: Only this client's sites
+        since: Only checks at or after this time (epoch seconds)
+        until: Only checks before this time (epoch seconds)
+        down_only: Only failed checks
+        limit: Most rows to return (None for all)
+    """
+    version = site_version(url) if url is not None else data_version()
+    return _load_checks(version, url, client, since, until, down_only, limit)
+
+
+def _interval_checks(clauses, params, since_ms, until_ms, down_only, limit) -> pd.DataFrame:
+    """Check-shaped rows for the intervals storage mode: every response-time
+    point in the window (the last 24 hours by default) with the state of
+    the interval it falls in"""
+    if since_ms is None:
+        since_ms = int((time.time() - 86400) * 1000)
+    hour_clauses = clauses + ["b.hour >= ?"] + (["b.hour < ?"] if until_ms is not None else [])
+    hour_params = params + [since_ms // 1000 - 3600] + ([until_ms // 1000] if until_ms is not None else [])
+    blocks = _read(
+        f"""
+        SELECT s.id, s.url, s.client, b.hour, b.data
+        FROM sites s
+        JOIN series_blocks b ON b.site_id = s.id AND b.metric = 'rt'
+        WHERE {" AND ".join(hour_clauses)}
         """,
-        conn,
+        hour_params,
     )
-    conn.close()
+    parts = []
+    for site_id, url, client, hour, data in blocks:
+        offsets, values = decode_block(data)
+        parts.append(pd.DataFrame({
+            "site_id": site_id, "url": url, "client": client,
+            "ts": offsets + hour * 1000, "response_time": values,
+        }))
+    if not parts:
+        return pd.DataFrame(columns=CHECK_COLUMNS)
+    points = pd.concat(parts, ignore_index=True)
+    keep = points["ts"] >= since_ms
+    if until_ms is not None:
+        keep &= points["ts"] < until_ms
+    points = points[keep].sort_values("ts")
+
+    intervals = _read_df(
+        f"""
+        SELECT i.site_id, i.state, i.status_code, i.error, i.start_ts
+        FROM state_intervals i JOIN sites s ON s.id = i.site_id
+        WHERE {" AND ".join(clauses + ["i.end_ts >= ?"])}
+        """,
+        params + [since_ms],
+    ).sort_values("start_ts")
+    df = pd.merge_asof(points, intervals, left_on="ts", right_on="start_ts", by="site_id")
+    df["is_up"] = (df["state"] == "up").astype(int)
+    if down_only:
+        df = df[df["is_up"] == 0]
+    df = df.sort_values("ts", ascending=False)
+    if limit is not None:
+        df = df.head(limit)
+    df["id"] = df["ts"]
+    df["checked_at"] = pd.to_datetime(df["ts"], unit="ms").dt.strftime("%Y-%m-%dT%H:%M:%S.%f")
+    df["ssl_ok"] = None
+    df["ssl_days_left"] = None
+    return df[CHECK_COLUMNS].reset_index(drop=True)
+
+
+# Limits of the tail cache shared by every session; the least recently used
+# frames are evicted first
+TAIL_CACHE_MAX_ENTRIES = 64
+TAIL_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Check ids are handed out by the monitor's writer thread in commit order,
+# while ts is taken when the check finishes, so a new id can carry a
+# slightly older ts
+_TAIL_LAG_MS = 60 * 1000
+
+
+class TailCache:
+    """
+    Frames kept between reruns, each with the id of its newest row as a
+    cursor, so a reload only reads the rows written since, and the data
+    version it was read at, so a reload without new data reads none. Entries are
+    evicted one key at a time, least recently used first, when there are
+    more than max_entries or they take more than max_bytes.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (frame, cursor, version, nbytes)
+        self._bytes = 0
+
+    def get(self, key):
+        """(frame, cursor, version) of a key, or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[:3]
+
+    def put(self, key, frame: pd.DataFrame, cursor: int, version: int = 0):
+        self.pop(key)
+        nbytes = int(frame.memory_usage(deep=True).sum())
+        self._entries[key] = (frame, cursor, version, nbytes)
+        self._bytes += nbytes
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._bytes -= self._entries.popitem(last=False)[1][3]
+
+    def pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[3]
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self._bytes}
+
+
+@st.cache_resource
+def _tail_cache() -> TailCache:
+    return TailCache(TAIL_CACHE_MAX_ENTRIES, TAIL_CACHE_MAX_BYTES)
+
+
+def load_check_history(url, hours=24):
+    """
+    Checks of a site over the last `hours` hours, oldest first. The frame
+    is kept in the tail cache and each call only reads the rows with an id
+    above the last one it holds, so reloading a long history costs a few
+    new rows instead of a full query, and nothing while the site's check
+    version is unchanged.
+    """
+    now = time.time()
+    if load_config().get("storage", {}).get("mode") == "intervals":
+        # Interval rows have no ids to resume from
+        since = (now - hours * 3600) // 60 * 60
+        return load_checks(url=url, since=since, limit=None).iloc[::-1].reset_index(drop=True)
+
+    since_ms = int((now - hours * 3600) * 1000)
+    # Status, TTFB and port writes don't touch check_results
+    version = site_version(url, "check")
+    cache = _tail_cache()
+    key = (str(DB_PATH), url, hours)
+    with cache.lock:
+        cached = cache.get(key)
+        frame, cursor, seen = cached if cached is not None else (None, 0, None)
+        if seen == version and version > 0 and (frame.empty or frame["ts"].iloc[0] >= since_ms):
+            return frame[CHECK_COLUMNS].reset_index(drop=True)
+        if frame is not None and not frame.empty:
+            low_ms = max(since_ms, int(frame["ts"].iloc[-1]) - _TAIL_LAG_MS)
+        else:
+            low_ms = since_ms
+        try:
+            rows = _read(
+                """
+                SELECT
+                    r.id,
+                    s.url,
+                    s.client,
+                    strftime('%Y-%m-%dT%H:%M:%f', r.ts / 1000.0, 'unixepoch') AS checked_at,
+                    r.status_code,
+                    r.is_up,
+                    r.response_time,
+                    r.ssl_ok,
+                    r.ssl_days_left,
+                    r.error,
+                    r.ts
+                FROM check_results r JOIN sites s ON s.id = r.site_id
+                WHERE s.url = ? AND r.ts >= ? AND r.id > ?
+                ORDER BY r.ts
+                """,
+                (url, low_ms, cursor),
+            )
+        except sqlite3.OperationalError:
+            # No database yet
+            return pd.DataFrame(columns=CHECK_COLUMNS)
+
+        expired = frame is not None and not frame.empty and frame["ts"].iloc[0] < since_ms
+        if rows or expired or frame is None:
+            new = pd.DataFrame(rows, columns=CHECK_COLUMNS + ["ts"])
+            if frame is not None:
+                frame = frame[frame["ts"] >= since_ms]
+            if frame is None or frame.empty:
+                frame = new
+            elif rows:
+                frame = pd.concat([frame, new], ignore_index=True).sort_values("ts", kind="stable")
+            if rows:
+                cursor = max(cursor, max(row[0] for row in rows))
+        # Stored even when nothing changed, so the next call at this
+        # version skips the query
+        cache.put(key, frame, cursor, version)
+    return frame[CHECK_COLUMNS].reset_index(drop=True)
+
+
+@st.cache_data(ttl=600, max_entries=256)
+def _load_series(version, url, metric="rt", hours=24):
+    since = int(time.time()) - hours * 3600
+    try:
+        blocks = _read(
+            """
+            SELECT hour, data FROM series_blocks
+            WHERE site_id = (SELECT id FROM sites WHERE url = ?) AND metric = ? AND hour >= ?
+            ORDER BY hour
+            """,
+            (url, metric, since - since % 3600),
+        )
+    except sqlite3.OperationalError:
+        blocks = []
+
+    ts_parts, value_parts = [np.empty(0, dtype=np.int64)], [np.empty(0)]
+    for hour, data in blocks:
+        offsets, values = decode_block(data)
+        ts_parts.append(offsets + hour * 1000)
+        value_parts.append(values)
+    ts, values = np.concatenate(ts_parts), np.concatenate(value_parts)
+    keep = ts >= since * 1000
+    return pd.DataFrame(
+        {metric: values[keep]},
+        index=pd.DatetimeIndex(pd.to_datetime(ts[keep], unit="ms"), name="checked_at"),
+    )
+
+
+def load_series(url, metric="rt", hours=24):
+    """Response-time ("rt") or TTFB ("ttfb") series of a site, decoded from
+    the monitor's hourly blocks (one block per hour viewed)"""
+    return _load_series(site_version(url), url, metric, hours)
+
+
+# Charts get at most this many points per series: about one per pixel of
+# a wide chart, far fewer than months of one-minute checks
+CHART_POINTS = 800
+# Bar charts get at most this many bars; uptime bars are averages, so they
+# are bucketed rather than sampled
+CHART_BARS = 200
+# Zoom levels of the Monitor charts, in hours
+CHART_RANGES = {"24 hours": 24, "7 days": 7 * 24, "30 days": 30 * 24, "90 days": 90 * 24}
+
+
+def lttb_indices(x, y, points: int):
+    """
+    Positions of the points Largest-Triangle-Three-Buckets keeps out of
+    (x, y): the first and last point, and from each of points - 2 equal
+    buckets in between the one spanning the largest triangle with the
+    point kept before it and the average of the next bucket. Bucket
+    averages are computed at once; the loop only does one vectorized
+    argmax per bucket.
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    sizes = np.diff(edges)
+    avg_x = np.add.reduceat(x[:n - 1], edges[:-1]) / sizes
+    avg_y = np.add.reduceat(y[:n - 1], edges[:-1]) / sizes
+    next_x, next_y = np.append(avg_x[1:], x[n - 1]), np.append(avg_y[1:], y[n - 1])
+
+    kept = np.empty(points, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - next_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def downsample(frame: pd.DataFrame, column: str, points: int = CHART_POINTS) -> pd.DataFrame:
+    """At most `points` rows of a time-indexed frame, chosen by LTTB on
+    `column` so peaks and dips survive; rows without a value are dropped"""
+    frame = frame[frame[column].notna()]
+    if len(frame) <= points:
+        return frame
+    x = frame.index.asi8 if isinstance(frame.index, pd.DatetimeIndex) else np.arange(len(frame))
+    return frame.iloc[lttb_indices(x.astype(np.float64), frame[column].to_numpy(dtype=np.float64), points)]
+
+
+def trend_resolution(hours: int, points: int = CHART_POINTS):
+    """
+    Where a response-time trend over `hours` is drawn from: None for every
+    check (up to a day), else the rollup resolution in seconds - minutes
+    while they are kept and needed to fill `points`, hours beyond
+    """
+    if hours <= 24:
+        return None
+    minute_days = load_config().get("retention", {}).get("minute_rollup_days", 7)
+    if hours >= points or hours > minute_days * 24:
+        return 3600
+    return 60
+
+
+@st.cache_data(ttl=600, max_entries=64)
+def _load_trend(version, url, hours, points):
+    resolution = trend_resolution(hours, points)
+    if resolution is None:
+        frame = _load_series(version, url, "rt", hours).rename(columns={"rt": "response_time"})
+        return downsample(frame, "response_time", points)
+
+    since = int(time.time()) - hours * 3600
+    try:
+        frame = _read_df(
+            """
+            SELECT bucket, rt_sum / rt_count AS response_time FROM site_rollups
+            WHERE site_id = (SELECT id FROM sites WHERE url = ?) AND resolution = ? AND bucket >= ?
+              AND rt_count > 0
+            ORDER BY bucket
+            """,
+            (url, resolution, since - since % resolution),
+        )
+    except Exception:
+        frame = pd.DataFrame(columns=["bucket", "response_time"])
+    frame.index = pd.DatetimeIndex(pd.to_datetime(frame.pop("bucket").astype(np.int64), unit="s"), name="checked_at")
+    return downsample(frame, "response_time", points)
+
+
+def load_trend(url, hours=24, points=CHART_POINTS):
+    """Response-time trend of a site over the last `hours` hours, at most
+    `points` points: every check LTTB-sampled up to a day, averages of the
+    minute or hour rollups (see trend_resolution()) at wider zoom"""
+    return _load_trend(site_version(url), url, hours, points)
+
+
+@st.cache_data(ttl=600, max_entries=64)
+def _load_uptime_bars(version, url, hours, bars):
+    resolution = 3600 if hours <= bars else 86400
+    since = int(time.time()) - hours * 3600
+    try:
+        frame = _read_df(
+            """
+            SELECT bucket, 100.0 * up_checks / checks AS uptime_pct, checks, up_checks FROM site_rollups
+            WHERE site_id = (SELECT id FROM sites WHERE url = ?) AND resolution = ? AND bucket >= ?
+              AND checks > 0
+            ORDER BY bucket
+            """,
+            (url, resolution, since - since % resolution),
+        )
+    except Exception:
+        frame = pd.DataFrame(columns=["bucket", "uptime_pct", "checks", "up_checks"])
+    frame.index = pd.DatetimeIndex(pd.to_datetime(frame.pop("bucket").astype(np.int64), unit="s"), name="checked_at")
+    return frame
+
+
+def load_uptime_bars(url, hours, bars=CHART_BARS):
+    """Uptime % of a site per hour (per day if that gives more than `bars`
+    bars) over the last `hours` hours, with the checks behind each bar,
+    from the rollups"""
+    return _load_uptime_bars(site_version(url), url, hours, bars)
+
+
+@st.cache_data(max_entries=4)
+def _load_site_status(version):
+    try:
+        df = _read_df(
+            """
+            SELECT
+                s.url,
+                s.client,
+                s.hostname,
+                strftime('%Y-%m-%dT%H:%M:%f', st.checked_ts / 1000.0, 'unixepoch') AS checked_at,
+                st.status_code,
+                st.is_up,
+                st.response_time,
+                st.error,
+                st.ssl_ok,
+                st.ssl_days_left,
+                st.dns_ok,
+                st.dns_info,
+                st.content_state,
+                st.content_info,
+                st.reputation,
+                st.open_ports
+            FROM site_status st
+            JOIN sites s ON s.id = st.site_id
+            """
+        )
+    except Exception:
+        # Database from before the latest-state tables existed
+        df = pd.DataFrame()
     return df
 
 
-@st.cache_data
-def load_port_data(url):
-    """Load latest port scan data for a URL"""
-    conn = sqlite3.connect(DB_PATH)
+def load_site_status():
+    """Current status of every monitored site, one row per site, from the
+    monitor's site_status table"""
+    return _load_site_status(data_version())
+
+
+@st.cache_data(max_entries=64)
+def _load_host_ports(version, hostname):
     try:
         query = """
-        SELECT port, service, is_open, response_time, status, scanned_at
-        FROM port_scans 
-        WHERE url = ? 
-        AND scanned_at = (SELECT MAX(scanned_at) FROM port_scans WHERE url = ?)
+        SELECT port, service, is_open, response_time, status,
+               strftime('%Y-%m-%dT%H:%M:%f', scanned_ts / 1000.0, 'unixepoch') AS scanned_at
+        FROM host_port_state
+        WHERE hostname = ?
         ORDER BY port
         """
-        df = pd.read_sql_query(query, conn, params=(url, url))
-        conn.close()
-        return df
+        return _read_df(query, (hostname,))
     except Exception:
-        conn.close()
         return pd.DataFrame()
 
 
+def load_host_ports(hostname, url=None):
+    """
+    Load the last scanned state of every port of a host; given the url it
+    was scanned for, only reloaded after a new scan of that site
+    """
+    version = data_version() if url is None else site_version(url, "ports")
+    return _load_host_ports(version, hostname)
+
+
+@st.cache_data(max_entries=4)
+def _load_check_totals(version):
+    try:
+        row = _read(
+            "SELECT SUM(checks), SUM(up_checks), SUM(rt_sum), SUM(rt_count) FROM client_rollups WHERE resolution = 86400"
+        )[0]
+    except sqlite3.OperationalError:
+        row = None
+    if not row or not row[0]:
+        return {"checks": 0, "up_checks": 0, "rt_avg": None}
+    return {
+        "checks": row[0],
+        "up_checks": row[1],
+        "rt_avg": row[2] / row[3] if row[3] else None,
+    }
+
+
+def load_check_totals():
+    """Checks, up checks and mean response time of every check ever
+    recorded, summed from the daily rollups"""
+    return _load_check_totals(data_version())
+
+
+@st.cache_data(ttl=600, max_entries=32)
+def _load_site_summary(version, days: int, client=None):
+    since = int(time.time()) - days * 86400
+    since -= since % 3600
+    params = [since]
+    where = ""
+    if client is not None:
+        where = "AND COALESCE(s.client, 'Unknown') = ?"
+        params.append(client)
+    try:
+        df = _read_df(
+            f"""
+            SELECT
+                s.url,
+                s.client,
+                SUM(r.checks) AS checks,
+                SUM(r.checks) - SUM(r.up_checks) AS failed_checks,
+                ROUND(100.0 * SUM(r.up_checks) / SUM(r.checks), 3) AS uptime_pct,
+                ROUND(SUM(r.rt_sum) / NULLIF(SUM(r.rt_count), 0), 3) AS avg_response_time
+            FROM site_rollups r JOIN sites s ON s.id = r.site_id
+            WHERE r.resolution = 3600 AND r.bucket >= ? {where}
+            GROUP BY r.site_id
+            HAVING SUM(r.checks) > 0
+            ORDER BY uptime_pct, s.url
+            """,
+            params,
+        )
+    except sqlite3.OperationalError:
+        # Database from before the rollups existed
+        df = pd.DataFrame(columns=["url", "client", "checks", "failed_checks", "uptime_pct", "avg_response_time"])
+    return df
+
+
+def load_site_summary(days: int, client=None):
+    """Checks, failed checks, uptime % and mean response time per site over
+    the last `days` days, aggregated in SQL from the hourly rollups"""
+    return _load_site_summary(data_version(), days, client)
+
+
+def _query_uptime_bits(sql, params):
+    try:
+        return _read(sql, params)
+    except sqlite3.OperationalError:
+        # Database from before the uptime bitsets existed
+        return []
+
+
+@st.cache_data(ttl=600, max_entries=256)
+def _load_uptime_slots(version, url, hours=24):
+    since = int(time.time()) - hours * 3600
+    rows = _query_uptime_bits(
+        """
+        SELECT day, up, ran FROM uptime_bits
+        WHERE site_id = (SELECT id FROM sites WHERE url = ?) AND day >= ?
+        ORDER BY day
+        """,
+        (url, since - since % DAY_SECONDS),
+    )
+    if not rows:
+        return pd.DataFrame(columns=["is_up"])
+
+    days = np.array([row[0] for row in rows], dtype=np.int64)
+    up = unpack_slots([row[1] for row in rows]).ravel()
+    ran = unpack_slots([row[2] for row in rows]).ravel()
+    slot_ts = (days[:, None] + np.arange(SLOTS_PER_DAY) * SLOT_SECONDS).ravel()
+    keep = ran & (slot_ts >= since - since % SLOT_SECONDS)
+    return pd.DataFrame(
+        {"is_up": up[keep].astype(int)},
+        index=pd.DatetimeIndex(pd.to_datetime(slot_ts[keep], unit="s"), name="checked_at"),
+    )
+
+
+def load_uptime_slots(url, hours=24):
+    """Checked one-minute slots of a site over the last `hours` hours, with
+    is_up per slot, unpacked from the monitor's per-day uptime bitsets"""
+    return _load_uptime_slots(site_version(url), url, hours)
+
+
+@st.cache_data(ttl=600, max_entries=8)
+def _load_uptime_heatmap(version, days=30):
+    today = int(time.time()) // DAY_SECONDS * DAY_SECONDS
+    first = today - (days - 1) * DAY_SECONDS
+    rows = _query_uptime_bits(
+        """
+        SELECT s.url, b.day, b.up_slots, b.ran_slots
+        FROM uptime_bits b JOIN sites s ON s.id = b.site_id
+        WHERE b.day >= ?
+        """,
+        (first,),
+    )
+    columns = pd.to_datetime(first + np.arange(days) * DAY_SECONDS, unit="s").date
+    if not rows:
+        return pd.DataFrame(columns=columns)
+
+    cells = pd.DataFrame(rows, columns=["url", "day", "up_slots", "ran_slots"])
+    up = cells.pivot(index="url", columns="day", values="up_slots")
+    ran = cells.pivot(index="url", columns="day", values="ran_slots")
+    heatmap = (up / ran.where(ran > 0) * 100).reindex(columns=first + np.arange(days) * DAY_SECONDS)
+    heatmap.columns = columns
+    return heatmap
+
+
+def load_uptime_heatmap(days=30):
+    """Uptime % per site (rows) and UTC day (columns) over the last `days`
+    days, from the popcounts stored with the uptime bitsets"""
+    return _load_uptime_heatmap(data_version(), days)
+
+
+# Windows offered for latency percentiles, label -> hours
+PERCENTILE_WINDOWS = {
+    "Last 24 hours": 24,
+    "Last 7 days": 24 * 7,
+    "Last 30 days": 24 * 30,
+    "Last 90 days": 24 * 90,
+}
+
+@st.cache_data(ttl=600, max_entries=64)
+def _load_latency_percentiles(version, hours: int, by: str = "site", url=None):
+    until = int(time.time())
+    ranges = rollup_ranges(until - hours * 3600, until)
+    keys = ["client"] if by == "client" else ["url", "client"]
+    columns = keys + ["checks", "p50", "p95", "p99"]
+    if not ranges:
+        return pd.DataFrame(columns=columns)
+
+    # One part per bucket range, so each is a primary-key range seek
+    if by == "client":
+        part = """
+        SELECT r.client, r.checks, r.rt_sketch
+        FROM client_rollups r
+        WHERE r.resolution = ? AND r.bucket >= ? AND r.bucket < ?
+        """
+        params = [value for r in ranges for value in r]
+    else:
+        part = f"""
+        SELECT s.url, s.client, r.checks, r.rt_sketch
+        FROM sites s CROSS JOIN site_rollups r
+        ON r.site_id = s.id AND r.resolution = ? AND r.bucket >= ? AND r.bucket < ?
+        {"WHERE s.url = ?" if url else ""}
+        """
+        params = [value for r in ranges for value in (*r, *([url] if url else []))]
+    query = " UNION ALL ".join(part for _ in ranges)
+
+    try:
+        rows = _read(query, params)
+    except sqlite3.OperationalError:
+        # Database from before the rollups existed
+        rows = []
+
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(row[:len(keys)]), []).append(row[len(keys):])
+    records = []
+    for key, buckets in groups.items():
+        p50, p95, p99 = merged_quantiles([b[1] for b in buckets], (0.50, 0.95, 0.99))
+        records.append({
+            **dict(zip(keys, key)),
+            "checks": sum(b[0] for b in buckets),
+            "p50": p50, "p95": p95, "p99": p99,
+        })
+    return pd.DataFrame(records, columns=columns)
+
+
+def load_latency_percentiles(hours: int, by: str = "site", url=None):
+    """
+    p50/p95/p99 response times over the last `hours`, merged from the
+    monitor's rollup sketches (a few hundred buckets per site, whatever
+    the window)
+
+    Args:
+        hours: Window length
+        by: "site" or "client"
+        url: Only this site
+    """
+    version = site_version(url) if url is not None else data_version()
+    return _load_latency_percentiles(version, hours, by, url)
+
+
+# Reporting periods offered for SLA tables
+SLA_PERIODS = ("This month", "Last month", "Last 30 days", "Last 7 days")
+
+
+def sla_period(label: str):
+    """(since, until) epoch seconds of an SLA_PERIODS entry, in UTC"""
+    now = datetime.now(timezone.utc)
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if label == "This month":
+        return month_start.timestamp(), now.timestamp()
+    if label == "Last month":
+        previous = (month_start - timedelta(days=1)).replace(day=1)
+        return previous.timestamp(), month_start.timestamp()
+    days = 30 if label == "Last 30 days" else 7
+    return (now - timedelta(days=days)).timestamp(), now.timestamp()
+
+
+@st.cache_data(ttl=600, max_entries=32)
+def _load_sla(version, since: float, until: float, by: str, settings: dict):
+    keys = ["client"] if by == "client" else ["url", "client"]
+    columns = keys + [
+        "availability_pct", "monitored_min", "downtime_min", "no_data_min", "maintenance_min", "incidents",
+        "meets_target",
+    ]
+    conn, lock = _read_connection(str(DB_PATH))
+    try:
+        with lock:
+            if by == "client":
+                result = client_availability(since, until, settings=settings, conn=conn)
+            else:
+                result = site_availability(since, until, settings=settings, conn=conn)
+    except sqlite3.OperationalError:
+        # Database from before the SLA intervals existed
+        result = {}
+    if not result:
+        return pd.DataFrame(columns=columns)
+
+    df = pd.DataFrame.from_dict(result, orient="index").rename_axis(keys[0]).reset_index()
+    df["client"] = df["client"].fillna("Unknown")
+    df["monitored_min"] = (df["up_seconds"] + df["down_seconds"]) / 60
+    df["downtime_min"] = df["down_seconds"] / 60
+    df["no_data_min"] = df["unknown_seconds"] / 60
+    df["maintenance_min"] = df["maintenance_seconds"] / 60
+    df["availability_pct"] = pd.to_numeric(df["availability_pct"], errors="coerce")
+    df["meets_target"] = df["availability_pct"] >= float(settings["target_pct"])
+    return df[columns]
+
+
+def load_sla(since: float, until: float, by: str = "site"):
+    """
+    Time-weighted availability over [since, until) from the monitor's SLA
+    intervals (up/down/unknown runs), with the maintenance windows of
+    config["sla"] taken out of both up and down time, as computed by
+    backend/sla.py
+
+    Args:
+        since: Window start, epoch seconds
+        until: Window end, epoch seconds
+        by: "site" or "client"
+    """
+    return _load_sla(data_version(), since, until, by, sla_settings(load_config()))
+
+
+def load_site_schedule(url):
+    """Load the effective uptime interval the monitor uses for a URL"""
+    try:
+        rows = _read(
+            "SELECT interval_seconds, reason, updated_at FROM site_schedule WHERE url = ?",
+            (url,),
+        )
+    except sqlite3.OperationalError:
+        rows = []
+    row = rows[0] if rows else None
+    if row is None:
+        return None
+    return {"interval_seconds": row[0], "reason": row[1], "updated_at": row[2]}
+
+
+def auto_refresh_settings(cfg: dict) -> dict:
+    """
+    Merge cfg["auto_refresh"] over the defaults: how often (seconds) each
+    Monitor section re-renders itself
+    """
+    settings = {"enabled": True, "status_seconds": 5, "ports_seconds": 30, "charts_seconds": 60}
+    settings.update(cfg.get("auto_refresh", {}))
+    return settings
+
+
+def format_interval(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:g}m"
+    return f"{seconds / 3600:g}h"
+
+
 def load_config():
     with open(CONFIG_PATH, "r") as f:
         return json.load(f)
@@ -138,23 +941,10 @@ def _score_url_reputation(url: str) -> str:
     return "Safe"
 
 
-def _ensure_content_table(conn: sqlite3.Connection):
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS content_state (
-            url TEXT PRIMARY KEY,
-            last_hash TEXT,
-            last_checked_at TEXT,
-            last_changed_at TEXT
-        )
-        """
-    )
-    conn.commit()
-
-
-def _content_change_check(db_path: Path, url: str, timeout_s: int = 8):
+def _content_probe(url: str, timeout_s: int = 8):
     """
-    Fetch page, hash body, store hash in SQLite.
+    Fetch page, hash body and compare with the hash the monitor stored last.
+    Nothing is written: the monitor's next content check records the change.
     Returns: (state: Changed | No change | Unavailable, info)
     """
     if not url:
@@ -167,39 +957,60 @@ def _content_change_check(db_path: Path, url: str, timeout_s: int = 8):
     except Exception as e:
         return "Unavailable", str(e)
 
-    conn = sqlite3.connect(db_path)
-    _ensure_content_table(conn)
+    try:
+        rows = _read("SELECT last_hash FROM content_state WHERE url = ?", (url,))
+    except sqlite3.OperationalError:
+        rows = []
+    if not rows:
+        return "No change", "No baseline yet"
+    if (rows[0][0] or "") != content_hash:
+        return "Changed", "Differs from the monitor's last check"
+    return "No change", "Same as the monitor's last check"
 
-    row = conn.execute(
-        "SELECT last_hash FROM content_state WHERE url = ?",
-        (url,),
-    ).fetchone()
 
-    now = pd.Timestamp.utcnow().isoformat()
+def request_check_now(url: str):
+    """
+    Ask the running monitor to check a site now, through its control API
+    (see backend/control.py), and wait for the result
 
-    if row is None:
-        conn.execute(
-            "INSERT INTO content_state(url, last_hash, last_checked_at, last_changed_at) VALUES(?,?,?,?)",
-            (url, content_hash, now, now),
-        )
-        conn.commit()
-        conn.close()
-        return "No change", "Baseline saved"
-
-    last_hash = row[0] or ""
-    if last_hash != content_hash:
-        conn.execute(
-            "UPDATE content_state SET last_hash=?, last_checked_at=?, last_changed_at=? WHERE url=?",
-            (content_hash, now, now, url),
-        )
-        conn.commit()
-        conn.close()
-        return "Changed", "Content updated"
-    else:
-        conn.execute(
-            "UPDATE content_state SET last_checked_at=? WHERE url=?",
-            (now, url),
+    Returns:
+        The monitor's result for the site ("error" set if the check
+        failed), or None if the monitor can't be reached
+    """
+    control = {"enabled": True, "host": "127.0.0.1", "port": 8765, "timeout_seconds": 30}
+    control.update(load_config().get("control", {}))
+    if not control["enabled"]:
+        return None
+    try:
+        r = requests.post(
+            f"http://{control['host']}:{control['port']}/check",
+            json={"url": url},
+            timeout=float(control["timeout_seconds"]) + 5,
         )
-        conn.commit()
-        conn.close()
-        return "No change", "No update"
+        body = r.json()
+    except (requests.RequestException, ValueError):
+        return None
+    if r.status_code != 200:
+        return {"url": url, "error": body.get("error", f"HTTP {r.status_code}")}
+    return body["results"][0]
+
+
+def probe_site(url: str) -> dict:
+    """
+    Live DNS, reputation and content probe of a site from the dashboard,
+    for "Check now" when the monitor can't be reached
+
+    Returns:
+        Dictionary with the site_status fields dns_ok, dns_info,
+        reputation, content_state, content_info and probed_at (UTC ISO)
+    """
+    dns_ok, dns_info = _dns_check(_domain_from_url(url))
+    content_state, content_info = _content_probe(url)
+    return {
+        "dns_ok": dns_ok,
+        "dns_info": dns_info,
+        "reputation": _score_url_reputation(url),
+        "content_state": content_state,
+        "content_info": content_info,
+        "probed_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S"),
+    }
@@ -1,5 +1,12 @@
+import sys
 from pathlib import Path
 
 ROOT = Path(__file__).parent.parent
 DB_PATH = ROOT / "db" / "webguard.db"
 CONFIG_PATH = ROOT / "backend" / "config.json"
+
+# The dashboard reads with the backend's own codecs and SLA engine
+# (backend modules import each other by bare name)
+BACKEND_DIR = ROOT / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
@@ -1,7 +1,7 @@
 import streamlit as st
 
 from components.navbar import render_navbar
-from components.helpers import load_data, load_config
+from components.helpers import load_check_totals, load_config
 
 
 def render():
@@ -229,13 +229,13 @@ def render():
     """, unsafe_allow_html=True)
 
     try:
-        df = load_data()
+        totals = load_check_totals()
         config = load_config()
 
-        total_checks = len(df) if not df.empty else 0
+        total_checks = totals["checks"]
         total_websites = len(config.get("websites", []))
-        avg_response = df["response_time"].mean() if not df.empty and "response_time" in df else 0
-        uptime_pct = (df["is_up"].mean() * 100) if not df.empty and "is_up" in df else 100
+        avg_response = totals["rt_avg"] or 0
+        uptime_pct = totals["up_checks"] / total_checks * 100 if total_checks else 100
 
         st.markdown(f"""
         <div class="wg-stats-grid">
@@ -3,17 +3,47 @@ import streamlit as st
 
 from components.navbar import render_navbar
 from components.helpers import (
-    load_data,
+    data_version,
+    load_check_history,
     load_config,
-    load_port_data,
+    load_site_status,
+    load_host_ports,
+    load_trend,
+    load_uptime_slots,
+    load_uptime_bars,
+    downsample,
+    CHART_RANGES,
+    CHART_BARS,
+    load_latency_percentiles,
+    PERCENTILE_WINDOWS,
+    auto_refresh_settings,
+    load_site_schedule,
+    format_interval,
     spacer,
     _active_urls_from_config,
     _domain_from_url,
-    _dns_check,
-    _score_url_reputation,
-    _content_change_check,
+    probe_site,
+    request_check_now,
 )
-from config import DB_PATH
+
+
+def _site_rows(active_urls, client=None):
+    """Current state of the configured sites (of one client), one row per site, as kept by the monitor"""
+    site_status = load_site_status()
+    if site_status.empty:
+        return site_status
+    site_status = site_status[site_status["url"].isin(active_urls)]
+    site_status = site_status.assign(client=site_status["client"].fillna("Unknown"))
+    return site_status if client is None else site_status[site_status["client"] == client]
+
+
+def _latest_check(client_status, url):
+    """The site's current state, or its newest check if the monitor kept none; None without checks"""
+    current = client_status[client_status["url"] == url] if not client_status.empty else client_status
+    if not current.empty and pd.notna(current.iloc[0]["checked_at"]):
+        return current.iloc[0]
+    history = load_check_history(url, 24)
+    return None if history.empty else history.iloc[-1]
 
 
 def render():
@@ -29,38 +59,64 @@ def render():
         unsafe_allow_html=True,
     )
 
-    top_bar = st.columns([1, 3])
+    config = load_config()
+    refresh = auto_refresh_settings(config)
+
+    top_bar = st.columns([1, 1, 2])
     with top_bar[0]:
         if st.button("🔄 Refresh Dashboard", key="btn_refresh", type="primary"):
-            st.cache_data.clear()
+            # Re-reads the data version at once; only caches of sites that
+            # changed since are reloaded
+            data_version.clear()
             st.rerun()
+    with top_bar[1]:
+        auto_refresh = st.toggle(
+            "Auto refresh",
+            value=bool(refresh["enabled"]),
+            key="mon_auto_refresh",
+            help="Status cards, ports and charts each update themselves in place",
+        )
 
-    df = load_data()
-    config = load_config()
     active_urls = _active_urls_from_config(config)
 
     if not active_urls:
         st.warning("No active websites configured. Add websites in Settings.")
         return
 
-    df = df[df["url"].isin(active_urls)]
-    if df.empty:
+    # Current state is one row per site, kept by the monitor on every check;
+    # the selectors only offer sites it has reported on
+    site_status = _site_rows(active_urls)
+    if site_status.empty:
         st.warning("No data yet for these websites. Make sure the monitor is running.")
         return
 
     col1, col2 = st.columns(2)
     with col1:
-        clients = df["client"].fillna("Unknown").unique().tolist()
+        clients = sorted(site_status["client"].unique().tolist())
         selected_client = st.selectbox("Select Client", options=clients, key="mon_client")
 
-    df_client = df[df["client"].fillna("Unknown") == selected_client]
-
     with col2:
-        urls = df_client["url"].unique().tolist()
+        urls = sorted(site_status[site_status["client"] == selected_client]["url"].tolist())
         selected_url = st.selectbox("Select Website", options=urls, key="mon_url")
 
-    filtered = df_client[df_client["url"] == selected_url].sort_values("checked_at")
-    latest = filtered.iloc[-1]
+    # Each section below is a fragment that re-renders itself on its own
+    # timer and reads only its own (version-cached) data, so an open page
+    # costs a few cache lookups per tick instead of a full rerun
+    def every(section):
+        return refresh[f"{section}_seconds"] if auto_refresh else None
+
+    st.fragment(_status_section, run_every=every("status"))(active_urls, selected_client, selected_url)
+    st.fragment(_ports_section, run_every=every("ports"))(selected_url)
+    st.fragment(_charts_section, run_every=every("charts"))(active_urls, selected_client, selected_url)
+
+
+def _status_section(active_urls, selected_client, selected_url):
+    """Current status cards and the "Check now" button"""
+    client_status = _site_rows(active_urls, selected_client)
+    latest = _latest_check(client_status, selected_url)
+    if latest is None:
+        st.warning("No checks recorded yet for this website.")
+        return
 
     st.markdown('<div class="section-card">', unsafe_allow_html=True)
     st.markdown(
@@ -83,17 +139,45 @@ def render():
     code = int(latest["status_code"]) if pd.notna(latest["status_code"]) else 0
     last_checked = str(latest["checked_at"])
 
+    schedule = load_site_schedule(selected_url)
+    if schedule:
+        interval_label = f"Checked every {format_interval(schedule['interval_seconds'])} • {schedule['reason']}"
+    else:
+        interval_label = "Interval: not reported yet"
+
+    # DNS, reputation and content come from the monitor's last run; the
+    # page only probes a site itself when "Check now" can't reach the
+    # monitor
     domain = _domain_from_url(selected_url)
-    dns_ok, dns_info = _dns_check(domain)
-    dns_label = "Resolved ✅" if dns_ok else "Failed ❌"
+    probe = st.session_state.get(f"probe::{selected_url}")
+    if probe and str(latest["checked_at"]) > probe["probed_at"]:
+        # The monitor has reported since
+        del st.session_state[f"probe::{selected_url}"]
+        probe = None
+    if probe:
+        shown, source = probe, f"Checked now ({probe['probed_at']} UTC)"
+    else:
+        shown, source = latest, "From the monitor's last run"
 
-    rep = _score_url_reputation(selected_url)
-    rep_icon = "✅" if rep == "Safe" else ("⚠️" if rep == "Risky" else "❌")
-    rep_label = f"{rep} {rep_icon}"
+    if pd.notna(shown.get("dns_ok")):
+        dns_label = "Resolved ✅" if bool(shown["dns_ok"]) else "Failed ❌"
+        dns_info = shown["dns_info"]
+    else:
+        dns_label, dns_info = "Pending ⏳", "Not reported yet"
 
-    content_state, content_info = _content_change_check(DB_PATH, selected_url)
-    content_icon = "🔔" if content_state == "Changed" else ("📝" if content_state == "No change" else "❓")
-    content_label = f"{content_state} {content_icon}"
+    rep = shown.get("reputation")
+    if pd.notna(rep):
+        rep_icon = "✅" if rep == "Safe" else ("⚠️" if rep == "Risky" else "❌")
+        rep_label = f"{rep} {rep_icon}"
+    else:
+        rep_label = "Pending ⏳"
+
+    if pd.notna(shown.get("content_state")):
+        content_state, content_info = shown["content_state"], shown["content_info"]
+        content_icon = "🔔" if content_state == "Changed" else ("📝" if content_state == "No change" else "❓")
+        content_label = f"{content_state} {content_icon}"
+    else:
+        content_label, content_info = "Pending ⏳", "Not reported yet"
 
     st.markdown(
         f"""
@@ -118,6 +202,7 @@ def render():
           <div class="wg-card">
             <div class="wg-top"><div class="wg-ico">🕒</div><div class="wg-label">Last Checked</div></div>
             <div class="wg-sub">{last_checked}</div>
+            <div class="wg-sub">{interval_label}</div>
           </div>
           <div class="wg-card">
             <div class="wg-top"><div class="wg-ico">🌐</div><div class="wg-label">Website</div></div>
@@ -132,7 +217,7 @@ def render():
           <div class="wg-card">
             <div class="wg-top"><div class="wg-ico">🧠</div><div class="wg-label">URL Reputation</div></div>
             <div class="wg-value">{rep_label}</div>
-            <div class="wg-sub">Heuristic (offline)</div>
+            <div class="wg-sub">Heuristic (offline) • {source}</div>
           </div>
           <div class="wg-card">
             <div class="wg-top"><div class="wg-ico">📄</div><div class="wg-label">Content Change</div></div>
@@ -147,13 +232,36 @@ def render():
     if latest.get("error"):
         st.error(f"Error: {latest['error']}")
 
+    probe_col, _ = st.columns([1, 3])
+    with probe_col:
+        if st.button("🔎 Check now", key="btn_check_now", help="Ask the monitor to run every check of this site now"):
+            with st.spinner("Checking..."):
+                result = request_check_now(selected_url)
+                if result is None:
+                    st.session_state[f"probe::{selected_url}"] = probe_site(selected_url)
+                    st.session_state["check_now_note"] = ("warning", "Monitor not reachable; DNS, reputation and content were probed from the dashboard.")
+                elif result.get("error"):
+                    st.session_state["check_now_note"] = ("error", f"Check failed: {result['error']}")
+                else:
+                    st.session_state.pop(f"probe::{selected_url}", None)
+                    st.session_state["check_now_note"] = ("success", f"Checked by the monitor at {result['checked_at'][:19]} UTC.")
+                    data_version.clear()
+            st.rerun()
+    note = st.session_state.pop("check_now_note", None)
+    if note:
+        getattr(st, note[0])(note[1])
+
     st.markdown("</div>", unsafe_allow_html=True)
 
-    # ────────── Port Monitoring Section ──────────
+
+def _ports_section(selected_url):
+    """Port monitoring of the site's host; its data only reloads after a new scan"""
+    domain = _domain_from_url(selected_url)
+
     st.markdown('<div class="section-card">', unsafe_allow_html=True)
     st.markdown('<div class="section-title">🔌 Port Monitoring</div>', unsafe_allow_html=True)
 
-    port_data = load_port_data(selected_url)
+    port_data = load_host_ports(domain, selected_url)
 
     if not port_data.empty:
         open_ports = port_data[port_data["is_open"] == 1]
@@ -199,37 +307,90 @@ def render():
 
     st.markdown("</div>", unsafe_allow_html=True)
 
-    # ────────── Analytics & History ──────────
+
+def _charts_section(active_urls, selected_client, selected_url):
+    """Latency percentiles, trends, uptime and recent checks"""
+    client_status = _site_rows(active_urls, selected_client)
+    # The selected site's last 24 hours of checks; a rerun only reads the
+    # checks written since the previous one
+    filtered = load_check_history(selected_url, 24)
+
     st.markdown('<div class="section-card">', unsafe_allow_html=True)
     st.markdown('<div class="section-title">Analytics & History</div>', unsafe_allow_html=True)
 
+    # Percentiles merged from the rollup sketches, so any window costs the
+    # same few hundred buckets
+    pcol0, pcol1, pcol2, pcol3 = st.columns([1.2, 1, 1, 1])
+    with pcol0:
+        window_label = st.selectbox("Latency window", options=list(PERCENTILE_WINDOWS), index=1, key="mon_pct_window")
+    latency = load_latency_percentiles(PERCENTILE_WINDOWS[window_label], "site", selected_url)
+    row = latency.iloc[0] if not latency.empty else None
+    for col, name in ((pcol1, "p50"), (pcol2, "p95"), (pcol3, "p99")):
+        with col:
+            value = row[name] if row is not None else None
+            st.metric(f"Response Time {name}", f"{value:.3f}s" if value is not None and pd.notna(value) else "N/A")
+
+    spacer()
+
+    # Charts are sampled down to about one point per pixel before they are
+    # sent, and drawn from the rollups beyond a day
+    rcol0, _ = st.columns([1.2, 3])
+    with rcol0:
+        range_label = st.selectbox("Chart range", options=list(CHART_RANGES), key="mon_chart_range")
+    hours = CHART_RANGES[range_label]
+
     r1c1, r1c2 = st.columns(2)
     with r1c1:
-        st.markdown("**Response Time Trend**")
-        st.line_chart(filtered.set_index("checked_at")["response_time"], height=280)
+        st.markdown(f"**Response Time Trend (Last {range_label})**")
+        trend = load_trend(selected_url, hours)
+        if trend.empty and hours <= 24:
+            # Database from before the series blocks existed
+            trend = downsample(filtered.set_index("checked_at")[["response_time"]], "response_time")
+        if trend.empty:
+            st.info("No response times recorded in this range.")
+        else:
+            st.line_chart(trend, height=280)
 
     with r1c2:
         st.markdown("**SSL Expiry Countdown (Client Websites)**")
-        latest_per_url = df_client.sort_values("checked_at").groupby("url", as_index=False).last()
-        ssl_df = latest_per_url.dropna(subset=["ssl_days_left"])
+        ssl_df = client_status.dropna(subset=["ssl_days_left"]) if not client_status.empty else client_status
         if ssl_df.empty:
             st.info("No SSL data available yet.")
         else:
-            countdown_df = ssl_df[["url", "ssl_days_left"]].set_index("url")
+            # The sites closest to expiry when there are more than fit
+            countdown_df = ssl_df.nsmallest(CHART_BARS, "ssl_days_left")[["url", "ssl_days_left"]].set_index("url")
             st.bar_chart(countdown_df, height=280)
 
     spacer()
 
     r2c1, r2c2 = st.columns(2)
     with r2c1:
-        st.markdown("**Uptime Percentage (Last 50 Checks)**")
-        recent = filtered.tail(50)
-        if recent.empty:
-            st.info("Not enough data for uptime calculation.")
+        slots = load_uptime_slots(selected_url, hours) if hours <= 24 else None
+        if hours > 24:
+            st.markdown(f"**Uptime Percentage (Last {range_label})**")
+            bars = load_uptime_bars(selected_url, hours)
+            if bars.empty:
+                st.info("Not enough data for uptime calculation.")
+            else:
+                uptime_pct = bars["up_checks"].sum() / bars["checks"].sum() * 100
+                st.write(f"Uptime over {int(bars['checks'].sum())} checks: **{uptime_pct:.1f}%**")
+                st.bar_chart(bars["uptime_pct"], height=280)
+        elif not slots.empty:
+            st.markdown("**Uptime Percentage (Last 24 Hours)**")
+            uptime_pct = slots["is_up"].mean() * 100
+            st.write(f"Uptime over {len(slots)} checked minutes: **{uptime_pct:.1f}%**")
+            hourly = slots["is_up"].resample("1h").mean().dropna() * 100
+            st.bar_chart(hourly.rename("uptime_pct"), height=280)
         else:
-            uptime_pct = recent["is_up"].mean() * 100
-            st.write(f"Uptime over last 50 checks: **{uptime_pct:.1f}%**")
-            st.bar_chart(recent.set_index("checked_at")["is_up"], height=280)
+            # Database from before the uptime bitsets existed
+            st.markdown("**Uptime Percentage (Last 50 Checks)**")
+            recent = filtered.tail(50)
+            if recent.empty:
+                st.info("Not enough data for uptime calculation.")
+            else:
+                uptime_pct = recent["is_up"].mean() * 100
+                st.write(f"Uptime over last 50 checks: **{uptime_pct:.1f}%**")
+                st.bar_chart(recent.set_index("checked_at")["is_up"], height=280)
 
     with r2c2:
         st.markdown("**Recent Checks**")
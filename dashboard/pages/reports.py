@@ -1,8 +1,117 @@
+import time
+
 import pandas as pd
 import streamlit as st
 
 from components.navbar import render_navbar
-from components.helpers import load_data, spacer
+from components.helpers import (
+    load_checks,
+    load_site_status,
+    load_site_summary,
+    load_uptime_heatmap,
+    load_sla,
+    sla_period,
+    SLA_PERIODS,
+    load_latency_percentiles,
+    PERCENTILE_WINDOWS,
+    spacer,
+)
+
+
+def _heat_color(value):
+    """Cell style of a daily uptime % in the availability heatmap"""
+    if pd.isna(value):
+        return ""
+    if value >= 99.9:
+        return "background-color: rgba(22,163,74,0.55)"
+    if value >= 99:
+        return "background-color: rgba(132,204,22,0.45)"
+    if value >= 95:
+        return "background-color: rgba(234,179,8,0.45)"
+    return "background-color: rgba(220,38,38,0.55)"
+
+
+def _period_report(days: int, name: str, period: str, stamp: str):
+    """
+    Weekly/monthly report card. Availability, incidents and downtime are
+    time-weighted from the SLA intervals; the per-site table adds check
+    counts and mean response time from the hourly rollups.
+    """
+    st.markdown('<div class="report-subsection">', unsafe_allow_html=True)
+    st.markdown(f'<div class="report-period-title">📅 {name} Report ({period})</div>', unsafe_allow_html=True)
+
+    sla = load_sla(*sla_period(period), by="site")
+    monitored_min = sla["monitored_min"].sum()
+    if sla.empty or monitored_min <= 0:
+        st.info(f"No checks recorded in the {period.lower()}.")
+        st.markdown("</div>", unsafe_allow_html=True)
+        return
+
+    availability = 100 - sla["downtime_min"].sum() / monitored_min * 100
+    incidents = int(sla["incidents"].sum())
+    downtime_min = sla["downtime_min"].sum()
+    downtime = f"{downtime_min:.0f} min" if downtime_min < 60 else f"{downtime_min / 60:.1f} h"
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.markdown(
+            f"""
+            <div class="metric-card metric-success">
+                <div class="metric-label">Overall Availability</div>
+                <div class="metric-value">{availability:.2f}%</div>
+            </div>
+            """,
+            unsafe_allow_html=True,
+        )
+    with col2:
+        st.markdown(
+            f"""
+            <div class="metric-card metric-danger">
+                <div class="metric-label">Downtime Incidents</div>
+                <div class="metric-value">{incidents}</div>
+            </div>
+            """,
+            unsafe_allow_html=True,
+        )
+    with col3:
+        st.markdown(
+            f"""
+            <div class="metric-card metric-info">
+                <div class="metric-label">Total Downtime</div>
+                <div class="metric-value">{downtime}</div>
+            </div>
+            """,
+            unsafe_allow_html=True,
+        )
+
+    spacer()
+    checks = load_site_summary(days)[["url", "checks", "failed_checks", "avg_response_time"]]
+    report = (
+        sla[["url", "client", "availability_pct", "downtime_min", "incidents"]]
+        .merge(checks, on="url", how="left")
+        .sort_values(["availability_pct", "url"])
+    )
+    st.caption(
+        "Availability, downtime (minutes) and incidents are time-weighted from the SLA intervals, "
+        "as in SLA Availability below; checks, failed checks and mean response time (s) are "
+        "counted from the hourly rollups."
+    )
+    st.dataframe(
+        report.style.format({"availability_pct": "{:.3f}", "downtime_min": "{:.1f}"}, na_rep="N/A"),
+        use_container_width=True,
+        hide_index=True,
+        height=280,
+    )
+
+    st.download_button(
+        label=f"📥 Download {name} Report (CSV)",
+        data=report.to_csv(index=False).encode("utf-8"),
+        file_name=f"webguard_{name.lower()}_report_{stamp}.csv",
+        mime="text/csv",
+        key=f"dl_{name.lower()}",
+        use_container_width=True,
+    )
+    st.markdown("</div>", unsafe_allow_html=True)
 
 
 def render():
@@ -18,19 +127,12 @@ def render():
         unsafe_allow_html=True,
     )
 
-    df = load_data()
-    if df.empty:
+    site_status = load_site_status()
+    if site_status.empty:
         st.warning("No data yet. Make sure the backend monitor is running.")
         return
 
-    df = df.copy()
-    df["checked_at"] = pd.to_datetime(df["checked_at"], utc=True, errors="coerce").dt.tz_convert(None)
-    df = df.dropna(subset=["checked_at"])
-    if df.empty:
-        st.warning("No valid timestamps found in the data.")
-        return
-
-    latest_ts = df["checked_at"].max()
+    stamp = pd.Timestamp.utcnow().strftime("%Y%m%d")
 
     # ───────── UPTIME REPORTS SECTION ─────────
     st.markdown('<div class="section-card animate-slide-up">', unsafe_allow_html=True)
@@ -44,124 +146,153 @@ def render():
         unsafe_allow_html=True,
     )
 
-    # Weekly Report
-    st.markdown('<div class="report-subsection">', unsafe_allow_html=True)
-    st.markdown('<div class="report-period-title">📅 Weekly Report (Last 7 Days)</div>', unsafe_allow_html=True)
+    _period_report(7, "Weekly", "Last 7 days", stamp)
+    spacer()
+    _period_report(30, "Monthly", "Last 30 days", stamp)
 
-    cutoff_week = latest_ts - pd.Timedelta(days=7)
-    weekly = df[df["checked_at"] >= cutoff_week].sort_values("checked_at", ascending=False)
+    st.markdown("</div>", unsafe_allow_html=True)
 
-    if weekly.empty:
-        st.info("No checks recorded in the last 7 days.")
-    else:
-        weekly_uptime = weekly["is_up"].mean() * 100
-        weekly_downtime = (weekly["is_up"] == 0).sum()
-        weekly_total = len(weekly)
+    spacer()
 
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.markdown(
-                f"""
-                <div class="metric-card metric-success">
-                    <div class="metric-label">Overall Uptime</div>
-                    <div class="metric-value">{weekly_uptime:.2f}%</div>
-                </div>
-                """,
-                unsafe_allow_html=True,
-            )
-        with col2:
-            st.markdown(
-                f"""
-                <div class="metric-card metric-danger">
-                    <div class="metric-label">Downtime Incidents</div>
-                    <div class="metric-value">{weekly_downtime}</div>
-                </div>
-                """,
-                unsafe_allow_html=True,
-            )
-        with col3:
-            st.markdown(
-                f"""
-                <div class="metric-card metric-info">
-                    <div class="metric-label">Total Checks</div>
-                    <div class="metric-value">{weekly_total}</div>
-                </div>
-                """,
-                unsafe_allow_html=True,
-            )
+    # ───────── SLA SECTION ─────────
+    st.markdown('<div class="section-card animate-slide-up" style="animation-delay: 0.02s;">', unsafe_allow_html=True)
+    st.markdown(
+        """
+        <div class="section-header">
+            <div class="section-icon">📜</div>
+            <div class="section-title">SLA Availability</div>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
 
-        spacer()
-        st.dataframe(weekly, use_container_width=True, height=280)
+    st.markdown('<div class="report-subsection">', unsafe_allow_html=True)
+    period = st.selectbox("Period", options=list(SLA_PERIODS), key="rep_sla_period")
+    since, until = sla_period(period)
+    sla_clients = load_sla(since, until, by="client")
+    sla_sites = load_sla(since, until, by="site")
+
+    if sla_sites.empty:
+        st.info("No SLA intervals recorded in this period yet.")
+    else:
+        st.caption(
+            "Time-weighted: up time / (up + down time). Time without checks counts as no data and "
+            "maintenance windows (Settings) are excluded; durations in minutes."
+        )
+        sla_cols = {
+            "availability_pct": "{:.3f}", "monitored_min": "{:.0f}", "downtime_min": "{:.1f}",
+            "no_data_min": "{:.0f}", "maintenance_min": "{:.0f}",
+        }
+        st.markdown("**By client**")
+        st.dataframe(
+            sla_clients.sort_values("availability_pct").style.format(sla_cols, na_rep="N/A"),
+            use_container_width=True,
+            hide_index=True,
+        )
+        st.markdown("**By website**")
+        st.dataframe(
+            sla_sites.sort_values("availability_pct").style.format(sla_cols, na_rep="N/A"),
+            use_container_width=True,
+            hide_index=True,
+            height=260,
+        )
 
-        weekly_csv = weekly.to_csv(index=False).encode("utf-8")
+        sla_csv = sla_sites.to_csv(index=False).encode("utf-8")
         st.download_button(
-            label="📥 Download Weekly Report (CSV)",
-            data=weekly_csv,
-            file_name=f"webguard_weekly_report_{latest_ts.strftime('%Y%m%d')}.csv",
+            label="📥 Download SLA Report (CSV)",
+            data=sla_csv,
+            file_name=f"webguard_sla_{period.lower().replace(' ', '_')}_{stamp}.csv",
             mime="text/csv",
-            key="dl_weekly",
+            key="dl_sla",
             use_container_width=True,
         )
 
     st.markdown("</div>", unsafe_allow_html=True)
-    spacer()
+    st.markdown("</div>", unsafe_allow_html=True)
 
-    # Monthly Report
-    st.markdown('<div class="report-subsection">', unsafe_allow_html=True)
-    st.markdown('<div class="report-period-title">📅 Monthly Report (Last 30 Days)</div>', unsafe_allow_html=True)
+    spacer()
 
-    cutoff_month = latest_ts - pd.Timedelta(days=30)
-    monthly = df[df["checked_at"] >= cutoff_month].sort_values("checked_at", ascending=False)
+    # ───────── AVAILABILITY HEATMAP SECTION ─────────
+    st.markdown('<div class="section-card animate-slide-up" style="animation-delay: 0.03s;">', unsafe_allow_html=True)
+    st.markdown(
+        """
+        <div class="section-header">
+            <div class="section-icon">🟩</div>
+            <div class="section-title">Availability Heatmap (Last 30 Days)</div>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
 
-    if monthly.empty:
-        st.info("No checks recorded in the last 30 days.")
+    heatmap = load_uptime_heatmap(30)
+    if heatmap.empty:
+        st.info("No uptime bitsets recorded yet.")
     else:
-        monthly_uptime = monthly["is_up"].mean() * 100
-        monthly_downtime = (monthly["is_up"] == 0).sum()
-        monthly_total = len(monthly)
+        st.caption("Daily uptime % per website (UTC days), from the share of checked minutes that were up")
+        st.dataframe(
+            heatmap.style.format("{:.1f}", na_rep="").map(_heat_color),
+            use_container_width=True,
+            height=min(420, 38 + 35 * len(heatmap)),
+        )
 
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.markdown(
-                f"""
-                <div class="metric-card metric-success">
-                    <div class="metric-label">Overall Uptime</div>
-                    <div class="metric-value">{monthly_uptime:.2f}%</div>
-                </div>
-                """,
-                unsafe_allow_html=True,
-            )
-        with col2:
-            st.markdown(
-                f"""
-                <div class="metric-card metric-danger">
-                    <div class="metric-label">Downtime Incidents</div>
-                    <div class="metric-value">{monthly_downtime}</div>
-                </div>
-                """,
-                unsafe_allow_html=True,
-            )
-        with col3:
-            st.markdown(
-                f"""
-                <div class="metric-card metric-info">
-                    <div class="metric-label">Total Checks</div>
-                    <div class="metric-value">{monthly_total}</div>
-                </div>
-                """,
-                unsafe_allow_html=True,
-            )
+        heatmap_csv = heatmap.to_csv().encode("utf-8")
+        st.download_button(
+            label="📥 Download Availability Heatmap (CSV)",
+            data=heatmap_csv,
+            file_name=f"webguard_availability_{stamp}.csv",
+            mime="text/csv",
+            key="dl_heatmap",
+            use_container_width=True,
+        )
 
-        spacer()
-        st.dataframe(monthly, use_container_width=True, height=280)
+    st.markdown("</div>", unsafe_allow_html=True)
+
+    spacer()
 
-        monthly_csv = monthly.to_csv(index=False).encode("utf-8")
+    # ───────── LATENCY PERCENTILES SECTION ─────────
+    st.markdown('<div class="section-card animate-slide-up" style="animation-delay: 0.05s;">', unsafe_allow_html=True)
+    st.markdown(
+        """
+        <div class="section-header">
+            <div class="section-icon">⏱️</div>
+            <div class="section-title">Latency Percentiles</div>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+
+    st.markdown('<div class="report-subsection">', unsafe_allow_html=True)
+    window_label = st.selectbox("Window", options=list(PERCENTILE_WINDOWS), index=1, key="rep_pct_window")
+    hours = PERCENTILE_WINDOWS[window_label]
+    by_client = load_latency_percentiles(hours, "client")
+    by_site = load_latency_percentiles(hours, "site")
+
+    if by_site.empty:
+        st.info("No response-time rollups recorded in this window yet.")
+    else:
+        st.caption("p50/p95/p99 in seconds, merged from per-bucket sketches (within 2% of the exact value)")
+        pct_cols = {"p50": "{:.3f}", "p95": "{:.3f}", "p99": "{:.3f}"}
+        st.markdown("**By client**")
+        st.dataframe(
+            by_client.sort_values("p95", ascending=False).style.format(pct_cols, na_rep="N/A"),
+            use_container_width=True,
+            hide_index=True,
+        )
+        st.markdown("**By website**")
+        st.dataframe(
+            by_site.sort_values("p95", ascending=False).style.format(pct_cols, na_rep="N/A"),
+            use_container_width=True,
+            hide_index=True,
+            height=260,
+        )
+
+        pct_csv = by_site.to_csv(index=False).encode("utf-8")
         st.download_button(
-            label="📥 Download Monthly Report (CSV)",
-            data=monthly_csv,
-            file_name=f"webguard_monthly_report_{latest_ts.strftime('%Y%m%d')}.csv",
+            label="📥 Download Latency Percentiles (CSV)",
+            data=pct_csv,
+            file_name=f"webguard_latency_{hours}h_{stamp}.csv",
             mime="text/csv",
-            key="dl_monthly",
+            key="dl_latency",
             use_container_width=True,
         )
 
@@ -186,12 +317,7 @@ def render():
     st.markdown('<div class="report-subsection">', unsafe_allow_html=True)
     st.markdown('<div class="report-period-title">🔐 SSL Certificate Status</div>', unsafe_allow_html=True)
 
-    latest_per_url = (
-        df.sort_values("checked_at")
-        .dropna(subset=["ssl_days_left"])
-        .groupby("url", as_index=False)
-        .last()
-    )
+    latest_per_url = site_status.dropna(subset=["ssl_days_left"]) if not site_status.empty else site_status
 
     if latest_per_url.empty:
         st.info("No SSL data recorded yet.")
@@ -244,7 +370,7 @@ def render():
         st.download_button(
             label="📥 Download SSL Summary (CSV)",
             data=ssl_csv,
-            file_name=f"webguard_ssl_summary_{latest_ts.strftime('%Y%m%d')}.csv",
+            file_name=f"webguard_ssl_summary_{stamp}.csv",
             mime="text/csv",
             key="dl_ssl",
             use_container_width=True,
@@ -255,11 +381,13 @@ def render():
 
     # Downtime Incidents
     st.markdown('<div class="report-subsection">', unsafe_allow_html=True)
-    st.markdown('<div class="report-period-title">⚠️ Downtime Incidents</div>', unsafe_allow_html=True)
+    st.markdown('<div class="report-period-title">⚠️ Downtime Incidents (Last 30 Days)</div>', unsafe_allow_html=True)
 
-    incidents = df[df["is_up"] == 0][
+    # Failed checks are filtered in SQL, newest first; the window start is
+    # rounded to the hour so reruns hit the same cache entry
+    incidents = load_checks(since=(time.time() - 30 * 86400) // 3600 * 3600, down_only=True, limit=500)[
         ["checked_at", "url", "client", "status_code", "error"]
-    ].sort_values("checked_at", ascending=False)
+    ]
 
     if incidents.empty:
         st.markdown(
@@ -288,7 +416,7 @@ def render():
         st.download_button(
             label="📥 Download Incidents Report (CSV)",
             data=incidents_csv,
-            file_name=f"webguard_downtime_incidents_{latest_ts.strftime('%Y%m%d')}.csv",
+            file_name=f"webguard_downtime_incidents_{stamp}.csv",
             mime="text/csv",
             key="dl_incidents",
             use_container_width=True,
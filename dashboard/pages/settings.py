@@ -1,3 +1,5 @@
+from datetime import datetime, time as dtime, timedelta, timezone
+
 import pandas as pd
 import streamlit as st
 
@@ -45,6 +47,23 @@ def render():
             key="ssl_expiry_warning_days",
         )
 
+    st.markdown("**Check cadence (minutes)** – slower checks reuse their last result between runs")
+    cadence_cfg = config.get("check_cadence_minutes", {})
+    cadence_defaults = {"dns": 5, "content": 15, "ports": 60, "ssl": 1440, "reputation": 1440}
+    cadence_labels = {"dns": "DNS", "content": "Content", "ports": "Ports", "ssl": "SSL/TLS", "reputation": "Reputation"}
+    cadence_cols = st.columns(len(cadence_defaults))
+    cadence_inputs = {}
+    for col, (check, default) in zip(cadence_cols, cadence_defaults.items()):
+        with col:
+            cadence_inputs[check] = st.number_input(
+                cadence_labels[check],
+                min_value=1,
+                max_value=10080,
+                value=int(cadence_cfg.get(check, default)),
+                step=1,
+                key=f"cadence_{check}",
+            )
+
     col_email, col_enable, _ = st.columns([0.33, 0.22, 0.45])
     with col_email:
         alert_email = config.get("alert_email", "")
@@ -69,6 +88,7 @@ def render():
 
     if st.button("💾 Save settings", key="save_settings", type="primary"):
         config["check_interval_minutes"] = int(interval)
+        config["check_cadence_minutes"] = {k: int(v) for k, v in cadence_inputs.items()}
         config["ssl_expiry_warning_days"] = int(ssl_warning)
         config["email_enabled"] = bool(email_enabled_input)
         config["alert_email"] = alert_email_input.strip()
@@ -81,12 +101,15 @@ def render():
     st.markdown('<div class="section-title">Websites</div>', unsafe_allow_html=True)
 
     websites = config.get("websites", [])
+    # Entries may also be bare URL strings (as the monitor accepts); sites
+    # lines up with websites, one dict per entry
+    sites = [w if isinstance(w, dict) else {"url": w} for w in websites]
 
     if not websites:
         st.info("No websites configured yet.")
     else:
         st.write("Current websites (URL + client):")
-        df_sites = pd.DataFrame(websites)
+        df_sites = pd.DataFrame(sites)
         st.table(df_sites)
 
     spacer()
@@ -120,7 +143,7 @@ def render():
     if websites:
         col_sel, _, _ = st.columns([0.33, 0.33, 0.34])
         with col_sel:
-            options = [f"{w['client']} – {w['url']}" for w in websites] #Drop Down List
+            options = [f"{w.get('client') or 'Unknown'} – {w.get('url')}" for w in sites] #Drop Down List
             to_remove = st.selectbox("Select website to remove", options, key="remove_select") # Pick WebSite To Remove
 
         if st.button("🗑️ Remove selected website", key="remove_website_btn", type="primary"): # When clicked
@@ -139,4 +162,71 @@ def render():
 
     st.markdown("</div>", unsafe_allow_html=True)
 
+    # Maintenance windows are left out of SLA availability (see Reports)
+    st.markdown('<div class="section-card">', unsafe_allow_html=True)
+    st.markdown('<div class="section-title">Maintenance Windows</div>', unsafe_allow_html=True)
+
+    sla_cfg = config.setdefault("sla", {})
+    maintenance = sla_cfg.setdefault("maintenance", [])
+
+    if not maintenance:
+        st.info("No maintenance windows. Downtime always counts against the SLA.")
+    else:
+        st.write("Scheduled windows (UTC):")
+        st.table(pd.DataFrame(maintenance))
+
+    spacer()
+
+    st.markdown("**Add maintenance window (UTC)**")
+    # Sites without a client can only be covered one by one: a window
+    # without a client applies to every site
+    scopes = ["All websites"] + [f"Client: {c}" for c in sorted({w["client"] for w in sites if w.get("client")})] \
+        + [f"Website: {w['url']}" for w in sites if w.get("url")]
+    now = datetime.now(timezone.utc)
+    col_scope, col_reason = st.columns([0.5, 0.5])
+    with col_scope:
+        scope = st.selectbox("Applies to", scopes, key="mw_scope")
+    with col_reason:
+        reason = st.text_input("Reason", key="mw_reason")
+    col_sd, col_st, col_ed, col_et = st.columns(4)
+    with col_sd:
+        start_date = st.date_input("Start date", value=now.date(), key="mw_start_date")
+    with col_st:
+        start_time = st.time_input("Start time", value=dtime(now.hour), key="mw_start_time")
+    with col_ed:
+        end_date = st.date_input("End date", value=now.date(), key="mw_end_date")
+    with col_et:
+        end_time = st.time_input("End time", value=dtime((now + timedelta(hours=1)).hour), key="mw_end_time")
+
+    if st.button("➕ Add maintenance window", key="add_maintenance_btn", type="primary"):
+        start = datetime.combine(start_date, start_time)
+        end = datetime.combine(end_date, end_time)
+        if end <= start:
+            st.error("The window must end after it starts.")
+        else:
+            window = {"start": start.isoformat(timespec="minutes"), "end": end.isoformat(timespec="minutes")}
+            if scope.startswith("Client: "):
+                window["client"] = scope[len("Client: "):]
+            elif scope.startswith("Website: "):
+                window["url"] = scope[len("Website: "):]
+            if reason.strip():
+                window["reason"] = reason.strip()
+            maintenance.append(window)
+            save_config(config)
+            st.cache_data.clear()
+            st.rerun()
+
+    if maintenance:
+        col_sel, _, _ = st.columns([0.33, 0.33, 0.34])
+        with col_sel:
+            options = [f"{w['start']} → {w['end']} ({w.get('url') or w.get('client') or 'all'})" for w in maintenance]
+            to_remove = st.selectbox("Select window to remove", options, key="remove_maintenance_select")
+        if st.button("🗑️ Remove selected window", key="remove_maintenance_btn", type="primary"):
+            del maintenance[options.index(to_remove)]
+            save_config(config)
+            st.cache_data.clear()
+            st.rerun()
+
+    st.markdown("</div>", unsafe_allow_html=True)
+
     
@@ -0,0 +1,21 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+# Backend modules import each other by bare name
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    """Connection to a freshly initialised database in a temp directory"""
+    import db
+
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "webguard.db")
+    db.init_db()
+    connection = sqlite3.connect(db.DB_PATH)
+    yield connection
+    connection.close()
+    db.close_writer()
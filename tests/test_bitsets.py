@@ -0,0 +1,72 @@
+import sqlite3
+
+import numpy as np
+
+from bitsets import (
+    BITSET_BYTES,
+    DAY_SECONDS,
+    SLOTS_PER_DAY,
+    BitsetAgg,
+    bitset_count,
+    bitset_mark,
+    day_of,
+    popcount,
+    register_bitset_functions,
+    slot_mask,
+    slot_of,
+    to_array,
+    unpack_slots,
+)
+
+
+def test_day_and_slot_of_a_timestamp():
+    ts_ms = (3 * DAY_SECONDS + 3600 + 125) * 1000
+    assert day_of(ts_ms) == 3 * DAY_SECONDS
+    assert slot_of(ts_ms) == 62
+
+
+def test_mark_sets_and_clears_a_slot():
+    bits = bitset_mark(None, None, 9, 1)
+    assert len(bits) == BITSET_BYTES
+    assert bits[1] == 0b10
+    assert bitset_mark(bits, None, 9, 0) == bytes(BITSET_BYTES)
+
+
+def test_a_shared_slot_is_up_only_if_every_check_was():
+    agg = BitsetAgg()
+    for slot, value in [(5, 1), (5, 0), (5, 1), (6, 1), (7, 0)]:
+        agg.step(slot, value)
+    agg.step(None, 1)
+    assert unpack_slots([agg.finalize()])[0, 5:8].tolist() == [False, True, False]
+    assert bitset_count(agg.finalize()) == 1
+    assert bitset_count(None) == 0
+
+
+def test_popcount_and_slot_mask_agree():
+    mask = slot_mask(10, 1000)
+    assert mask.shape == (BITSET_BYTES,)
+    assert popcount(mask[None, :]).tolist() == [990]
+    assert popcount(slot_mask(-5, 3)[None, :]).tolist() == [3]
+    assert bitset_count(mask.tobytes()) == 990
+
+
+def test_unpack_round_trips_through_blobs():
+    rng = np.random.default_rng(3)
+    slots = rng.random((4, SLOTS_PER_DAY)) < 0.3
+    blobs = [np.packbits(row, bitorder="little").tobytes() for row in slots]
+    assert to_array(blobs).shape == (4, BITSET_BYTES)
+    assert np.array_equal(unpack_slots(blobs), slots)
+    assert popcount(to_array(blobs)).tolist() == slots.sum(axis=1).tolist()
+    assert unpack_slots([]).shape == (0, SLOTS_PER_DAY)
+
+
+def test_sql_aggregate_matches_marking_one_by_one():
+    conn = sqlite3.connect(":memory:")
+    register_bitset_functions(conn)
+    conn.execute("CREATE TABLE t (slot INTEGER, up INTEGER)")
+    checks = [(1, 1), (1, 1), (2, 0), (1439, 1), (3, 1), (3, 0)]
+    conn.executemany("INSERT INTO t VALUES (?, ?)", checks)
+    (bits,) = conn.execute("SELECT bitset_agg(slot, up) FROM t").fetchone()
+    assert np.flatnonzero(unpack_slots([bits])[0]).tolist() == [1, 1439]
+    (count,) = conn.execute("SELECT bitset_count(?)", (bits,)).fetchone()
+    assert count == 2
@@ -0,0 +1,167 @@
+import sqlite3
+
+import db
+
+MINUTE = 60_000
+GAP = 15 * MINUTE
+
+
+def _site(conn, url="https://a.example.com/"):
+    return conn.execute("INSERT INTO sites (url, client) VALUES (?, 'C')", (url,)).lastrowid
+
+
+def _state(conn, site_id, ts, state, status_code=200, error=None, gap_ms=GAP):
+    conn.execute(
+        "INSERT INTO state_feed (site_id, ts, state, status_code, error, gap_ms) VALUES (?, ?, ?, ?, ?, ?)",
+        (site_id, ts, state, status_code, error, gap_ms),
+    )
+
+
+def _state_intervals(conn, site_id):
+    return conn.execute(
+        "SELECT state, status_code, start_ts, end_ts, n_checks FROM state_intervals WHERE site_id = ? ORDER BY start_ts",
+        (site_id,),
+    ).fetchall()
+
+
+def test_state_feed_extends_a_run_and_splits_on_change(conn):
+    site = _site(conn)
+    for minute in range(3):
+        _state(conn, site, minute * MINUTE, "up")
+    _state(conn, site, 3 * MINUTE, "up", status_code=301)
+    _state(conn, site, 4 * MINUTE, "down", status_code=None, error="Timeout")
+    assert _state_intervals(conn, site) == [
+        ("up", 200, 0, 3 * MINUTE, 3),
+        ("up", 301, 3 * MINUTE, 4 * MINUTE, 1),
+        ("down", None, 4 * MINUTE, 4 * MINUTE, 1),
+    ]
+
+
+def test_state_feed_closes_the_interval_after_a_silence(conn):
+    site = _site(conn)
+    _state(conn, site, 0, "up")
+    _state(conn, site, MINUTE, "up")
+    _state(conn, site, MINUTE + GAP + 1, "up")
+    _state(conn, site, 2 * MINUTE + GAP + 1, "down", status_code=None)
+    assert _state_intervals(conn, site) == [
+        ("up", 200, 0, MINUTE, 2),
+        ("up", 200, MINUTE + GAP + 1, 2 * MINUTE + GAP + 1, 1),
+        ("down", None, 2 * MINUTE + GAP + 1, 2 * MINUTE + GAP + 1, 1),
+    ]
+
+
+def test_interval_uptime_leaves_silences_out(conn):
+    site = _site(conn)
+    hour = 60 * MINUTE
+    for ts in range(0, hour + 1, MINUTE):
+        _state(conn, site, ts, "up")
+    # A day without checks, then an hour down
+    for ts in range(25 * hour, 26 * hour + 1, MINUTE):
+        _state(conn, site, ts, "down", status_code=None)
+    conn.commit()
+    uptime = db.get_interval_uptime(0, 26 * hour / 1000, url="https://a.example.com/")
+    assert uptime["up_seconds"] == 3600
+    assert uptime["down_seconds"] == 3600
+    assert uptime["uptime_pct"] == 50
+
+
+def test_state_feed_without_gap_ms_is_migrated(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "old.db")
+    db.init_db()
+    old = sqlite3.connect(db.DB_PATH)
+    old.execute("DROP VIEW state_feed")
+    old.execute("CREATE VIEW state_feed AS SELECT site_id, end_ts AS ts, state, status_code, error FROM state_intervals")
+    old.commit()
+    old.close()
+    db.init_db()
+    conn = sqlite3.connect(db.DB_PATH)
+    site = _site(conn)
+    _state(conn, site, 0, "up")
+    _state(conn, site, MINUTE, "up")
+    assert _state_intervals(conn, site) == [("up", 200, 0, MINUTE, 2)]
+    conn.close()
+    db.close_writer()
+
+
+def _sla(conn, site_id, ts, state, gap_ms=GAP):
+    conn.execute(
+        "INSERT INTO sla_feed (site_id, ts, state, gap_ms) VALUES (?, ?, ?, ?)",
+        (site_id, ts, state, gap_ms),
+    )
+
+
+def _sla_intervals(conn, site_id):
+    return conn.execute(
+        "SELECT state, start_ts, end_ts FROM sla_intervals WHERE site_id = ? ORDER BY start_ts, id",
+        (site_id,),
+    ).fetchall()
+
+
+def test_sla_feed_holds_a_state_until_the_check_that_changes_it(conn):
+    site = _site(conn)
+    _sla(conn, site, 0, "up")
+    _sla(conn, site, MINUTE, "up")
+    _sla(conn, site, 2 * MINUTE, "down")
+    _sla(conn, site, 3 * MINUTE, "down")
+    _sla(conn, site, 4 * MINUTE, "up")
+    assert _sla_intervals(conn, site) == [
+        ("up", 0, 2 * MINUTE),
+        ("down", 2 * MINUTE, 4 * MINUTE),
+        ("up", 4 * MINUTE, 4 * MINUTE),
+    ]
+
+
+def test_sla_feed_records_a_silence_as_unknown(conn):
+    site = _site(conn)
+    _sla(conn, site, 0, "up")
+    _sla(conn, site, GAP + MINUTE, "up")
+    _sla(conn, site, GAP + 2 * MINUTE, "up")
+    assert _sla_intervals(conn, site) == [
+        ("up", 0, 0),
+        ("unknown", 0, GAP + MINUTE),
+        ("up", GAP + MINUTE, GAP + 2 * MINUTE),
+    ]
+
+
+def test_sla_feed_wider_gap_bridges_a_breaker_backoff(conn):
+    site = _site(conn)
+    _sla(conn, site, 0, "down")
+    _sla(conn, site, GAP + MINUTE, "down", gap_ms=GAP + 5 * MINUTE)
+    assert _sla_intervals(conn, site) == [("down", 0, GAP + MINUTE)]
+
+
+def test_sla_feed_ignores_a_late_check_of_the_same_state(conn):
+    site = _site(conn)
+    _sla(conn, site, 2 * MINUTE, "up")
+    _sla(conn, site, MINUTE, "up")
+    assert _sla_intervals(conn, site) == [("up", 2 * MINUTE, 2 * MINUTE)]
+
+
+def test_sla_backfill_keeps_a_long_state_interval(conn):
+    site = _site(conn)
+    hour = 60 * MINUTE
+    # A site checked every 10 minutes for two hours, then down
+    for ts in range(0, 2 * hour + 1, 10 * MINUTE):
+        _state(conn, site, ts, "up")
+    _state(conn, site, 2 * hour + 10 * MINUTE, "down", status_code=None)
+    conn.execute("DELETE FROM sla_intervals")
+    db._backfill_sla_intervals(conn)
+    assert _sla_intervals(conn, site) == [
+        ("up", 0, 2 * hour + 10 * MINUTE),
+        ("down", 2 * hour + 10 * MINUTE, 2 * hour + 10 * MINUTE),
+    ]
+
+
+def test_change_feed_bumps_the_data_version_and_the_site_kind(conn):
+    a, b = _site(conn), _site(conn, "https://b.example.com/")
+
+    def change(site_id, kind):
+        conn.execute("INSERT INTO change_feed (site_id, kind) VALUES (?, ?)", (site_id, kind))
+        return conn.execute("SELECT seq FROM data_version WHERE id = 0").fetchone()[0]
+
+    first = change(a, "check")
+    assert change(a, "status") == first + 1
+    assert change(b, "check") == first + 2
+    assert change(a, "status") == first + 3
+    versions = {(site, kind): seq for site, kind, seq in conn.execute("SELECT site_id, kind, seq FROM site_versions")}
+    assert versions == {(a, "check"): first, (a, "status"): first + 3, (b, "check"): first + 2}
@@ -0,0 +1,23 @@
+from db import rollup_ranges
+
+
+def test_rollup_ranges_tile_the_window_with_the_coarsest_buckets():
+    since = 2 * 86400 + 5 * 3600 + 7 * 60 + 30
+    until = 6 * 86400 + 2 * 3600 + 11 * 60 + 5
+    ranges = rollup_ranges(since, until)
+    assert ranges == [
+        (60, since - 30, 2 * 86400 + 6 * 3600),
+        (60, 6 * 86400 + 2 * 3600, until + 55),
+        (3600, 2 * 86400 + 6 * 3600, 3 * 86400),
+        (3600, 6 * 86400, 6 * 86400 + 2 * 3600),
+        (86400, 3 * 86400, 6 * 86400),
+    ]
+    covered = sorted((start, end) for _, start, end in ranges)
+    assert all(a[1] == b[0] for a, b in zip(covered, covered[1:]))
+    assert all(start % resolution == 0 and end % resolution == 0 for resolution, start, end in ranges)
+
+
+def test_rollup_ranges_inside_one_hour_are_minutes():
+    assert rollup_ranges(3600 + 60, 3600 + 600) == [(60, 3660, 4200)]
+    assert rollup_ranges(120, 120) == []
+    assert rollup_ranges(100, 100) == [(60, 60, 120)]
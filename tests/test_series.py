@@ -0,0 +1,49 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from series import _HEADER, append_point, decode_block, encode_block, register_series_functions, series_merge
+
+
+def test_round_trip_keeps_offsets_values_and_gaps():
+    offsets = [0, 60_000, 120_005, 180_000, 3_599_999]
+    values = [0.123456, None, 1.5, 0.000001, 12.0]
+    decoded_offsets, decoded_values = decode_block(encode_block(offsets, values))
+    assert decoded_offsets.tolist() == offsets
+    assert np.isnan(decoded_values[1])
+    assert decoded_values[[0, 2, 3, 4]].tolist() == [0.123456, 1.5, 0.000001, 12.0]
+
+
+def test_appending_matches_encoding_at_once():
+    blob = None
+    for offset, value in [(5, 0.2), (65, 0.1), (70, None), (130, 0.3)]:
+        blob = append_point(blob, offset, value)
+    assert blob == encode_block([5, 65, 70, 130], [0.2, 0.1, None, 0.3])
+
+
+def test_merge_appends_the_second_block():
+    merged = series_merge(encode_block([0, 10], [0.5, 0.6]), encode_block([20, 30], [None, 0.7]))
+    offsets, values = decode_block(merged)
+    assert offsets.tolist() == [0, 10, 20, 30]
+    assert np.isnan(values[2]) and values[3] == 0.7
+
+
+def test_empty_block():
+    offsets, values = decode_block(None)
+    assert offsets.size == 0 and values.size == 0
+
+
+def test_unknown_version_is_rejected():
+    blob = bytearray(encode_block([0], [0.1]))
+    blob[0] = 99
+    with pytest.raises(ValueError):
+        decode_block(bytes(blob))
+
+
+def test_sql_functions_build_the_same_block():
+    conn = sqlite3.connect(":memory:")
+    register_series_functions(conn)
+    blob = conn.execute("SELECT series_append(series_append(NULL, 0, 0.25), 60000, NULL)").fetchone()[0]
+    assert blob == encode_block([0, 60_000], [0.25, None])
+    assert _HEADER.unpack_from(blob)[1] == 2
@@ -0,0 +1,74 @@
+import random
+import sqlite3
+
+import numpy as np
+import pytest
+
+from sketch import _HEADER, RELATIVE_ACCURACY, RTSketch, merged_quantiles, register_sketch_functions
+
+
+def _values(n, seed=7):
+    rng = random.Random(seed)
+    return [rng.lognormvariate(-1.5, 0.8) for _ in range(n)]
+
+
+def test_round_trip_keeps_buckets_and_zero_count():
+    sketch = RTSketch.of([0.0, 0.0, 0.01, 0.25, 0.25, 3.0, None])
+    decoded = RTSketch.from_bytes(sketch.to_bytes())
+    assert decoded.buckets == sketch.buckets
+    assert decoded.zero_count == 2
+    assert decoded.count == 6
+
+
+def test_empty_blob_is_an_empty_sketch():
+    assert RTSketch.from_bytes(None).count == 0
+    assert RTSketch.from_bytes(b"").quantile(0.5) is None
+
+
+def test_quantiles_are_within_the_relative_accuracy():
+    values = _values(5000)
+    sketch = RTSketch.of(values)
+    for q in (0.5, 0.95, 0.99):
+        exact = float(np.quantile(values, q, method="lower"))
+        assert sketch.quantile(q) == pytest.approx(exact, rel=2 * RELATIVE_ACCURACY)
+
+
+def test_merge_matches_one_sketch_over_all_values():
+    values = _values(2000)
+    merged = RTSketch.of(values[:700]).merge(RTSketch.of(values[700:]))
+    assert merged.to_bytes() == RTSketch.of(values).to_bytes()
+
+
+def test_unknown_version_is_rejected():
+    blob = bytearray(RTSketch.of([0.2]).to_bytes())
+    blob[0] = 99
+    with pytest.raises(ValueError):
+        RTSketch.from_bytes(bytes(blob))
+    with pytest.raises(ValueError):
+        merged_quantiles([bytes(blob)], (0.5,))
+
+
+def test_merged_quantiles_match_the_merged_sketch():
+    values = _values(3000) + [0.0] * 40
+    blobs = [RTSketch.of(values[i:i + 250]).to_bytes() for i in range(0, len(values), 250)]
+    merged = RTSketch()
+    for blob in blobs:
+        merged.merge(RTSketch.from_bytes(blob))
+    quantiles = (0.0, 0.01, 0.5, 0.95, 0.99, 1.0)
+    assert merged_quantiles(blobs + [None], quantiles) == [merged.quantile(q) for q in quantiles]
+    assert merged_quantiles([None, b""], quantiles) == [None] * len(quantiles)
+
+
+def test_sql_functions_build_the_same_sketch():
+    conn = sqlite3.connect(":memory:")
+    register_sketch_functions(conn)
+    conn.execute("CREATE TABLE t (grp INTEGER, v REAL)")
+    values = _values(200)
+    conn.executemany("INSERT INTO t VALUES (?, ?)", [(i % 3, v) for i, v in enumerate(values)])
+    per_group = [row[0] for row in conn.execute("SELECT sketch_agg(v) FROM t GROUP BY grp")]
+    (merged,) = conn.execute(
+        "SELECT sketch_merge_agg(s) FROM (SELECT sketch_agg(v) AS s FROM t GROUP BY grp)"
+    ).fetchone()
+    assert merged == RTSketch.of(values).to_bytes()
+    assert RTSketch.from_bytes(per_group[0]).count == len(values[0::3])
+    assert _HEADER.unpack_from(merged)[1] == 0
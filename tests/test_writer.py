@@ -0,0 +1,74 @@
+import sqlite3
+import threading
+import time
+
+import db
+
+
+def test_a_bad_group_is_dropped_alone_and_at_once(conn):
+    insert = "INSERT INTO sites (url, client) VALUES (?, ?)"
+    db._write_group([(insert, [("https://a.example.com/", "C")])])
+    # NOT NULL violation: fails the same way however often it is retried
+    db._write_group([(insert, [("https://b.example.com/", "C"), (None, "C")])])
+    db._write_group([(insert, [("https://c.example.com/", "C")])])
+    started = time.monotonic()
+    assert db.flush_writes(5)
+    assert time.monotonic() - started < 2
+    urls = [row[0] for row in conn.execute("SELECT url FROM sites ORDER BY url")]
+    assert urls == ["https://a.example.com/", "https://c.example.com/"]
+
+
+def test_a_locked_database_is_retried_until_it_frees(conn, monkeypatch, capsys):
+    db.close_writer()
+    monkeypatch.setattr(db, "WRITE_RETRY_SECONDS", 0.05)
+    monkeypatch.setattr(db, "WRITER_PRAGMAS", db.WRITER_PRAGMAS + ("PRAGMA busy_timeout=0",))
+    blocker = sqlite3.connect(db.DB_PATH, isolation_level=None, check_same_thread=False)
+    blocker.execute("BEGIN IMMEDIATE")
+    db._write_group([("INSERT INTO sites (url) VALUES (?)", [("https://a.example.com/",)])])
+    threading.Timer(0.5, blocker.execute, ("COMMIT",)).start()
+    assert db.flush_writes(30)
+    blocker.close()
+    assert "retrying in" in capsys.readouterr().out
+    assert conn.execute("SELECT COUNT(*) FROM sites").fetchone()[0] == 1
+
+
+def test_site_ids_are_created_once_per_url(conn):
+    ids = []
+
+    def worker(url):
+        ids.append((url, db._site_id(url, "C")))
+
+    threads = [threading.Thread(target=worker, args=(f"https://s{i % 3}.example.com/",)) for i in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(ids)) == 3
+    assert conn.execute("SELECT COUNT(*) FROM sites").fetchone()[0] == 3
+
+
+def _counts(conn):
+    return {
+        "checks": conn.execute("SELECT COUNT(*) FROM check_results").fetchone()[0],
+        "rollup": conn.execute("SELECT checks FROM site_rollups WHERE resolution = 60").fetchall(),
+        "series": conn.execute("SELECT points FROM series_blocks").fetchall(),
+        "client": conn.execute("SELECT checks FROM client_rollups WHERE resolution = 60").fetchall(),
+    }
+
+
+def test_a_replayed_check_is_counted_once(conn, monkeypatch):
+    monkeypatch.setattr(db, "STORAGE_MODE", "rows")
+    monkeypatch.setattr(db, "_now_ms", lambda: 1_700_000_000_000)
+    args = ("https://a.example.com/", "C", 200, True, 0.25, True, 30, None)
+    db.insert_check(*args)
+    db.insert_check(*args)  # same batch
+    assert db.flush_writes(5)
+    db.insert_check(*args)  # later batch
+    assert db.flush_writes(5)
+    assert _counts(conn) == {"checks": 1, "rollup": [(1,)], "series": [(1,)], "client": [(1,)]}
+    (seq,) = conn.execute("SELECT seq FROM data_version WHERE id = 0").fetchone()
+    monkeypatch.setattr(db, "_now_ms", lambda: 1_700_000_060_000)
+    db.insert_check(*args)
+    assert db.flush_writes(5)
+    assert _counts(conn) == {"checks": 2, "rollup": [(1,), (1,)], "series": [(2,)], "client": [(1,), (1,)]}
+    assert conn.execute("SELECT seq FROM data_version WHERE id = 0").fetchone()[0] > seq